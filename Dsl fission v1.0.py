@@ -1,8 +1,53 @@
 # -*- coding: utf-8 -*-
 """
-[样本裂变器]DSL Sample Fission V1.1
+[样本裂变器]DSL Sample Fission V1.9
 功能:基于现有 DSL 样本进行合法裂变,扩充训练数据量
 
+更新 V1.9:
+1. [Feat] --schedule coverage:覆盖引导的基础样本调度,按 root_type / 指令类型 / 属性名统计覆盖,
+   优先裂变覆盖不足的单元,root_type 分布趋向目标分布 (份额 ∝ 原始数量^power)
+2. [Perf] 连续多个候选都被拒绝 (重复/语法) 的样本标记为饱和,不再调度;全部饱和时提前结束,
+   不再空转到 needed*10 次迭代
+
+更新 V1.8:
+1. [Feat] --stream:裂变样本接受后立即写入磁盘分桶,最终经外部 (磁盘) 打乱输出,
+   常驻内存只有原始样本、去重摘要和一个桶,目标数可达百万级
+2. [Perf] 裂变样本改为浅层结构复制 (顶层字典 + meta 字典),不再 deepcopy 整个原样本
+3. [Perf] 流式模式下跨样本组合池改为蓄水池抽样,原始样本之外最多保留固定数量的已裂变样本;
+   并行时单个任务的配额有上限,分多轮完成
+
+更新 V1.7:
+1. [Feat] --validate parser:候选样本经 DSLParser.match_command (行首关键字直接分发) 校验,
+   所有行都必须是可识别的指令;在生成它的进程内按批处理,同一批内重复出现的行只匹配一次
+2. [Fix] parser 模式下 SET_ATTEN_CURVE / CREATE_EVENT 等合法指令不再被前缀检查误拒,
+   缺少参数的残缺行不再因前缀匹配而放行
+3. [Feat] 裂变统计输出语法拒绝数
+
+更新 V1.6:
+1. [Perf] 参数池改用 IndexedPool (列表 + 下标字典),抽样 O(1),不再每次 list(set) 复制
+2. [Perf] extract_from_dsl 合并为单个正则单遍扫描;Min/Max 直接归属本行对象,不再对全文重复 re.search
+3. [Feat] --pool:参数池持久化,输入文件未变化时直接加载,跳过语料扫描
+4. [Feat] --weighted-pool:按出现频次加权抽样
+
+更新 V1.5:
+1. [Perf] 子树提取改为沿父->子邻接表 BFS,线性时间;同一起点的子树缓存复用
+2. [Fix] 子树只包含真实后代,不再混入与根同父的兄弟节点,也不会在遇到无关 CREATE 时提前截断
+
+更新 V1.4:
+1. [Perf] 基础样本预解析为 ParsedSample (逐行类型标记 + 按对象名索引的行号),
+   每个样本只解析一次,各裂变算子改在行列表上修改,最后统一序列化
+2. [Perf] 子树提取、跨样本组合改用名称集合判定,不再对已收集行做逐行子串扫描
+
+更新 V1.3:
+1. [Perf] --workers:多进程裂变,原始样本分片到各 worker,结果经去重索引合并
+2. [Feat] 每个 worker 任务使用由主种子派生的独立随机流,种子与 worker 数固定时输出逐字节一致
+3. [Fix] 参数池构建后冻结为有序列表,--seed 不再受进程哈希随机化影响 (V1.6 起由 IndexedPool 保证)
+
+更新 V1.2:
+1. [Perf] 去重改用哈希索引 (dsl_dedupe.DedupeIndex),判重 O(1),整体随目标数线性增长
+2. [Feat] --dedupe near:基于 MinHash/LSH 的近似去重模式
+3. [Feat] --benchmark:按多个目标数运行裂变,输出耗时与单样本耗时
+
 更新 V1.1:
 1. [Feat] 支持 Attenuation 专用裂变(曲线点微调、RadiusMax 变化)
 2. [Feat] 支持 GameParameter 专用裂变(范围微调)
@@ -23,34 +68,124 @@
 - Auto: 智能选择(根据类型自动选择最佳策略)
 
 作者: NeuroWwise Team
-版本: V1.1
+版本: V1.9
 """
 
+import io
 import json
 import random
 import re
+import time
 import argparse
 import os
-import copy
-from typing import List, Dict, Set, Tuple, Optional
-from collections import defaultdict
+import tempfile
+import multiprocessing
+import contextlib
+from typing import List, Dict, Set, Tuple, Optional, Union
+from collections import defaultdict, deque
+from itertools import accumulate
 from dataclasses import dataclass, field
 
+from dsl_dedupe import DedupeIndex
+
+# V1.7: --validate parser 需要 DSL 解析器 (不可用时回退到前缀检查)
+try:
+    from dsl_parser import DSLParser
+except ImportError:
+    DSLParser = None
+
 
 # =============================================================================
 # 参数池 - 从真实数据中提取
 # =============================================================================
 
+class IndexedPool:
+    """
+    V1.6: 可抽样集合 - 列表存值 + 字典存下标
+    - add: O(1) 去重插入,并累计出现频次
+    - choice: 均匀抽样 O(1);加权 (按频次) 抽样 O(log n)
+    - 按首次出现顺序存储,抽样结果只取决于 random 种子
+    """
+    
+    __slots__ = ("items", "counts", "index", "_cum_weights")
+    
+    def __init__(self, items: Optional[List[str]] = None, counts: Optional[List[int]] = None):
+        self.items: List[str] = []
+        self.counts: List[int] = []
+        self.index: Dict[str, int] = {}
+        self._cum_weights: Optional[List[int]] = None
+        for i, item in enumerate(items or []):
+            self.add(item, counts[i] if counts else 1)
+    
+    def add(self, item: str, count: int = 1):
+        idx = self.index.get(item)
+        if idx is None:
+            self.index[item] = len(self.items)
+            self.items.append(item)
+            self.counts.append(count)
+        else:
+            self.counts[idx] += count
+        self._cum_weights = None
+    
+    def choice(self, weighted: bool = False) -> str:
+        if not weighted:
+            return random.choice(self.items)
+        if self._cum_weights is None:
+            self._cum_weights = list(accumulate(self.counts))
+        return random.choices(self.items, cum_weights=self._cum_weights)[0]
+    
+    def __len__(self) -> int:
+        return len(self.items)
+    
+    def __iter__(self):
+        return iter(self.items)
+    
+    def __contains__(self, item: str) -> bool:
+        return item in self.index
+    
+    def to_dict(self) -> Dict:
+        return {"items": self.items, "counts": self.counts}
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "IndexedPool":
+        return cls(data.get("items", []), data.get("counts"))
+
+
+# 参数提取合并为一个交替正则,finditer 单遍扫描全文;
+# 按 match.lastindex 判断命中分支: 2=LINK, 5=SET_PROP, 7=SET_ATTEN_CURVE, 9/10=CREATE
+_POOL_EXTRACT_RE = re.compile(
+    r'LINK\s+"[^"]+"\s+TO\s+"([^"]+)"\s+AS\s+"(\w+)"'
+    r'|SET_PROP\s+"([^"]+)"\s+"(\w+)"\s*=\s*(.+)'
+    r'|SET_ATTEN_CURVE\s+"[^"]+"\s+"(\w+)"\s+POINTS\s+\[([^\]]+)\]'
+    r'|CREATE\s+(\w+)\s+"([^"]+)"(?:\s+UNDER\s+"([^"]+)")?'
+)
+_POOL_NUM_SUFFIX_RE = re.compile(r'(\d+)$')
+
+# LINK 类型 -> 参数池字段
+_POOL_LINK_FIELDS = {
+    "Bus": "buses",
+    "Attenuation": "attenuations",
+    "Conversion": "conversions",
+    "SwitchGroupOrStateGroup": "switch_groups",
+}
+
+# 可抽样字段 (持久化时逐一保存)
+_POOL_INDEXED_FIELDS = (
+    "buses", "attenuations", "conversions", "switch_groups", "state_groups",
+    "name_prefixes", "name_suffixes", "name_middles", "object_types",
+)
+
+
 @dataclass
 class ParameterPool:
     """参数池 - 存储所有合法的参数值"""
     
     # 引用目标(Bus, Attenuation, Conversion 等)
-    buses: Set[str] = field(default_factory=set)
-    attenuations: Set[str] = field(default_factory=set)
-    conversions: Set[str] = field(default_factory=set)
-    switch_groups: Set[str] = field(default_factory=set)
-    state_groups: Set[str] = field(default_factory=set)
+    buses: IndexedPool = field(default_factory=IndexedPool)
+    attenuations: IndexedPool = field(default_factory=IndexedPool)
+    conversions: IndexedPool = field(default_factory=IndexedPool)
+    switch_groups: IndexedPool = field(default_factory=IndexedPool)
+    state_groups: IndexedPool = field(default_factory=IndexedPool)
     
     # V1.1 新增:Attenuation 曲线点池
     atten_curves: Dict[str, List[str]] = field(default_factory=lambda: defaultdict(list))
@@ -63,81 +198,69 @@ class ParameterPool:
     state_values: Dict[str, List[str]] = field(default_factory=lambda: defaultdict(list))
     
     # 属性值
-    prop_values: Dict[str, Set] = field(default_factory=lambda: defaultdict(set))
+    prop_values: Dict[str, IndexedPool] = field(default_factory=lambda: defaultdict(IndexedPool))
     
     # 命名组件(用于生成新名称)
-    name_prefixes: Set[str] = field(default_factory=set)
-    name_suffixes: Set[str] = field(default_factory=set)
-    name_middles: Set[str] = field(default_factory=set)
+    name_prefixes: IndexedPool = field(default_factory=IndexedPool)
+    name_suffixes: IndexedPool = field(default_factory=IndexedPool)
+    name_middles: IndexedPool = field(default_factory=IndexedPool)
     
     # 对象类型
-    object_types: Set[str] = field(default_factory=set)
+    object_types: IndexedPool = field(default_factory=IndexedPool)
+    
+    # V1.6: 按出现频次加权抽样 (默认均匀抽样)
+    weighted: bool = False
     
     def extract_from_dsl(self, dsl_code: str):
-        """从 DSL 代码中提取参数"""
-        
-        # 提取 LINK 目标
-        link_pattern = r'LINK\s+"[^"]+"\s+TO\s+"([^"]+)"\s+AS\s+"(\w+)"'
-        for match in re.finditer(link_pattern, dsl_code):
-            target, link_type = match.groups()
-            if link_type == "Bus":
-                self.buses.add(target)
-            elif link_type == "Attenuation":
-                self.attenuations.add(target)
-            elif link_type == "Conversion":
-                self.conversions.add(target)
-            elif link_type == "SwitchGroupOrStateGroup":
-                self.switch_groups.add(target)
-        
-        # 提取 SET_PROP 值
-        prop_pattern = r'SET_PROP\s+"[^"]+"\s+"(\w+)"\s*=\s*(.+)'
-        for match in re.finditer(prop_pattern, dsl_code):
-            prop_name, prop_value = match.groups()
-            self.prop_values[prop_name].add(prop_value.strip())
-            
-            # V1.1: 提取 GameParameter 范围
-            if prop_name in ["Min", "Max"]:
-                try:
-                    val = float(prop_value.strip())
-                    param_match = re.search(r'SET_PROP\s+"([^"]+)"\s+"' + prop_name, dsl_code)
-                    if param_match:
-                        param_name = param_match.group(1)
-                        if param_name not in self.game_param_ranges:
-                            self.game_param_ranges[param_name] = (0, 100)
-                        min_val, max_val = self.game_param_ranges[param_name]
-                        if prop_name == "Min":
-                            self.game_param_ranges[param_name] = (val, max_val)
-                        else:
-                            self.game_param_ranges[param_name] = (min_val, val)
-                except:
-                    pass
-        
-        # V1.1: 提取 SET_ATTEN_CURVE 曲线点
-        atten_curve_pattern = r'SET_ATTEN_CURVE\s+"([^"]+)"\s+"(\w+)"\s+POINTS\s+\[([^\]]+)\]'
-        for match in re.finditer(atten_curve_pattern, dsl_code):
-            atten_name, curve_type, points = match.groups()
-            self.atten_curves[curve_type].append(points)
-        
-        # V1.1: 提取 Switch 值
-        switch_pattern = r'CREATE Switch "([^"]+)" UNDER "([^"]+)"'
-        for match in re.finditer(switch_pattern, dsl_code):
-            switch_val, group_name = match.groups()
-            self.switch_values[group_name].append(switch_val)
-        
-        # V1.1: 提取 State 值
-        state_pattern = r'CREATE State "([^"]+)" UNDER "([^"]+)"'
-        for match in re.finditer(state_pattern, dsl_code):
-            state_val, group_name = match.groups()
-            self.state_values[group_name].append(state_val)
-        
-        # 提取对象类型
-        create_pattern = r'CREATE\s+(\w+)\s+"([^"]+)"'
-        for match in re.finditer(create_pattern, dsl_code):
-            obj_type, obj_name = match.groups()
-            self.object_types.add(obj_type)
-            
-            # 分解名称
-            self._decompose_name(obj_name)
+        """从 DSL 代码中提取参数 (V1.6: 合并正则单遍扫描,按命中分支分发)"""
+        for match in _POOL_EXTRACT_RE.finditer(dsl_code):
+            branch = match.lastindex
+            
+            # 提取 LINK 目标
+            if branch == 2:
+                link_target, link_type = match.group(1, 2)
+                field_name = _POOL_LINK_FIELDS.get(link_type)
+                if field_name:
+                    getattr(self, field_name).add(link_target)
+            
+            # 提取 SET_PROP 值
+            elif branch == 5:
+                obj_name, prop_name, prop_value = match.group(3, 4, 5)
+                prop_value = prop_value.strip()
+                self.prop_values[prop_name].add(prop_value)
+                
+                # V1.1: 提取 GameParameter 范围 (V1.6: 归属到本行对象)
+                if prop_name in ("Min", "Max"):
+                    try:
+                        val = float(prop_value)
+                    except ValueError:
+                        continue
+                    min_val, max_val = self.game_param_ranges.get(obj_name, (0, 100))
+                    if prop_name == "Min":
+                        self.game_param_ranges[obj_name] = (val, max_val)
+                    else:
+                        self.game_param_ranges[obj_name] = (min_val, val)
+            
+            # V1.1: 提取 SET_ATTEN_CURVE 曲线点
+            elif branch == 7:
+                curve_type, points = match.group(6, 7)
+                self.atten_curves[curve_type].append(points)
+            
+            else:
+                obj_type, obj_name, parent = match.group(8, 9, 10)
+                
+                # V1.1: 提取 Switch / State 值
+                if parent is not None:
+                    if obj_type == "Switch":
+                        self.switch_values[parent].append(obj_name)
+                    elif obj_type == "State":
+                        self.state_values[parent].append(obj_name)
+                
+                # 提取对象类型
+                self.object_types.add(obj_type)
+                
+                # 分解名称
+                self._decompose_name(obj_name)
     
     def _decompose_name(self, name: str):
         """分解名称为组件"""
@@ -153,21 +276,70 @@ class ParameterPool:
                 self.name_middles.add(p)
         
         # 提取数字后缀
-        num_match = re.search(r'(\d+)$', name)
+        num_match = _POOL_NUM_SUFFIX_RE.search(name)
         if num_match:
             self.name_suffixes.add(num_match.group(1))
     
     def get_random_bus(self) -> str:
-        return random.choice(list(self.buses)) if self.buses else "Master"
+        return self.buses.choice(self.weighted) if self.buses else "Master"
     
     def get_random_attenuation(self) -> str:
-        return random.choice(list(self.attenuations)) if self.attenuations else None
+        return self.attenuations.choice(self.weighted) if self.attenuations else None
     
     def get_random_conversion(self) -> str:
-        return random.choice(list(self.conversions)) if self.conversions else "Default Conversion Settings"
+        return self.conversions.choice(self.weighted) if self.conversions else "Default Conversion Settings"
     
     def get_random_switch_group(self) -> str:
-        return random.choice(list(self.switch_groups)) if self.switch_groups else None
+        return self.switch_groups.choice(self.weighted) if self.switch_groups else None
+    
+    # =========================================================================
+    # V1.6: 持久化
+    # =========================================================================
+    
+    def save(self, path: str, source: Optional[Dict] = None):
+        """保存参数池 (source 记录来源文件指纹,用于判断缓存是否过期)"""
+        data = {
+            "version": 1,
+            "source": source,
+            "indexed": {name: getattr(self, name).to_dict() for name in _POOL_INDEXED_FIELDS},
+            "prop_values": {prop: pool.to_dict() for prop, pool in self.prop_values.items()},
+            "atten_curves": self.atten_curves,
+            "game_param_ranges": self.game_param_ranges,
+            "switch_values": self.switch_values,
+            "state_values": self.state_values,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str, source: Optional[Dict] = None, weighted: bool = False) -> Optional["ParameterPool"]:
+        """读取参数池;文件损坏或来源指纹不一致时返回 None"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if data.get("version") != 1 or (source is not None and data.get("source") != source):
+            return None
+        
+        pool = cls(weighted=weighted)
+        for name in _POOL_INDEXED_FIELDS:
+            setattr(pool, name, IndexedPool.from_dict(data["indexed"].get(name, {})))
+        for prop, values in data.get("prop_values", {}).items():
+            pool.prop_values[prop] = IndexedPool.from_dict(values)
+        pool.atten_curves.update(data.get("atten_curves", {}))
+        pool.game_param_ranges = {k: tuple(v) for k, v in data.get("game_param_ranges", {}).items()}
+        pool.switch_values.update(data.get("switch_values", {}))
+        pool.state_values.update(data.get("state_values", {}))
+        return pool
+    
+    @staticmethod
+    def source_fingerprint(input_path: str) -> Dict:
+        """输入文件指纹 (路径 + 大小 + 修改时间)"""
+        stat = os.stat(input_path)
+        return {"path": os.path.abspath(input_path), "size": stat.st_size, "mtime": stat.st_mtime}
 
 
 # =============================================================================
@@ -232,7 +404,10 @@ class NameMutator:
             # 替换前缀
             parts = original_name.split("_")
             if len(parts) > 1:
-                new_prefix = random.choice(list(pool.name_prefixes) or cls.PREFIXES)
+                if pool.name_prefixes:
+                    new_prefix = pool.name_prefixes.choice(pool.weighted)
+                else:
+                    new_prefix = random.choice(cls.PREFIXES)
                 parts[0] = new_prefix
                 return "_".join(parts)
             return original_name
@@ -250,17 +425,17 @@ class NameMutator:
             parts = original_name.split("_")
             if len(parts) > 2 and pool.name_middles:
                 idx = random.randint(1, len(parts) - 2)
-                parts[idx] = random.choice(list(pool.name_middles))
+                parts[idx] = pool.name_middles.choice(pool.weighted)
                 return "_".join(parts)
             return original_name
         
         elif mutation_type == "combine":
             # 组合
             if pool.name_prefixes and pool.name_suffixes:
-                prefix = random.choice(list(pool.name_prefixes))
-                suffix = random.choice(list(pool.name_suffixes))
+                prefix = pool.name_prefixes.choice(pool.weighted)
+                suffix = pool.name_suffixes.choice(pool.weighted)
                 if pool.name_middles and random.random() > 0.5:
-                    middle = random.choice(list(pool.name_middles))
+                    middle = pool.name_middles.choice(pool.weighted)
                     return f"{prefix}_{middle}_{suffix}"
                 return f"{prefix}_{suffix}"
             return original_name
@@ -268,6 +443,189 @@ class NameMutator:
         return original_name
 
 
+# =============================================================================
+# V1.4: 预解析样本
+# =============================================================================
+
+_CREATE_NAME_RE = re.compile(r'CREATE\s+\w+\s+"([^"]+)"')
+_UNDER_RE = re.compile(r'UNDER\s+"([^"]+)"')
+_UNDER_ANY_RE = re.compile(r'UNDER\s+"[^"]+"')
+_FIRST_QUOTED_RE = re.compile(r'"([^"]+)"')
+_LINK_TYPE_RE = re.compile(r'LINK\s+"[^"]+"\s+TO\s+"[^"]+"\s+AS\s+"([^"]+)"')
+_CURVE_POINT_RE = re.compile(r'\((\d+(?:\.\d+)?),\s*([-\d.]+)\)')
+
+
+class ParsedSample:
+    """
+    预解析样本 - 每个基础样本只解析一次,所有裂变算子共享
+    
+    结构:
+    - lines: 去除首尾空白后按行切分的原始文本 (lead/trail 保存被去掉的空白)
+    - tokens: 每行引号内的对象名/参数
+    - token_lines: 名称 -> 引用它的行号 (按对象分组的指令)
+    - create_names / create_lines: CREATE 对象名 (文本顺序) 与 CREATE 行号
+    - children: 父级名称 -> 子级 CREATE 行号 (用于 BFS 提取子树)
+    - 以及各算子需要的逐行标记 (UNDER 父级、首个引号参数、LINK 类型等)
+    
+    算子只在行列表副本上做改名/替换,最后由 render() 一次性序列化
+    """
+    
+    def __init__(self, dsl: str):
+        self.raw = dsl
+        core = dsl.strip()
+        if core:
+            self.lead = dsl[:len(dsl) - len(dsl.lstrip())]
+            self.trail = dsl[len(dsl.rstrip()):]
+        else:
+            self.lead, self.trail = dsl, ""
+        
+        self.lines = core.split("\n")
+        self.create_names = _CREATE_NAME_RE.findall(dsl)
+        
+        self.tokens: List[Tuple[str, ...]] = []
+        self.token_lines: Dict[str, List[int]] = defaultdict(list)
+        self.is_create: List[bool] = []            # 行首为 CREATE (含 CREATE_EVENT)
+        self.create_lines: List[int] = []
+        self.set_prop_lines: List[int] = []
+        self.is_prop_or_link: List[bool] = []      # 行内含 "SET_PROP" 或 "LINK"
+        self.line_create_name: List[Optional[str]] = []
+        self.line_parent: List[Optional[str]] = []
+        self.first_quoted: List[Optional[str]] = []
+        self.link_by_type: Dict[str, List[int]] = defaultdict(list)
+        self.children: Dict[str, List[int]] = defaultdict(list)
+        
+        for i, line in enumerate(self.lines):
+            tokens = tuple(line.split('"')[1::2])
+            self.tokens.append(tokens)
+            for token in set(tokens):
+                self.token_lines[token].append(i)
+            
+            stripped = line.strip()
+            self.is_create.append(stripped.startswith("CREATE"))
+            if self.is_create[i]:
+                self.create_lines.append(i)
+            elif stripped.startswith("SET_PROP"):
+                self.set_prop_lines.append(i)
+            self.is_prop_or_link.append("SET_PROP" in line or "LINK" in line)
+            
+            match = _CREATE_NAME_RE.search(line)
+            self.line_create_name.append(match.group(1) if match else None)
+            match = _UNDER_RE.search(line)
+            self.line_parent.append(match.group(1) if match else None)
+            match = _FIRST_QUOTED_RE.search(line)
+            self.first_quoted.append(match.group(1) if match else None)
+            
+            if self.is_create[i] and self.line_parent[i]:
+                self.children[self.line_parent[i]].append(i)
+            
+            match = _LINK_TYPE_RE.search(line)
+            if match:
+                self.link_by_type[match.group(1)].append(i)
+        
+        # 按需缓存
+        self._subtrees: Dict[int, List[str]] = {}
+        self._creates_of_type: Dict[str, List[str]] = {}
+        self._lines_containing: Dict[str, List[int]] = {}
+        self._prop_lines: Dict[Tuple[str, str], Tuple[re.Pattern, Optional[int]]] = {}
+    
+    def subtree(self, start: int) -> List[str]:
+        """
+        以第 start 行 CREATE 的对象为根提取子树 (结果按起始行缓存,多次裂变直接复用)
+        - 沿 children 邻接表 BFS 收集全部后代 CREATE 行
+        - 其余行 (SET_PROP/LINK/CREATE_EVENT 等) 引用了子树内对象即保留
+        - 只取 start 之后的行,保持原文顺序
+        """
+        if start in self._subtrees:
+            return self._subtrees[start]
+        
+        members = {self.first_quoted[start]}
+        keep = {start}
+        queue = deque(members)
+        while queue:
+            for i in self.children.get(queue.popleft(), ()):
+                if i in keep:
+                    continue
+                keep.add(i)
+                name = self.first_quoted[i]
+                if name and name not in members:
+                    members.add(name)
+                    queue.append(name)
+        
+        for name in members:
+            for i in self.token_lines.get(name, ()):
+                if i > start and not (self.is_create[i] and self.line_parent[i]):
+                    keep.add(i)
+        
+        result = [self.lines[i] for i in sorted(keep)]
+        self._subtrees[start] = result
+        return result
+    
+    def creates_of_type(self, obj_type: str) -> List[str]:
+        """所有 CREATE <obj_type> 的对象名 (文本顺序)"""
+        if obj_type not in self._creates_of_type:
+            self._creates_of_type[obj_type] = re.findall(rf'CREATE {obj_type} "([^"]+)"', self.raw)
+        return self._creates_of_type[obj_type]
+    
+    def lines_containing(self, marker: str) -> List[int]:
+        """包含 marker 的行号"""
+        if marker not in self._lines_containing:
+            self._lines_containing[marker] = [i for i, line in enumerate(self.lines) if marker in line]
+        return self._lines_containing[marker]
+    
+    def prop_pattern(self, prop: str, value_pattern: str = r'[-\d.]+') -> Tuple[re.Pattern, Optional[int]]:
+        """SET_PROP <prop> 数值正则,及首个匹配行号"""
+        key = (prop, value_pattern)
+        if key not in self._prop_lines:
+            pattern = re.compile(rf'(SET_PROP\s+"[^"]+"\s+"{prop}"\s*=\s*)({value_pattern})')
+            line_idx = next((i for i, line in enumerate(self.lines) if pattern.search(line)), None)
+            self._prop_lines[key] = (pattern, line_idx)
+        return self._prop_lines[key]
+    
+    @staticmethod
+    def resolve_renames(renames: List[Tuple[str, str]]) -> Dict[str, str]:
+        """
+        将按顺序执行的改名列表折叠为最终映射
+        (等价于依次对全文执行 replace('"old"', '"new"'),包括 A->B、B->C 的链式效果)
+        """
+        final = {}
+        for old, _ in renames:
+            if old in final:
+                continue
+            name = old
+            for o, n in renames:
+                if name == o:
+                    name = n
+            final[old] = name
+        return final
+    
+    def rename_lines(self, renames: List[Tuple[str, str]]) -> List[str]:
+        """返回应用改名后的行列表副本 (未受影响的行直接复用原字符串)"""
+        lines = list(self.lines)
+        if not renames:
+            return lines
+        final = self.resolve_renames(renames)
+        touched = set()
+        for old in final:
+            touched.update(self.token_lines.get(old, ()))
+        for i in touched:
+            parts = lines[i].split('"')
+            parts[1::2] = [final.get(p, p) for p in parts[1::2]]
+            lines[i] = '"'.join(parts)
+        return lines
+    
+    def reparent_line(self, i: int, new_parent: str) -> str:
+        """第 i 行的 UNDER 目标替换为 new_parent"""
+        line = self.lines[i]
+        if self.line_parent[i] is None:
+            return line
+        return _UNDER_ANY_RE.sub(f'UNDER "{new_parent}"', line)
+    
+    def render(self, lines: List[str], keep_padding: bool = True) -> str:
+        """序列化行列表;keep_padding 时还原原文首尾空白"""
+        body = "\n".join(lines)
+        return f"{self.lead}{body}{self.trail}" if keep_padding else body
+
+
 # =============================================================================
 # DSL 裂变器
 # =============================================================================
@@ -275,10 +633,14 @@ class NameMutator:
 class DSLFission:
     """DSL 样本裂变器"""
     
-    def __init__(self, pool: ParameterPool):
+    def __init__(self, pool: ParameterPool, max_cached: int = 20000):
         self.pool = pool
         self.name_mutator = NameMutator()
         
+        # V1.4: 预解析缓存 (DSL 文本 -> ParsedSample),超出上限后临时解析、不入缓存
+        self.max_cached = max_cached
+        self._parsed: Dict[str, ParsedSample] = {}
+        
         # 裂变统计
         self.stats = {
             "name_mutations": 0,
@@ -287,7 +649,18 @@ class DSLFission:
             "subset_extractions": 0
         }
     
-    def fission_simple(self, dsl_code: str, count: int = 3) -> List[str]:
+    def parse(self, dsl: Union[str, ParsedSample]) -> ParsedSample:
+        """获取样本的预解析结构 (已解析的直接返回)"""
+        if isinstance(dsl, ParsedSample):
+            return dsl
+        sample = self._parsed.get(dsl)
+        if sample is None:
+            sample = ParsedSample(dsl)
+            if len(self._parsed) < self.max_cached:
+                self._parsed[dsl] = sample
+        return sample
+    
+    def fission_simple(self, dsl_code: Union[str, ParsedSample], count: int = 3) -> List[str]:
         """
         简单裂变 - 仅改名和微调
         
@@ -296,45 +669,45 @@ class DSLFission:
         2. 数字后缀变化
         3. Bus/Attenuation 在同类中替换
         """
+        sample = self.parse(dsl_code)
         results = []
         
         for _ in range(count):
-            new_dsl = dsl_code
-            
-            # 收集所有对象名
-            names = re.findall(r'CREATE\s+\w+\s+"([^"]+)"', dsl_code)
-            name_mapping = {}
-            
             # 为每个名称生成变异
-            for name in names:
+            name_mapping = {}
+            for name in sample.create_names:
                 if name not in name_mapping:
                     mutated = self.name_mutator.mutate(name, self.pool, 0.5)
                     name_mapping[name] = mutated
             
             # 应用名称替换(注意顺序,长名称优先)
-            for old_name, new_name in sorted(name_mapping.items(), key=lambda x: -len(x[0])):
-                if old_name != new_name:
-                    new_dsl = new_dsl.replace(f'"{old_name}"', f'"{new_name}"')
-                    self.stats["name_mutations"] += 1
+            renames = [
+                (old_name, new_name)
+                for old_name, new_name in sorted(name_mapping.items(), key=lambda x: -len(x[0]))
+                if old_name != new_name
+            ]
+            self.stats["name_mutations"] += len(renames)
+            lines = sample.rename_lines(renames)
             
             # 随机替换 Bus(同类替换)
             if self.pool.buses and random.random() > 0.7:
-                new_dsl = self._swap_link_target(new_dsl, "Bus", self.pool.get_random_bus())
+                self._swap_link_target(sample, lines, "Bus", self.pool.get_random_bus())
                 self.stats["parameter_swaps"] += 1
             
             # 随机替换 Attenuation(同类替换)
             if self.pool.attenuations and random.random() > 0.7:
                 new_attn = self.pool.get_random_attenuation()
                 if new_attn:
-                    new_dsl = self._swap_link_target(new_dsl, "Attenuation", new_attn)
+                    self._swap_link_target(sample, lines, "Attenuation", new_attn)
                     self.stats["parameter_swaps"] += 1
             
-            if new_dsl != dsl_code:
+            new_dsl = sample.render(lines)
+            if new_dsl != sample.raw:
                 results.append(new_dsl)
         
         return results
     
-    def fission_medium(self, dsl_code: str, count: int = 2) -> List[str]:
+    def fission_medium(self, dsl_code: Union[str, ParsedSample], count: int = 2) -> List[str]:
         """
         中级裂变 - 结构简化和子集提取
         
@@ -343,19 +716,19 @@ class DSLFission:
         2. 移除可选属性
         3. 简化层级
         """
+        sample = self.parse(dsl_code)
         results = []
-        lines = dsl_code.strip().split("\n")
         
         for _ in range(count):
             # 策略1: 提取子树
-            subset = self._extract_subtree(lines)
+            subset = self._extract_subtree(sample)
             if subset and len(subset) >= 3:
                 results.append("\n".join(subset))
                 self.stats["subset_extractions"] += 1
             
             # 策略2: 移除部分 SET_PROP
-            simplified = self._simplify_props(lines)
-            if simplified != lines:
+            simplified = self._simplify_props(sample)
+            if len(simplified) != len(sample.lines):
                 results.append("\n".join(simplified))
                 self.stats["structure_simplifications"] += 1
         
@@ -389,7 +762,7 @@ class DSLFission:
     # V1.1 新增:参数类型专用裂变
     # =========================================================================
     
-    def fission_attenuation(self, dsl_code: str, count: int = 3) -> List[str]:
+    def fission_attenuation(self, dsl_code: Union[str, ParsedSample], count: int = 3) -> List[str]:
         """
         Attenuation 专用裂变
         
@@ -398,39 +771,42 @@ class DSLFission:
         2. RadiusMax 在合理范围内变化
         3. 曲线点微调(保持趋势)
         """
+        sample = self.parse(dsl_code)
+        names = sample.creates_of_type("Attenuation")
+        old_name = names[0] if names else None
+        radius_pattern, radius_line = sample.prop_pattern("RadiusMax", r'\d+')
         results = []
         
         for _ in range(count):
-            new_dsl = dsl_code
-            
             # 1. 改名
-            name_match = re.search(r'CREATE Attenuation "([^"]+)"', dsl_code)
-            if name_match:
-                old_name = name_match.group(1)
+            renames = []
+            if old_name:
                 new_name = self.name_mutator.mutate(old_name, self.pool, 0.7)
                 if new_name != old_name:
-                    new_dsl = new_dsl.replace(f'"{old_name}"', f'"{new_name}"')
+                    renames.append((old_name, new_name))
+            lines = sample.rename_lines(renames)
             
             # 2. RadiusMax 微调 (±20%)
-            radius_match = re.search(r'(SET_PROP\s+"[^"]+"\s+"RadiusMax"\s*=\s*)(\d+)', new_dsl)
-            if radius_match:
+            if radius_line is not None:
+                radius_match = radius_pattern.search(lines[radius_line])
                 old_radius = int(radius_match.group(2))
                 factor = random.uniform(0.8, 1.2)
                 new_radius = int(old_radius * factor)
-                new_dsl = new_dsl.replace(
+                lines[radius_line] = lines[radius_line].replace(
                     radius_match.group(0),
                     f'{radius_match.group(1)}{new_radius}'
                 )
             
             # 3. 曲线点微调
-            new_dsl = self._mutate_curve_points(new_dsl)
+            self._mutate_curve_points(lines)
             
-            if new_dsl != dsl_code:
+            new_dsl = sample.render(lines)
+            if new_dsl != sample.raw:
                 results.append(new_dsl)
         
         return results
     
-    def fission_game_parameter(self, dsl_code: str, count: int = 3) -> List[str]:
+    def fission_game_parameter(self, dsl_code: Union[str, ParsedSample], count: int = 3) -> List[str]:
         """
         GameParameter 专用裂变
         
@@ -439,23 +815,25 @@ class DSLFission:
         2. Min/Max 范围微调
         3. InitialValue 调整
         """
+        sample = self.parse(dsl_code)
+        names = sample.creates_of_type("GameParameter")
+        old_name = names[0] if names else None
         results = []
         
         for _ in range(count):
-            new_dsl = dsl_code
-            
             # 1. 改名
-            name_match = re.search(r'CREATE GameParameter "([^"]+)"', dsl_code)
-            if name_match:
-                old_name = name_match.group(1)
+            renames = []
+            if old_name:
                 new_name = self.name_mutator.mutate(old_name, self.pool, 0.6)
                 if new_name != old_name:
-                    new_dsl = new_dsl.replace(f'"{old_name}"', f'"{new_name}"')
+                    renames.append((old_name, new_name))
+            lines = sample.rename_lines(renames)
             
             # 2. 数值微调
             for prop in ["Min", "Max", "InitialValue"]:
-                prop_match = re.search(rf'(SET_PROP\s+"[^"]+"\s+"{prop}"\s*=\s*)([-\d.]+)', new_dsl)
-                if prop_match:
+                prop_pattern, prop_line = sample.prop_pattern(prop)
+                if prop_line is not None:
+                    prop_match = prop_pattern.search(lines[prop_line])
                     old_val = float(prop_match.group(2))
                     if old_val != 0:
                         factor = random.uniform(0.9, 1.1)
@@ -463,17 +841,18 @@ class DSLFission:
                         # 保持整数或小数格式
                         if old_val == int(old_val):
                             new_val = int(new_val)
-                        new_dsl = new_dsl.replace(
+                        lines[prop_line] = lines[prop_line].replace(
                             prop_match.group(0),
                             f'{prop_match.group(1)}{new_val}'
                         )
             
-            if new_dsl != dsl_code:
+            new_dsl = sample.render(lines)
+            if new_dsl != sample.raw:
                 results.append(new_dsl)
         
         return results
     
-    def fission_switch_group(self, dsl_code: str, count: int = 2) -> List[str]:
+    def fission_switch_group(self, dsl_code: Union[str, ParsedSample], count: int = 2) -> List[str]:
         """
         SwitchGroup 专用裂变
         
@@ -482,80 +861,58 @@ class DSLFission:
         2. 增减 Switch 数量
         3. Switch 改名
         """
-        results = []
-        
-        for _ in range(count):
-            lines = dsl_code.strip().split("\n")
-            
-            # 找到 SwitchGroup 名称
-            group_match = re.search(r'CREATE SwitchGroup "([^"]+)"', dsl_code)
-            if not group_match:
-                continue
-            
-            group_name = group_match.group(1)
-            
-            # 收集所有 Switch
-            switches = re.findall(r'CREATE Switch "([^"]+)"', dsl_code)
-            
-            # 策略:随机移除一个 Switch 或改名
-            if len(switches) > 2 and random.random() > 0.5:
-                # 移除一个
-                to_remove = random.choice(switches[1:])  # 保留第一个
-                lines = [l for l in lines if f'"{to_remove}"' not in l]
-            else:
-                # 改名
-                for i, line in enumerate(lines):
-                    if "CREATE Switch" in line:
-                        switch_match = re.search(r'"([^"]+)"', line)
-                        if switch_match and random.random() > 0.6:
-                            old_switch = switch_match.group(1)
-                            new_switch = self._mutate_switch_name(old_switch)
-                            lines[i] = line.replace(f'"{old_switch}"', f'"{new_switch}"')
-            
-            new_dsl = "\n".join(lines)
-            if new_dsl != dsl_code:
-                results.append(new_dsl)
-        
-        return results
+        return self._fission_group_members(
+            self.parse(dsl_code), count, "SwitchGroup", "Switch", self._mutate_switch_name
+        )
     
-    def fission_state_group(self, dsl_code: str, count: int = 2) -> List[str]:
+    def fission_state_group(self, dsl_code: Union[str, ParsedSample], count: int = 2) -> List[str]:
         """
         StateGroup 专用裂变 (类似 SwitchGroup)
         """
+        return self._fission_group_members(
+            self.parse(dsl_code), count, "StateGroup", "State", self._mutate_state_name
+        )
+    
+    def _fission_group_members(
+        self,
+        sample: ParsedSample,
+        count: int,
+        group_type: str,
+        member_type: str,
+        mutate_member
+    ) -> List[str]:
+        """SwitchGroup/StateGroup 通用裂变:随机移除一个成员 (保留第一个) 或成员改名"""
         results = []
         
+        # 找到分组,收集所有成员
+        if not sample.creates_of_type(group_type):
+            return results
+        members = sample.creates_of_type(member_type)
+        member_lines = sample.lines_containing(f"CREATE {member_type}")
+        
         for _ in range(count):
-            lines = dsl_code.strip().split("\n")
-            
-            # 找到 StateGroup 名称
-            group_match = re.search(r'CREATE StateGroup "([^"]+)"', dsl_code)
-            if not group_match:
-                continue
-            
-            # 收集所有 State
-            states = re.findall(r'CREATE State "([^"]+)"', dsl_code)
-            
-            # 策略:随机移除一个 State 或改名
-            if len(states) > 2 and random.random() > 0.5:
-                to_remove = random.choice(states[1:])
-                lines = [l for l in lines if f'"{to_remove}"' not in l]
+            # 策略:随机移除一个成员或改名
+            if len(members) > 2 and random.random() > 0.5:
+                # 移除一个
+                to_remove = random.choice(members[1:])  # 保留第一个
+                lines = [l for i, l in enumerate(sample.lines) if to_remove not in sample.tokens[i]]
             else:
-                for i, line in enumerate(lines):
-                    if "CREATE State" in line:
-                        state_match = re.search(r'"([^"]+)"', line)
-                        if state_match and random.random() > 0.6:
-                            old_state = state_match.group(1)
-                            new_state = self._mutate_state_name(old_state)
-                            lines[i] = line.replace(f'"{old_state}"', f'"{new_state}"')
-            
-            new_dsl = "\n".join(lines)
-            if new_dsl != dsl_code:
+                # 改名
+                lines = list(sample.lines)
+                for i in member_lines:
+                    old_member = sample.first_quoted[i]
+                    if old_member and random.random() > 0.6:
+                        new_member = mutate_member(old_member)
+                        lines[i] = lines[i].replace(f'"{old_member}"', f'"{new_member}"')
+            
+            new_dsl = sample.render(lines, keep_padding=False)
+            if new_dsl != sample.raw:
                 results.append(new_dsl)
         
         return results
     
-    def _mutate_curve_points(self, dsl: str) -> str:
-        """微调曲线点"""
+    def _mutate_curve_points(self, lines: List[str]):
+        """微调曲线点 (原地修改行列表)"""
         def mutate_point(match):
             x, y = match.groups()
             x_val = float(x)
@@ -571,7 +928,9 @@ class DSLFission:
             
             return f"({x_val:.0f},{y_val:.1f})"
         
-        return re.sub(r'\((\d+(?:\.\d+)?),\s*([-\d.]+)\)', mutate_point, dsl)
+        for i, line in enumerate(lines):
+            if "(" in line:
+                lines[i] = _CURVE_POINT_RE.sub(mutate_point, line)
     
     def _mutate_switch_name(self, name: str) -> str:
         """变异 Switch 名称"""
@@ -594,120 +953,369 @@ class DSLFission:
         
         return name + random.choice(["_v2", "_alt", "2"])
     
-    def _swap_link_target(self, dsl: str, link_type: str, new_target: str) -> str:
-        """替换 LINK 目标"""
+    def _swap_link_target(self, sample: ParsedSample, lines: List[str], link_type: str, new_target: str) -> bool:
+        """替换首个 link_type 类型 LINK 的目标 (原地修改行列表)"""
         pattern = rf'(LINK\s+"[^"]+"\s+TO\s+)"[^"]+"\s+(AS\s+"{link_type}")'
-        return re.sub(pattern, rf'\1"{new_target}" \2', dsl, count=1)
+        for i in sample.link_by_type.get(link_type, ()):
+            new_line, replaced = re.subn(pattern, rf'\1"{new_target}" \2', lines[i], count=1)
+            if replaced:
+                lines[i] = new_line
+                return True
+        return False
     
-    def _extract_subtree(self, lines: List[str]) -> List[str]:
-        """提取子树"""
+    def _extract_subtree(self, sample: ParsedSample) -> List[str]:
+        """提取子树 (随机选一个非根 CREATE 作为新根,子树本身由 ParsedSample 缓存)"""
         # 找到所有 CREATE 语句
-        creates = [(i, line) for i, line in enumerate(lines) if line.strip().startswith("CREATE")]
+        creates = sample.create_lines
         
         if len(creates) < 2:
             return []
         
         # 随机选择一个非根节点作为新的根
         start_idx = random.randint(1, len(creates) - 1)
-        start_line_idx = creates[start_idx][0]
+        start_line_idx = creates[start_idx]
         
         # 提取该节点的名称
-        match = re.search(r'CREATE\s+\w+\s+"([^"]+)"', creates[start_idx][1])
-        if not match:
+        if not sample.line_create_name[start_line_idx]:
             return []
         
-        root_name = match.group(1)
-        
-        # 收集该子树的所有行
-        subtree = []
-        collecting = False
-        depth = 0
-        
-        for i, line in enumerate(lines):
-            if i == start_line_idx:
-                collecting = True
-            
-            if collecting:
-                # 检查是否还在子树内
-                if line.strip().startswith("CREATE"):
-                    create_match = re.search(r'UNDER\s+"([^"]+)"', line)
-                    if create_match:
-                        parent = create_match.group(1)
-                        # 检查父节点是否在我们的子树中
-                        if parent == root_name or any(f'"{parent}"' in l for l in subtree if "CREATE" in l):
-                            subtree.append(line)
-                        elif i > start_line_idx:
-                            break
-                        else:
-                            subtree.append(line)
-                    else:
-                        subtree.append(line)
-                elif f'"{root_name}"' in line or any(f'"{n}"' in line for n in self._get_names_from_lines(subtree)):
-                    subtree.append(line)
-        
+        subtree = sample.subtree(start_line_idx)
         return subtree if len(subtree) >= 3 else []
     
-    def _get_names_from_lines(self, lines: List[str]) -> List[str]:
-        """从行中提取对象名"""
-        names = []
-        for line in lines:
-            match = re.search(r'CREATE\s+\w+\s+"([^"]+)"', line)
-            if match:
-                names.append(match.group(1))
-        return names
-    
-    def _simplify_props(self, lines: List[str]) -> List[str]:
+    def _simplify_props(self, sample: ParsedSample) -> List[str]:
         """简化属性,移除部分 SET_PROP"""
-        result = []
-        props_removed = 0
+        removed = set()
         max_remove = random.randint(1, 3)
         
-        for line in lines:
-            if line.strip().startswith("SET_PROP"):
-                if props_removed < max_remove and random.random() > 0.5:
-                    props_removed += 1
-                    continue
-            result.append(line)
+        for i in sample.set_prop_lines:
+            if len(removed) >= max_remove:
+                break
+            if random.random() > 0.5:
+                removed.add(i)
         
-        return result
+        if not removed:
+            return sample.lines
+        return [line for i, line in enumerate(sample.lines) if i not in removed]
     
-    def _combine_samples(self, s1: str, s2: str) -> Optional[str]:
+    def _combine_samples(self, s1: Union[str, ParsedSample], s2: Union[str, ParsedSample]) -> Optional[str]:
         """组合两个样本"""
-        lines1 = s1.strip().split("\n")
-        lines2 = s2.strip().split("\n")
+        p1 = self.parse(s1)
+        p2 = self.parse(s2)
         
         # 从 s1 提取根和部分子节点
-        root_lines = []
-        for line in lines1[:len(lines1)//2]:
-            root_lines.append(line)
+        root_count = len(p1.lines) // 2
+        root_lines = p1.lines[:root_count]
         
         if not root_lines:
             return None
         
         # 获取根名称
-        root_match = re.search(r'CREATE\s+\w+\s+"([^"]+)"', lines1[0])
-        if not root_match:
+        root_name = p1.line_create_name[0]
+        if not root_name:
             return None
         
-        root_name = root_match.group(1)
+        # 已纳入结构的名称 (替代逐行子串查找)
+        present = set()
+        for i in range(root_count):
+            present.update(p1.tokens[i])
         
         # 从 s2 提取一些子结构并重新挂载
-        for line in lines2:
-            if line.strip().startswith("CREATE"):
+        for i, line in enumerate(p2.lines):
+            if p2.is_create[i]:
                 # 修改 UNDER 指向新的根
-                new_line = re.sub(r'UNDER\s+"[^"]+"', f'UNDER "{root_name}"', line)
+                new_line = p2.reparent_line(i, root_name)
                 root_lines.append(new_line)
-            elif "SET_PROP" in line or "LINK" in line:
+                present.update(new_line.split('"')[1::2])
+            elif p2.is_prop_or_link[i]:
                 # 检查这个操作的对象是否已经在我们的结构中
-                obj_match = re.search(r'"([^"]+)"', line)
-                if obj_match:
-                    obj_name = obj_match.group(1)
-                    if any(f'"{obj_name}"' in l for l in root_lines):
-                        root_lines.append(line)
+                obj_name = p2.first_quoted[i]
+                if obj_name and obj_name in present:
+                    root_lines.append(line)
+                    present.update(p2.tokens[i])
         
         return "\n".join(root_lines) if len(root_lines) > 3 else None
 
 
+# =============================================================================
+# V1.7: 解析器批量校验
+# =============================================================================
+
+class ParserValidator:
+    """
+    经 DSLParser.match_command 校验候选 DSL
+    - 每个非空、非注释行都必须被识别为某条指令 (正则完整匹配参数)
+    - 至少包含一条 CREATE
+    - 按批校验:先收集整批的不重复行逐一识别,再按样本汇总结果
+      (裂变变体之间大量共享行,行级结果在批间缓存复用)
+    """
+    
+    _SKIP_PREFIXES = ("#", "//")
+    
+    def __init__(self, max_cached: int = 50000):
+        self.parser = DSLParser()
+        self.max_cached = max_cached
+        self._line_kinds: Dict[str, Optional[str]] = {}
+    
+    def validate_batch(self, dsls: List[str]) -> List[bool]:
+        """批量校验,返回与输入等长的布尔列表"""
+        split = [dsl.split("\n") if dsl and len(dsl) >= 10 else None for dsl in dsls]
+        
+        line_kinds = self._line_kinds
+        if len(line_kinds) > self.max_cached:
+            line_kinds.clear()
+        
+        for lines in split:
+            if lines is None:
+                continue
+            for line in lines:
+                if line not in line_kinds:
+                    line_kinds[line] = self._line_kind(line)
+        
+        results = []
+        for lines in split:
+            if lines is None:
+                results.append(False)
+                continue
+            kinds = [line_kinds[line] for line in lines]
+            results.append(None not in kinds and "CREATE" in kinds)
+        return results
+    
+    def _line_kind(self, line: str) -> Optional[str]:
+        """单行指令类型;空行与注释返回空串,无法识别返回 None"""
+        line = line.strip()
+        if not line or line.startswith(self._SKIP_PREFIXES):
+            return ""
+        line = self.parser._LINE_NO_RE.sub('', line)
+        return self.parser.match_command(line)[0]
+
+
+# =============================================================================
+# V1.8: 流式输出 (外部打乱)
+# =============================================================================
+
+class ExternalShuffleWriter:
+    """
+    外部 (磁盘) 随机打乱写入器
+    - append:样本序列化后写入随机选中的桶文件 (临时目录与输出文件同盘)
+    - finish:逐桶读入内存、random.shuffle 后顺序写出,返回样本总数;
+      超过 max_bucket_bytes 的桶先在磁盘上再次随机拆分,内存中同时只有一个不超限的桶
+    每个样本独立均匀落桶,桶内再均匀打乱,整体即均匀随机排列
+    """
+    
+    MAX_BUCKETS = 256  # 同时打开的桶文件上限
+    
+    def __init__(self, output_path: str, num_buckets: int, max_bucket_bytes: int):
+        self.output_path = output_path
+        self.num_buckets = max(1, min(self.MAX_BUCKETS, num_buckets))
+        self.max_bucket_bytes = max_bucket_bytes
+        self._tmpdir = tempfile.TemporaryDirectory(
+            prefix=".fission_shuffle_",
+            dir=os.path.dirname(os.path.abspath(output_path))
+        )
+        self._buckets = [
+            open(os.path.join(self._tmpdir.name, f"bucket_{i:03d}.jsonl"), 'w', encoding='utf-8')
+            for i in range(self.num_buckets)
+        ]
+        self.count = 0
+    
+    def append(self, sample: Dict):
+        bucket = self._buckets[random.randrange(self.num_buckets)]
+        bucket.write(json.dumps(sample, ensure_ascii=False) + "\n")
+        self.count += 1
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def finish(self) -> int:
+        """逐桶打乱并写出最终文件"""
+        for bucket in self._buckets:
+            bucket.close()
+        with open(self.output_path, 'w', encoding='utf-8') as out:
+            for bucket in self._buckets:
+                self._drain(bucket.name, out)
+        self.close()
+        return self.count
+    
+    def _drain(self, path: str, out):
+        """
+        打乱一个桶并写出 (超限时先拆分为子桶),完成后删除桶文件
+        只有一行 (单行就超限) 或拆分没有进展 (所有行落入同一子桶) 时不再拆分,直接在内存中打乱
+        """
+        size = os.path.getsize(path)
+        if size <= self.max_bucket_bytes:
+            self._shuffle_in_memory(path, out)
+            return
+        num_parts = min(self.MAX_BUCKETS, 2 * -(-size // self.max_bucket_bytes))
+        part_paths = [f"{path}.{i}" for i in range(num_parts)]
+        parts = [open(p, 'w', encoding='utf-8') for p in part_paths]
+        line_count = 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts[random.randrange(num_parts)].write(line)
+                    line_count += 1
+        finally:
+            for part in parts:
+                part.close()
+        if line_count <= 1:
+            for part_path in part_paths:
+                os.remove(part_path)
+            self._shuffle_in_memory(path, out)
+            return
+        os.remove(path)
+        for part_path in part_paths:
+            if os.path.getsize(part_path) >= size:
+                self._shuffle_in_memory(part_path, out)
+            else:
+                self._drain(part_path, out)
+    
+    @staticmethod
+    def _shuffle_in_memory(path: str, out):
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        random.shuffle(lines)
+        out.writelines(lines)
+        os.remove(path)
+    
+    def close(self):
+        """关闭并清理临时桶 (可重复调用)"""
+        for bucket in self._buckets:
+            bucket.close()
+        self._tmpdir.cleanup()
+
+
+# =============================================================================
+# V1.9: 覆盖引导调度
+# =============================================================================
+
+_COVERAGE_PROP_RE = re.compile(r'SET_PROP\s+"[^"]+"\s+"(\w+)"')
+
+
+class CoverageScheduler:
+    """
+    覆盖引导的基础样本调度器
+    - 覆盖单元:root_type、指令类型 (CREATE/LINK/...)、SET_PROP 属性名;
+      单元计数 = 现有样本 (原始 + 已接受) 中包含该单元的数量,裂变样本沿用其基础样本的单元
+    - 两级抽样:先按 root_type 相对目标份额的缺口选类型,
+      再在类型内按样本最稀有单元的稀缺度 1/(1+count) 加权选样本
+    - 目标份额 ∝ 原始数量^power (0 = 各类型均分, 1 = 保持原比例)
+    - 饱和:连续 patience 个候选都未被接受的样本不再调度;全部饱和时 pick 返回 None
+    权重每 REFRESH_EVERY 次抽样重算一次,其间用预计算的累积权重抽样
+    """
+    
+    REFRESH_EVERY = 256
+    
+    def __init__(self, samples: List[Dict], power: float = 0.5, patience: int = 16):
+        self.samples = samples
+        self.patience = patience
+        self._index = {id(sample): i for i, sample in enumerate(samples)}
+        
+        self.root_types = [sample.get("meta", {}).get("root_type", "") for sample in samples]
+        self.cells = [self._sample_cells(sample.get("output", "")) for sample in samples]
+        self.by_root: Dict[str, List[int]] = defaultdict(list)
+        for i, root_type in enumerate(self.root_types):
+            self.by_root[root_type].append(i)
+        
+        # 目标份额与当前计数
+        weights = {rt: len(members) ** power for rt, members in self.by_root.items()}
+        total_weight = sum(weights.values())
+        self.target_share = {rt: w / total_weight for rt, w in weights.items()}
+        self.original_counts = {rt: len(members) for rt, members in self.by_root.items()}
+        self.root_counts = dict(self.original_counts)
+        self.cell_counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        for cells in self.cells:
+            for cell in cells:
+                self.cell_counts[cell] += 1
+        
+        self.fail_streak = [0] * len(samples)
+        self.saturated = [False] * len(samples)
+        self.saturated_count = 0
+        
+        self._picks_until_refresh = 0
+        self._root_choices: List[str] = []
+        self._root_cum: List[float] = []
+        self._member_cum: Dict[str, Tuple[List[int], List[float]]] = {}
+    
+    @staticmethod
+    def _sample_cells(dsl: str) -> Tuple[Tuple[str, str], ...]:
+        cells = set()
+        for line in dsl.split("\n"):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            cells.add(("cmd", line.split(None, 1)[0]))
+        for prop in _COVERAGE_PROP_RE.findall(dsl):
+            cells.add(("prop", prop))
+        return tuple(sorted(cells))
+    
+    def _refresh(self):
+        """重算两级抽样的累积权重 (只包含未饱和样本)"""
+        self._picks_until_refresh = self.REFRESH_EVERY
+        total = sum(self.root_counts.values()) + self.REFRESH_EVERY
+        
+        self._root_choices, root_weights = [], []
+        self._member_cum = {}
+        for root_type, members in self.by_root.items():
+            active = [i for i in members if not self.saturated[i]]
+            if not active:
+                continue
+            member_weights = [
+                max((1.0 / (1 + self.cell_counts[cell]) for cell in self.cells[i]), default=1.0)
+                for i in active
+            ]
+            self._member_cum[root_type] = (active, list(accumulate(member_weights)))
+            
+            deficit = self.target_share[root_type] * total - self.root_counts[root_type]
+            self._root_choices.append(root_type)
+            root_weights.append(max(deficit, 0.0))
+        
+        # 各类型都已达标时按目标份额抽样
+        if root_weights and sum(root_weights) <= 0:
+            root_weights = [self.target_share[rt] for rt in self._root_choices]
+        self._root_cum = list(accumulate(root_weights))
+    
+    def pick(self) -> Optional[Dict]:
+        """选择下一个基础样本;全部饱和时返回 None"""
+        while self.saturated_count < len(self.samples):
+            if self._picks_until_refresh <= 0:
+                self._refresh()
+            self._picks_until_refresh -= 1
+            
+            root_type = random.choices(self._root_choices, cum_weights=self._root_cum)[0]
+            active, cum = self._member_cum[root_type]
+            i = random.choices(active, cum_weights=cum)[0]
+            if not self.saturated[i]:
+                return self.samples[i]
+            # 本轮刷新后才饱和的样本:立即刷新重选
+            self._picks_until_refresh = 0
+        return None
+    
+    def record(self, base_sample: Dict, accepted: bool):
+        """反馈一个候选的结果:接受则更新覆盖计数,否则累计失败次数"""
+        i = self._index[id(base_sample)]
+        if accepted:
+            self.fail_streak[i] = 0
+            self.root_counts[self.root_types[i]] += 1
+            for cell in self.cells[i]:
+                self.cell_counts[cell] += 1
+        elif not self.saturated[i]:
+            self.fail_streak[i] += 1
+            if self.fail_streak[i] >= self.patience:
+                self.saturated[i] = True
+                self.saturated_count += 1
+    
+    def summary(self) -> List[str]:
+        """root_type 分布 (原始 -> 当前 / 目标份额) 与饱和情况"""
+        total = sum(self.root_counts.values())
+        lines = [f"覆盖调度: 饱和样本 {self.saturated_count}/{len(self.samples)}"]
+        for root_type, count in sorted(self.root_counts.items(), key=lambda kv: -kv[1]):
+            lines.append(
+                f"  {root_type or '(未知)'}: {self.original_counts[root_type]} -> {count} "
+                f"({count / total * 100:.1f}%, 目标 {self.target_share[root_type] * 100:.1f}%)"
+            )
+        return lines
+
+
 # =============================================================================
 # 主处理流程
 # =============================================================================
@@ -715,16 +1323,54 @@ class DSLFission:
 class FissionProcessor:
     """裂变处理器"""
     
-    def __init__(self):
-        self.pool = ParameterPool()
+    # V1.8: 流式模式下跨样本组合池中保留的已裂变样本上限 / 并行单任务配额上限
+    STREAM_COMBINE_LIMIT = 5000
+    STREAM_TASK_QUOTA = 20000
+    
+    def __init__(self, dedupe_mode: str = "exact", near_threshold: float = 0.9,
+                 pool_path: Optional[str] = None, weighted_pool: bool = False,
+                 validate_mode: str = "basic", validate_batch: int = 64,
+                 schedule: str = "uniform", coverage_power: float = 0.5):
+        self.pool = ParameterPool(weighted=weighted_pool)
         self.fission = None
+        
+        # V1.9: 基础样本调度 (uniform: 均匀随机; coverage: 覆盖引导)
+        self.schedule = schedule
+        self.coverage_power = coverage_power
+        self.iterations = 0
+        
+        # V1.7: 候选校验方式 (basic: 前缀检查,逐个; parser: DSLParser 指令识别,按批)
+        if validate_mode == "parser" and DSLParser is None:
+            print("⚠️ 警告: 无法导入 DSLParser,--validate parser 回退为 basic")
+            validate_mode = "basic"
+        self.validate_mode = validate_mode
+        self.validate_batch = validate_batch if validate_mode == "parser" else 1
+        self.validator = ParserValidator() if validate_mode == "parser" else None
+        self.validate_stats = {"checked": 0, "rejected": 0}
+        
+        # V1.8: 跨样本组合池上限 (None = 保留全部已裂变样本)
+        self.combine_limit: Optional[int] = None
+        self._combine_base = 0
+        self._combine_seen = 0
+        
+        # V1.6: 参数池缓存文件 (输入未变化时直接加载,跳过逐样本提取)
+        self.pool_path = pool_path
+        
+        # V1.2: 哈希去重索引 (exact: 规范化文本判重; near: MinHash 近似判重)
+        self.dedupe_mode = dedupe_mode
+        self.near_threshold = near_threshold
+        self.dedupe = DedupeIndex(mode=dedupe_mode, threshold=near_threshold)
     
     def process(
         self,
         input_path: str,
         output_path: str,
         target_count: int,
-        level: str = "simple"
+        level: str = "simple",
+        workers: int = 1,
+        seed: Optional[int] = None,
+        stream: bool = False,
+        shuffle_mb: int = 64
     ) -> Tuple[int, int]:
         """
         处理 JSONL 文件进行裂变
@@ -734,6 +1380,10 @@ class FissionProcessor:
             output_path: 输出文件
             target_count: 目标样本数
             level: 裂变级别 (simple/medium/advanced/auto)
+            workers: 并行进程数 (1 = 单进程,沿用全局 random)
+            seed: 并行模式的主种子 (None 时从全局 random 派生)
+            stream: 流式写出 + 外部打乱 (不在内存中保留裂变样本)
+            shuffle_mb: 流式模式单个打乱桶的目标大小 (MB),决定打乱阶段的内存占用
             
         Returns:
             (原始数量, 最终数量)
@@ -742,6 +1392,17 @@ class FissionProcessor:
         print("📊 第一阶段:分析现有数据,构建参数池...")
         samples = []
         
+        pool_loaded = False
+        fingerprint = ParameterPool.source_fingerprint(input_path)
+        if self.pool_path and os.path.exists(self.pool_path):
+            loaded = ParameterPool.load(self.pool_path, fingerprint, self.pool.weighted)
+            if loaded is not None:
+                self.pool = loaded
+                pool_loaded = True
+                print(f"   ♻️  已加载参数池缓存: {self.pool_path}")
+            else:
+                print(f"   ⚠️ 参数池缓存已过期或损坏,重新构建: {self.pool_path}")
+        
         with open(input_path, 'r', encoding='utf-8') as f:
             for line in f:
                 if not line.strip():
@@ -749,10 +1410,15 @@ class FissionProcessor:
                 try:
                     data = json.loads(line)
                     samples.append(data)
-                    self.pool.extract_from_dsl(data.get("output", ""))
+                    if not pool_loaded:
+                        self.pool.extract_from_dsl(data.get("output", ""))
                 except:
                     pass
         
+        if self.pool_path and not pool_loaded:
+            self.pool.save(self.pool_path, fingerprint)
+            print(f"   💾 参数池已保存: {self.pool_path}")
+        
         original_count = len(samples)
         print(f"   原始样本: {original_count}")
         print(f"   Bus 类型: {len(self.pool.buses)}")
@@ -778,97 +1444,317 @@ class FissionProcessor:
         # 第二遍:裂变
         print(f"\n🔬 第二阶段:执行 {level} 级别裂变...")
         
-        new_samples = []
-        iterations = 0
-        max_iterations = needed * 10  # 防止无限循环
-        
         # 提取所有 DSL 代码用于高级裂变
         all_dsl = [s.get("output", "") for s in samples]
         
-        while len(new_samples) < needed and iterations < max_iterations:
-            iterations += 1
-            
-            # 随机选择一个样本进行裂变
-            base_sample = random.choice(samples)
-            base_dsl = base_sample.get("output", "")
-            root_type = base_sample.get("meta", {}).get("root_type", "")
-            
-            fissioned = []
-            
-            # V1.1: 根据类型选择裂变方法
-            if root_type == "Attenuation":
-                fissioned = self.fission.fission_attenuation(base_dsl, 2)
-            elif root_type == "GameParameter":
-                fissioned = self.fission.fission_game_parameter(base_dsl, 2)
-            elif root_type == "SwitchGroup":
-                fissioned = self.fission.fission_switch_group(base_dsl, 2)
-            elif root_type == "StateGroup":
-                fissioned = self.fission.fission_state_group(base_dsl, 2)
+        # V1.2: 原始样本先入去重索引 (替代 new_dsl not in all_dsl 的线性查找)
+        for dsl in all_dsl:
+            self.dedupe.add(dsl)
+        
+        if stream:
+            final_count = self._process_stream(samples, all_dsl, needed, level, workers, seed,
+                                               output_path, target_count, shuffle_mb)
+        else:
+            if workers > 1:
+                new_samples = self._generate_parallel(samples, all_dsl, needed, level, workers, seed)
             else:
-                # 原有的容器类型裂变逻辑
-                if level == "simple":
-                    fissioned = self.fission.fission_simple(base_dsl, 2)
-                elif level == "medium":
-                    fissioned = self.fission.fission_simple(base_dsl, 1)
-                    fissioned += self.fission.fission_medium(base_dsl, 1)
-                elif level == "advanced":
-                    fissioned = self.fission.fission_simple(base_dsl, 1)
-                    fissioned += self.fission.fission_medium(base_dsl, 1)
-                    fissioned += self.fission.fission_advanced(all_dsl, 1)
-                elif level == "auto":
-                    # 自动选择
-                    r = random.random()
-                    if r < 0.5:
-                        fissioned = self.fission.fission_simple(base_dsl, 2)
-                    elif r < 0.8:
-                        fissioned = self.fission.fission_medium(base_dsl, 2)
-                    else:
-                        fissioned = self.fission.fission_advanced(all_dsl, 1)
+                new_samples = self._generate(samples, all_dsl, needed, level)
             
-            # 验证并添加
-            for new_dsl in fissioned:
-                if self._validate_dsl(new_dsl) and new_dsl not in all_dsl:
-                    # 创建新样本
-                    new_sample = copy.deepcopy(base_sample)
-                    new_sample["output"] = new_dsl
-                    new_sample["meta"]["fissioned"] = True
-                    new_sample["meta"]["fission_level"] = level
-                    
-                    # 更新 instruction(简单变化)
-                    new_sample["instruction"] = self._mutate_instruction(
-                        base_sample.get("instruction", "")
-                    )
-                    
-                    new_samples.append(new_sample)
-                    all_dsl.append(new_dsl)
-                    
-                    if len(new_samples) >= needed:
-                        break
+            # 写入结果
+            print(f"\n📝 第三阶段:写入结果...")
             
-            # 进度显示
-            if iterations % 100 == 0:
-                print(f"   已生成 {len(new_samples)}/{needed} ...")
-        
-        # 写入结果
-        print(f"\n📝 第三阶段:写入结果...")
-        
-        final_samples = samples + new_samples
-        random.shuffle(final_samples)  # 打乱顺序
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            for s in final_samples:
-                f.write(json.dumps(s, ensure_ascii=False) + "\n")
-        
-        final_count = len(final_samples)
+            final_samples = samples + new_samples
+            random.shuffle(final_samples)  # 打乱顺序
+            
+            with open(output_path, 'w', encoding='utf-8') as f:
+                for s in final_samples:
+                    f.write(json.dumps(s, ensure_ascii=False) + "\n")
+            
+            final_count = len(final_samples)
         
         print(f"\n📊 裂变统计:")
         print(f"   名称变异: {self.fission.stats['name_mutations']}")
         print(f"   参数替换: {self.fission.stats['parameter_swaps']}")
         print(f"   子集提取: {self.fission.stats['subset_extractions']}")
         print(f"   结构简化: {self.fission.stats['structure_simplifications']}")
+        print(f"   裂变迭代: {self.iterations}")
+        print(f"   语法拒绝: {self.validate_stats['rejected']}/{self.validate_stats['checked']} "
+              f"({self.validate_mode})")
+        print(f"   重复拒绝: {self.dedupe.stats['exact_duplicates']} (精确) / "
+              f"{self.dedupe.stats['near_duplicates']} (近似)")
         
         return original_count, final_count
     
+    def _process_stream(
+        self,
+        samples: List[Dict],
+        all_dsl: List[str],
+        needed: int,
+        level: str,
+        workers: int,
+        seed: Optional[int],
+        output_path: str,
+        target_count: int,
+        shuffle_mb: int
+    ) -> int:
+        """V1.8: 流式裂变,样本接受后直接写入打乱桶,返回最终样本数"""
+        self.combine_limit = self.STREAM_COMBINE_LIMIT
+        
+        # 按原始样本的平均序列化大小预估桶数 (估少时由 finish 阶段拆分兜底)
+        max_bucket_bytes = shuffle_mb * 1024 * 1024
+        avg_bytes = sum(
+            len(json.dumps(s, ensure_ascii=False).encode('utf-8')) for s in samples
+        ) / max(1, len(samples))
+        num_buckets = -(-int(target_count * avg_bytes) // max_bucket_bytes)
+        writer = ExternalShuffleWriter(output_path, num_buckets, max_bucket_bytes)
+        try:
+            print(f"   流式写出: {writer.num_buckets} 个打乱桶")
+            if workers > 1:
+                self._generate_parallel(samples, all_dsl, needed, level, workers, seed, sink=writer)
+            else:
+                self._generate(samples, all_dsl, needed, level, sink=writer)
+            
+            # 原始样本最后入桶 (生成循环按 len(sink) 计数,只应包含新样本)
+            for s in samples:
+                writer.append(s)
+            
+            print(f"\n📝 第三阶段:外部打乱并写入结果...")
+            return writer.finish()
+        finally:
+            writer.close()
+    
+    def _fission_sample(self, base_sample: Dict, level: str, all_dsl: List[str]) -> List[str]:
+        """对单个样本执行一次裂变,返回候选 DSL 列表"""
+        base_dsl = base_sample.get("output", "")
+        root_type = base_sample.get("meta", {}).get("root_type", "")
+        
+        fissioned = []
+        
+        # V1.1: 根据类型选择裂变方法
+        if root_type == "Attenuation":
+            fissioned = self.fission.fission_attenuation(base_dsl, 2)
+        elif root_type == "GameParameter":
+            fissioned = self.fission.fission_game_parameter(base_dsl, 2)
+        elif root_type == "SwitchGroup":
+            fissioned = self.fission.fission_switch_group(base_dsl, 2)
+        elif root_type == "StateGroup":
+            fissioned = self.fission.fission_state_group(base_dsl, 2)
+        else:
+            # 原有的容器类型裂变逻辑
+            if level == "simple":
+                fissioned = self.fission.fission_simple(base_dsl, 2)
+            elif level == "medium":
+                fissioned = self.fission.fission_simple(base_dsl, 1)
+                fissioned += self.fission.fission_medium(base_dsl, 1)
+            elif level == "advanced":
+                fissioned = self.fission.fission_simple(base_dsl, 1)
+                fissioned += self.fission.fission_medium(base_dsl, 1)
+                fissioned += self.fission.fission_advanced(all_dsl, 1)
+            elif level == "auto":
+                # 自动选择
+                r = random.random()
+                if r < 0.5:
+                    fissioned = self.fission.fission_simple(base_dsl, 2)
+                elif r < 0.8:
+                    fissioned = self.fission.fission_medium(base_dsl, 2)
+                else:
+                    fissioned = self.fission.fission_advanced(all_dsl, 1)
+        
+        return fissioned
+    
+    def _make_sample(self, base_sample: Dict, new_dsl: str, level: str) -> Dict:
+        """基于原样本创建裂变样本 (V1.8: 浅层结构复制,只复制被修改的顶层与 meta 字典)"""
+        new_sample = dict(base_sample)
+        new_sample["meta"] = dict(base_sample["meta"])
+        new_sample["output"] = new_dsl
+        new_sample["meta"]["fissioned"] = True
+        new_sample["meta"]["fission_level"] = level
+        
+        # 更新 instruction(简单变化)
+        new_sample["instruction"] = self._mutate_instruction(
+            base_sample.get("instruction", "")
+        )
+        return new_sample
+    
+    def _generate(
+        self,
+        samples: List[Dict],
+        all_dsl: List[str],
+        needed: int,
+        level: str,
+        show_progress: bool = True,
+        sink=None
+    ) -> List[Dict]:
+        """
+        单进程裂变循环:随机选样本裂变,验证并去重后收集,直到数量达标
+        V1.7: 候选先进入待校验队列,攒满 validate_batch 个后统一校验
+        (basic 模式批大小为 1,与逐个校验等价)
+        V1.8: sink 为支持 append/len 的写入器时,样本直接交给它而不在内存中累积
+        V1.9: coverage 调度时由 CoverageScheduler 选样本,全部饱和即提前结束
+        """
+        new_samples = [] if sink is None else sink
+        self._combine_base = len(all_dsl)
+        self._combine_seen = 0
+        scheduler = None
+        if self.schedule == "coverage":
+            scheduler = CoverageScheduler(samples, self.coverage_power)
+        pending: List[Tuple[Dict, str]] = []
+        iterations = 0
+        max_iterations = needed * 10  # 防止无限循环
+        
+        while len(new_samples) < needed and iterations < max_iterations:
+            # 选择一个样本进行裂变
+            if scheduler is None:
+                base_sample = random.choice(samples)
+            else:
+                base_sample = scheduler.pick()
+                if base_sample is None:
+                    if show_progress:
+                        print(f"   ⚠️ 所有样本均已饱和,提前结束")
+                    break
+            iterations += 1
+            
+            for new_dsl in self._fission_sample(base_sample, level, all_dsl):
+                pending.append((base_sample, new_dsl))
+            
+            # 验证并添加
+            if len(pending) >= self.validate_batch:
+                self._accept_batch(pending, new_samples, all_dsl, needed, level, scheduler)
+                pending = []
+            
+            # 进度显示
+            if show_progress and iterations % 100 == 0:
+                print(f"   已生成 {len(new_samples)}/{needed} ...")
+        
+        if pending:
+            self._accept_batch(pending, new_samples, all_dsl, needed, level, scheduler)
+        
+        self.iterations += iterations
+        if scheduler is not None and show_progress:
+            for line in scheduler.summary():
+                print(f"   {line}")
+        
+        return new_samples
+    
+    def _accept_batch(
+        self,
+        pending: List[Tuple[Dict, str]],
+        new_samples: List[Dict],
+        all_dsl: List[str],
+        needed: int,
+        level: str,
+        scheduler: Optional[CoverageScheduler] = None
+    ):
+        """校验一批候选,按顺序去重后收集 (数量达标即停止;结果反馈给调度器)"""
+        if self.validator is not None:
+            valid = self.validator.validate_batch([dsl for _, dsl in pending])
+        else:
+            valid = [self._validate_dsl(dsl) for _, dsl in pending]
+        
+        for (base_sample, new_dsl), ok in zip(pending, valid):
+            if len(new_samples) >= needed:
+                break
+            self.validate_stats["checked"] += 1
+            if not ok:
+                self.validate_stats["rejected"] += 1
+                accepted = False
+            else:
+                accepted = self.dedupe.add(new_dsl)
+            if accepted:
+                new_samples.append(self._make_sample(base_sample, new_dsl, level))
+                self._remember_dsl(all_dsl, new_dsl)
+            if scheduler is not None:
+                scheduler.record(base_sample, accepted)
+    
+    def _remember_dsl(self, all_dsl: List[str], new_dsl: str):
+        """
+        已接受的样本加入跨样本组合池
+        V1.8: 设置 combine_limit 后,超出部分按蓄水池抽样替换 (原始样本始终保留)
+        """
+        if self.combine_limit is None:
+            all_dsl.append(new_dsl)
+            return
+        self._combine_seen += 1
+        if self._combine_seen <= self.combine_limit:
+            all_dsl.append(new_dsl)
+        else:
+            slot = random.randrange(self._combine_seen)
+            if slot < self.combine_limit:
+                all_dsl[self._combine_base + slot] = new_dsl
+    
+    def _generate_parallel(
+        self,
+        samples: List[Dict],
+        all_dsl: List[str],
+        needed: int,
+        level: str,
+        workers: int,
+        seed: Optional[int],
+        sink=None
+    ) -> List[Dict]:
+        """
+        V1.3: 多进程裂变
+        - 原始样本按 i::workers 轮转分片,每个 worker 一份
+        - 每个任务以 (主种子, 轮次, worker 编号) 派生独立随机流
+        - 结果按 worker 编号顺序经主去重索引合并;跨 worker 重复被丢弃后不足的部分进入下一轮
+        - V1.7: 语法校验在 worker 内完成,主进程合并时只做去重
+        - V1.8: 流式模式 (sink) 下单任务配额有上限,按轮分批返回,限制进程间传输与内存
+        主种子与 worker 数固定时,输出逐字节一致
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        
+        shares = [samples[i::workers] for i in range(workers)]
+        shares = [s for s in shares if s]
+        
+        new_samples = [] if sink is None else sink
+        round_idx = 0
+        max_rounds = 10  # 防止无限循环 (与单进程 needed*10 的迭代上限对应)
+        quota_cap = None
+        if sink is not None:
+            quota_cap = self.STREAM_TASK_QUOTA
+            max_rounds += -(-needed // (quota_cap * len(shares)))
+        
+        with multiprocessing.Pool(
+            len(shares),
+            initializer=_init_fission_worker,
+            initargs=(self.pool, all_dsl, level, self.dedupe_mode, self.near_threshold,
+                      self.validate_mode, self.validate_batch, self.combine_limit,
+                      self.schedule, self.coverage_power)
+        ) as mp_pool:
+            while len(new_samples) < needed and round_idx < max_rounds:
+                remaining = needed - len(new_samples)
+                # 多要 10%,抵消跨 worker 重复
+                quota = -(-remaining * 11 // 10 // len(shares))
+                if quota_cap is not None:
+                    quota = min(quota, quota_cap)
+                tasks = [
+                    (f"{seed}:{round_idx}:{worker_id}", share, quota)
+                    for worker_id, share in enumerate(shares)
+                ]
+                
+                accepted = 0
+                for worker_samples, worker_stats, worker_validate_stats, worker_iterations in mp_pool.map(
+                        _run_fission_worker, tasks):
+                    self.iterations += worker_iterations
+                    for key, value in worker_stats.items():
+                        self.fission.stats[key] += value
+                    for key, value in worker_validate_stats.items():
+                        self.validate_stats[key] += value
+                    for sample in worker_samples:
+                        if len(new_samples) >= needed:
+                            break
+                        if self.dedupe.add(sample["output"]):
+                            new_samples.append(sample)
+                            accepted += 1
+                
+                round_idx += 1
+                print(f"   第 {round_idx} 轮: +{accepted},已生成 {len(new_samples)}/{needed} ...")
+                if accepted == 0:
+                    break
+        
+        return new_samples
+    
     def _validate_dsl(self, dsl: str) -> bool:
         """验证 DSL 基本语法"""
         if not dsl or len(dsl) < 10:
@@ -924,6 +1810,119 @@ class FissionProcessor:
         return result
 
 
+# =============================================================================
+# V1.3: 并行裂变 worker
+# =============================================================================
+
+_WORKER_PROCESSOR: Optional[FissionProcessor] = None
+_WORKER_CONTEXT: Dict = {}
+
+
+def _init_fission_worker(pool: ParameterPool, all_dsl: List[str], level: str,
+                         dedupe_mode: str, near_threshold: float,
+                         validate_mode: str = "basic", validate_batch: int = 64,
+                         combine_limit: Optional[int] = None,
+                         schedule: str = "uniform", coverage_power: float = 0.5):
+    """worker 进程初始化:共享参数池与原始样本 DSL"""
+    global _WORKER_PROCESSOR, _WORKER_CONTEXT
+    processor = FissionProcessor(dedupe_mode=dedupe_mode, near_threshold=near_threshold,
+                                 validate_mode=validate_mode, validate_batch=validate_batch,
+                                 schedule=schedule, coverage_power=coverage_power)
+    processor.combine_limit = combine_limit
+    processor.pool = pool
+    processor.fission = DSLFission(pool)
+    _WORKER_PROCESSOR = processor
+    _WORKER_CONTEXT = {"all_dsl": all_dsl, "level": level}
+
+
+def _run_fission_worker(task: Tuple[str, List[Dict], int]) -> Tuple[List[Dict], Dict, Dict, int]:
+    """
+    执行一个裂变任务 (任务种子, 样本分片, 配额)
+    每个任务重置随机流、去重索引与统计,结果只取决于任务参数,与被调度到哪个进程无关
+    """
+    task_seed, share, quota = task
+    random.seed(task_seed)
+    
+    processor = _WORKER_PROCESSOR
+    processor.dedupe = DedupeIndex(mode=processor.dedupe_mode, threshold=processor.near_threshold)
+    processor.fission.stats = {key: 0 for key in processor.fission.stats}
+    processor.validate_stats = {key: 0 for key in processor.validate_stats}
+    processor.iterations = 0
+    
+    all_dsl = list(_WORKER_CONTEXT["all_dsl"])
+    for dsl in all_dsl:
+        processor.dedupe.add(dsl)
+    
+    new_samples = processor._generate(share, all_dsl, quota, _WORKER_CONTEXT["level"],
+                                      show_progress=False)
+    return new_samples, processor.fission.stats, processor.validate_stats, processor.iterations
+
+
+# =============================================================================
+# 基准测试
+# =============================================================================
+
+def benchmark(input_path: str, targets: List[int], level: str = "simple",
+              seed: int = 42, dedupe_mode: str = "exact"):
+    """
+    按不同目标数运行完整裂变流程,验证耗时随目标数线性增长
+    (每个目标数使用相同种子;输出写入临时文件后删除)
+    
+    单独统计去重索引耗时:整体单样本耗时还受样本平均行数影响
+    (advanced/auto 级别会组合已裂变样本,目标数越大样本越长)
+    """
+    print(f"⏱️  裂变基准测试 (level={level}, dedupe={dedupe_mode}, seed={seed})")
+    print(f"   {'目标数':>8} {'生成数':>8} {'耗时(s)':>9} {'单样本(µs)':>11} "
+          f"{'去重/次(µs)':>11} {'平均行数':>8}")
+    
+    rows = []
+    for target in targets:
+        fd, out_path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        try:
+            random.seed(seed)
+            processor = FissionProcessor(dedupe_mode=dedupe_mode)
+            
+            # 计时包装去重索引
+            dedupe_time = [0.0, 0]
+            raw_add = processor.dedupe.add
+            
+            def timed_add(dsl, _raw=raw_add, _acc=dedupe_time):
+                t0 = time.perf_counter()
+                ok = _raw(dsl)
+                _acc[0] += time.perf_counter() - t0
+                _acc[1] += 1
+                return ok
+            
+            processor.dedupe.add = timed_add
+            
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                original, final = processor.process(input_path, out_path, target, level)
+            elapsed = time.perf_counter() - start
+            
+            with open(out_path, 'r', encoding='utf-8') as f:
+                total_lines = sum(json.loads(line).get("output", "").count("\n") + 1 for line in f)
+        finally:
+            os.remove(out_path)
+        
+        per_sample = elapsed / max(1, final) * 1e6
+        per_dedupe = dedupe_time[0] / max(1, dedupe_time[1]) * 1e6
+        avg_lines = total_lines / max(1, final)
+        rows.append((target, final, elapsed, per_sample, per_dedupe, avg_lines))
+        print(f"   {target:>8} {final:>8} {elapsed:>9.2f} {per_sample:>11.1f} "
+              f"{per_dedupe:>11.1f} {avg_lines:>8.1f}")
+    
+    # 线性度:最大/最小单次耗时之比 (接近 1 表示线性)
+    if len(rows) >= 2:
+        per = [r[3] for r in rows]
+        per_dedupe = [r[4] for r in rows]
+        print(f"   单样本耗时波动: {max(per) / min(per):.2f}x, "
+              f"去重单次耗时波动: {max(per_dedupe) / min(per_dedupe):.2f}x (≈1 为线性)")
+    
+    return rows
+
+
 # =============================================================================
 # 命令行入口
 # =============================================================================
@@ -953,14 +1952,41 @@ def main():
     
     parser.add_argument("input", help="输入 JSONL 文件")
     parser.add_argument("output", help="输出 JSONL 文件")
-    parser.add_argument("-t", "--target", type=int, required=True,
-                        help="目标样本数量")
+    parser.add_argument("-t", "--target", type=int, default=None,
+                        help="目标样本数量 (--benchmark 时可省略)")
     parser.add_argument("-l", "--level", 
                         choices=["simple", "medium", "advanced", "auto"],
                         default="simple",
                         help="裂变级别 (默认: simple)")
     parser.add_argument("--seed", type=int, default=None,
                         help="随机种子(用于复现)")
+    parser.add_argument("--dedupe", choices=["exact", "near"], default="exact",
+                        help="去重模式: exact 规范化文本判重 / near MinHash 近似判重 (默认: exact)")
+    parser.add_argument("--near-threshold", type=float, default=0.9,
+                        help="near 模式的 Jaccard 相似度阈值 (默认: 0.9)")
+    parser.add_argument("--pool", type=str, default=None,
+                        help="参数池缓存文件 (存在且输入未变化时直接加载,否则构建后保存)")
+    parser.add_argument("--weighted-pool", action="store_true",
+                        help="参数池按出现频次加权抽样 (默认均匀抽样)")
+    parser.add_argument("--validate", choices=["basic", "parser"], default="basic",
+                        help="候选校验: basic 前缀检查 / parser 经 DSLParser 指令识别 (默认: basic)")
+    parser.add_argument("--validate-batch", type=int, default=64,
+                        help="parser 校验的批大小 (默认: 64)")
+    parser.add_argument("--schedule", choices=["uniform", "coverage"], default="uniform",
+                        help="基础样本调度: uniform 均匀随机 / coverage 覆盖引导 (默认: uniform)")
+    parser.add_argument("--coverage-power", type=float, default=0.5,
+                        help="coverage 调度的 root_type 目标份额 ∝ 原始数量^power "
+                             "(0 = 均分, 1 = 保持原比例,默认: 0.5)")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式写出 + 磁盘外部打乱 (百万级目标数时使用,内存占用与目标数无关)")
+    parser.add_argument("--shuffle-mb", type=int, default=64,
+                        help="流式模式单个打乱桶的目标大小 MB,打乱时整桶读入内存 (默认: 64)")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="并行进程数 (默认: 1;配合 --seed 时输出可复现)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="运行扩展性基准测试 (忽略 output)")
+    parser.add_argument("--bench-targets", type=str, default="5000,10000,25000,50000,100000",
+                        help="基准测试的目标数列表,逗号分隔")
     
     args = parser.parse_args()
     
@@ -968,24 +1994,51 @@ def main():
         print(f"❌ 输入文件不存在: {args.input}")
         return
     
+    if args.benchmark:
+        targets = [int(t) for t in args.bench_targets.split(",") if t.strip()]
+        benchmark(args.input, targets, args.level,
+                  args.seed if args.seed is not None else 42, args.dedupe)
+        return
+    
+    if args.target is None:
+        parser.error("需要指定 --target")
+    
     if args.seed:
         random.seed(args.seed)
     
     print("=" * 70)
-    print("🔬 DSL Sample Fission V1.0")
+    print("🔬 DSL Sample Fission V1.9")
     print("=" * 70)
     print(f"   输入: {args.input}")
     print(f"   输出: {args.output}")
     print(f"   目标: {args.target} 样本")
     print(f"   级别: {args.level}")
+    print(f"   去重: {args.dedupe}")
+    print(f"   校验: {args.validate}")
+    print(f"   调度: {args.schedule}")
+    print(f"   进程: {args.workers}")
+    print(f"   写出: {'流式 (外部打乱)' if args.stream else '内存'}")
     print("-" * 70)
     
-    processor = FissionProcessor()
+    processor = FissionProcessor(
+        dedupe_mode=args.dedupe,
+        near_threshold=args.near_threshold,
+        pool_path=args.pool,
+        weighted_pool=args.weighted_pool,
+        validate_mode=args.validate,
+        validate_batch=args.validate_batch,
+        schedule=args.schedule,
+        coverage_power=args.coverage_power
+    )
     original, final = processor.process(
         args.input,
         args.output,
         args.target,
-        args.level
+        args.level,
+        workers=args.workers,
+        seed=args.seed,
+        stream=args.stream,
+        shuffle_mb=args.shuffle_mb
     )
     
     print("-" * 70)
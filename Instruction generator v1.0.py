@@ -1,9 +1,21 @@
 # -*- coding: utf-8 -*-
 """
-[指令生成器]Instruction Generator V1.1
+[指令生成器]Instruction Generator V1.3
 功能:为 DSL 训练数据生成专业的自然语言指令
 模拟资深游戏音频设计师 / 制作人的口吻
 
+更新 V1.3:
+1. [Perf] TemplateSet:指令模板在类定义时预拆分为 (字面量, 槽位名) 片段,每条样本只渲染选中的一条
+2. [Perf] DSLFacts:参数类型样本的 Switch/State 列表、衰减半径、参数范围等结构信息按需提取、共用一份
+3. [Perf] NameAnalyzer 每条样本只分析一次,命中相同类别组合的名称共用特征字典
+4. 随机数消耗顺序与 V1.2 一致,固定 --seed 时输出逐字节不变
+
+更新 V1.2:
+1. [Perf] --workers:按块 (--chunk-size 行) 分发到进程池并行生成,按块顺序写出,输出顺序与输入一致
+2. [Feat] --seed:每块使用由主种子派生的独立随机流,种子固定时输出与 worker 数无关、逐字节一致
+3. [Perf] 流式读写,同时在途的块数有上限,内存占用与文件大小无关
+4. [Perf] NameAnalyzer 改用 keyword_matcher.KeywordAutomaton 单遍匹配全部关键词类别,结果按名称缓存
+
 更新 V1.1:
 1. [Feat] 支持 Attenuation 衰减曲线指令生成
 2. [Feat] 支持 GameParameter RTPC参数指令生成
@@ -18,17 +30,23 @@
 4. 支持中英文混合(行业习惯)
 
 作者: NeuroWwise Team
-版本: V1.1
+版本: V1.3
 """
 
 import json
 import random
 import re
+import string
 import argparse
 import os
-from typing import List, Dict, Optional, Tuple
+import multiprocessing
+from collections import deque
+from itertools import islice
+from typing import List, Dict, FrozenSet, Optional, Tuple, Iterator
 from dataclasses import dataclass
 
+from keyword_matcher import KeywordAutomaton
+
 
 # =============================================================================
 # 随机词库 - 模拟真实的音频设计师表达习惯
@@ -234,21 +252,34 @@ class NameAnalyzer:
         "class_ty": ["_TY", "TY_", "通用"],
     }
     
+    _matcher: Optional[KeywordAutomaton] = None
+    _features_by_hits: Dict[FrozenSet[str], Dict[str, bool]] = {}
+    
+    @classmethod
+    def get_matcher(cls) -> KeywordAutomaton:
+        """KEYWORD_PATTERNS 编译出的关键词自动机 (首次使用时构建)"""
+        if cls._matcher is None:
+            cls._matcher = KeywordAutomaton.from_mapping(cls.KEYWORD_PATTERNS)
+        return cls._matcher
+    
     @classmethod
     def analyze(cls, name: str, source: str = "") -> Dict[str, bool]:
-        """分析名称,返回特征标记"""
-        features = {}
-        combined = f"{name} {source}"
-        
-        for feature, keywords in cls.KEYWORD_PATTERNS.items():
-            features[feature] = any(kw in combined for kw in keywords)
-        
+        """
+        分析名称,返回特征标记 (V1.2: 单遍扫描命中全部类别,同名结果缓存)
+        V1.3: 命中相同类别组合的名称共用同一个特征字典 (只读,调用方不要修改)
+        """
+        hits = cls.get_matcher().categories(f"{name} {source}")
+        features = cls._features_by_hits.get(hits)
+        if features is None:
+            features = {feature: feature in hits for feature in cls.KEYWORD_PATTERNS}
+            cls._features_by_hits[hits] = features
         return features
     
     @classmethod
-    def get_context_type(cls, name: str, source: str = "") -> str:
-        """获取主要业务场景类型"""
-        features = cls.analyze(name, source)
+    def get_context_type(cls, name: str, source: str = "", features: Optional[Dict[str, bool]] = None) -> str:
+        """获取主要业务场景类型 (V1.3: 可传入已有的 analyze() 结果,避免重复分析)"""
+        if features is None:
+            features = cls.analyze(name, source)
         
         if features.get("boss"):
             return "boss"
@@ -268,6 +299,100 @@ class NameAnalyzer:
         return "general"
 
 
+# =============================================================================
+# V1.3: 指令模板引擎 / DSL 结构信息
+# =============================================================================
+
+_TEMPLATE_FORMATTER = string.Formatter()
+
+_SWITCH_RE = re.compile(r'CREATE Switch "([^"]+)"')
+_STATE_RE = re.compile(r'CREATE State "([^"]+)"')
+_RADIUS_MAX_RE = re.compile(r'RadiusMax.*?=\s*(\d+)')
+_MIN_VALUE_RE = re.compile(r'"Min".*?=\s*([-\d.]+)')
+_MAX_VALUE_RE = re.compile(r'"Max".*?=\s*([-\d.]+)')
+
+
+class TemplateSet:
+    """
+    预编译的指令模板组
+    - 模板写成带 {槽位} 占位符的普通字符串,构建时逐条拆成 ((字面量, 槽位名), ...) 片段
+    - 每条样本只渲染被选中的那一条 (不再把整组模板全部拼好再挑一条)
+    - render() 与 random.choice(模板列表) 消耗的随机数相同,固定种子时输出不变
+    """
+    
+    def __init__(self, templates: List[str]):
+        self.templates = list(templates)
+        self._parts = [self._split(t) for t in self.templates]
+    
+    @staticmethod
+    def _split(template: str) -> Tuple[Tuple[str, Optional[str]], ...]:
+        """拆分单条模板:"{a}的{b}" -> (("", "a"), ("的", "b"));末尾字面量的槽位名为 None"""
+        parts = []
+        for literal, field, spec, conversion in _TEMPLATE_FORMATTER.parse(template):
+            if field is not None and (spec or conversion or not field.isidentifier()):
+                raise ValueError(f"模板只支持 {{槽位}} 形式的占位符: {template}")
+            parts.append((literal, field))
+        return tuple(parts)
+    
+    def render(self, slots: Dict) -> str:
+        """随机选一条模板并填充槽位"""
+        parts = random.choice(self._parts)
+        return "".join([literal if field is None else literal + format(slots[field])
+                        for literal, field in parts])
+    
+    def __len__(self) -> int:
+        return len(self.templates)
+
+
+class DSLFacts:
+    """
+    单条样本 DSL 的结构化信息 (Switch/State 列表、衰减半径、参数范围、曲线/属性标记)
+    - 每条样本构建一次,指令模板、用途猜测、特性描述共用同一份
+    - 各项在首次访问时提取并缓存:不同根类型只用到其中一两项,不做用不到的扫描
+    """
+    
+    __slots__ = ("dsl", "_switches", "_states", "_radius", "_value_range")
+    
+    def __init__(self, dsl_output: str):
+        self.dsl = dsl_output
+        self._switches: Optional[List[str]] = None
+        self._states: Optional[List[str]] = None
+        self._radius: Optional[str] = None
+        self._value_range: Optional[Tuple[str, str]] = None
+    
+    def has(self, *keywords: str) -> bool:
+        """DSL 中是否出现任一关键词 (属性名 / 曲线类型)"""
+        return any(kw in self.dsl for kw in keywords)
+    
+    @property
+    def switches(self) -> List[str]:
+        if self._switches is None:
+            self._switches = _SWITCH_RE.findall(self.dsl)
+        return self._switches
+    
+    @property
+    def states(self) -> List[str]:
+        if self._states is None:
+            self._states = _STATE_RE.findall(self.dsl)
+        return self._states
+    
+    @property
+    def radius(self) -> str:
+        if self._radius is None:
+            match = _RADIUS_MAX_RE.search(self.dsl)
+            self._radius = match.group(1) if match else "3000"
+        return self._radius
+    
+    @property
+    def value_range(self) -> Tuple[str, str]:
+        if self._value_range is None:
+            min_match = _MIN_VALUE_RE.search(self.dsl)
+            max_match = _MAX_VALUE_RE.search(self.dsl)
+            self._value_range = (min_match.group(1) if min_match else "0",
+                                 max_match.group(1) if max_match else "100")
+        return self._value_range
+
+
 # =============================================================================
 # Instruction 生成器
 # =============================================================================
@@ -275,6 +400,156 @@ class NameAnalyzer:
 class InstructionGenerator:
     """专业的 Instruction 生成器"""
     
+    # =========================================================================
+    # V1.3: 预编译模板 (槽位: action / player / name 等,见各生成方法)
+    # =========================================================================
+    
+    STRUCTURE_WORDS = [
+        "音效层级结构", "声音架构", "SFX层级", "音频结构",
+        "Wwise结构", "音效系统", "声音层次"
+    ]
+    
+    PLAYER_SKILL_TEMPLATES = TemplateSet([
+        "{action}{player}{skill_name}技能的{structure}",
+        "帮我{action}一套{player}使用{skill_name}时的{structure}",
+        "需要{action}{skill_name}这个技能的{structure},是{player}用的",
+        "{player}的{skill_name}技能,帮我{action}一下{structure}",
+        "给{player}{action}一个{skill_name}的{structure}",
+        "我要给{player}{action}{skill_name}技能的{structure}",
+        "{class_info}的{skill_name}技能,需要{action}{structure}",
+        "帮我把{player}的{skill_name}技能{structure}搭起来",
+        "{skill_name}这个技能的音效,帮{player}{action}一下",
+        "做一套{player}{skill_name}的{structure}",
+        "{action}一下{class_info}{skill_name}技能的声音层级",
+        "{player}释放{skill_name}时的音效,需要{action}结构"
+    ])
+    
+    BOSS_TEMPLATES = TemplateSet([
+        "{action}{boss_ref}「{boss_name}」的技能音效结构",
+        "帮我{action}副本{boss_ref}{boss_name}的声音层级",
+        "需要给{boss_name}这个{boss_ref}{action}音效架构",
+        "{boss_ref}战斗中{boss_name}的音效,帮我{action}一下",
+        "给{boss_name}{boss_ref}{action}一套完整的SFX结构",
+        "副本里{boss_name}{boss_ref}的技能音效,需要{action}",
+        "{action}一套{boss_name}的{boss_ref}战音效结构",
+        "团队副本{boss_ref}{boss_name}需要{action}音效层级",
+        "{boss_name}的{boss_ref}战,帮我{action}音效架构",
+        "这个{boss_ref}{boss_name}的技能音效要{action}"
+    ])
+    
+    MONSTER_TEMPLATES = TemplateSet([
+        "{action}{monster_ref}「{monster_name}」的音效结构",
+        "帮我给{monster_name}这个{monster_ref}{action}声音层级",
+        "{monster_ref}{monster_name}的技能音效需要{action}",
+        "需要{action}一套{monster_name}{monster_ref}用的SFX架构",
+        "野外{monster_ref}{monster_name}的音效,帮我{action}",
+        "给场景{monster_ref}{monster_name}{action}音效层级",
+        "{monster_name}这个{monster_ref}的声音结构要{action}",
+        "做一套{monster_name}{monster_ref}的音效"
+    ])
+    
+    FOOTSTEP_MATERIAL_TEMPLATES = TemplateSet([
+        "{action}一套支持多材质切换的脚步声系统",
+        "帮我{action}{player}在不同地面材质上的脚步音效结构",
+        "需要{action}能区分草地、石头、木头等材质的脚步声层级",
+        "{player}的脚步声要根据材质变化,帮我{action}这套结构",
+        "给{player}{action}一个带材质切换的Footstep系统",
+        "{action}多材质响应的脚步声架构,要区分不同地面",
+        "角色在不同地面走路的脚步声,需要{action}",
+        "做一套能切换材质的脚步声系统"
+    ])
+    
+    FOOTSTEP_BASIC_TEMPLATES = TemplateSet([
+        "{action}{player}的脚步声音效结构",
+        "帮我{action}一套脚步声的层级架构",
+        "需要{action}角色移动的脚步音效",
+        "{player}行走/跑步的脚步声,帮我{action}",
+        "给角色{action}一套Footstep音效结构",
+        "做一套脚步声的音效层级",
+        "{player}的移动脚步声需要{action}"
+    ])
+    
+    MOUNT_TEMPLATES = TemplateSet([
+        "{action}{player}骑乘{mount_name}坐骑时的音效结构",
+        "帮我{action}坐骑{mount_name}的声音层级",
+        "{mount_name}坐骑的移动音效需要{action}",
+        "需要给{mount_name}坐骑{action}一套SFX架构",
+        "{player}的{mount_name}坐骑,帮我{action}音效结构",
+        "骑乘系统里{mount_name}的音效,需要{action}",
+        "做一套{mount_name}坐骑的音效",
+        "{mount_name}这个坐骑的声音层级要{action}"
+    ])
+    
+    UI_TEMPLATES = TemplateSet([
+        "{action}一套UI界面的音效结构",
+        "帮我{action}系统界面的声音层级",
+        "需要{action}菜单和按钮的音效架构",
+        "UI交互音效需要{action}一下结构",
+        "给界面操作{action}一套反馈音效",
+        "做一套UI操作的音效层级",
+        "系统界面的声音反馈需要{action}"
+    ])
+    
+    ATTENUATION_TEMPLATES = TemplateSet([
+        "{action}一个{usage_hint}的3D衰减曲线,最大距离{radius}米",
+        "帮我{action}{name}的Attenuation,用于{usage_hint}",
+        "需要{action}一套{usage_hint}的距离衰减设置",
+        "给{usage_hint}{action}一个衰减配置,范围{radius}",
+        "{action}{usage_hint}用的3D空间衰减曲线",
+        "做一个{usage_hint}的Attenuation,衰减距离{radius}",
+        "{usage_hint}的声音需要{action}衰减曲线",
+        "帮{usage_hint}配置3D距离衰减,最远{radius}米",
+    ])
+    
+    GAME_PARAMETER_TEMPLATES = TemplateSet([
+        "{action}一个{usage_hint}的RTPC参数",
+        "帮我{action}{name}这个GameParameter",
+        "需要{action}一个{usage_hint}用的游戏参数",
+        "给{usage_hint}{action}一个RTPC控制参数",
+        "{action}{usage_hint}相关的GameParameter",
+        "做一个{usage_hint}的参数,范围{min_val}到{max_val}",
+        "{usage_hint}需要{action}一个控制参数",
+        "帮{usage_hint}配置RTPC参数{name}",
+    ])
+    
+    SWITCH_GROUP_TEMPLATES = TemplateSet([
+        "{action}一套{usage_hint}的Switch切换组",
+        "帮我{action}{name}这个SwitchGroup",
+        "需要{action}一个{usage_hint}用的条件切换",
+        "给{usage_hint}{action}一组Switch状态",
+        "{action}{usage_hint}相关的切换逻辑",
+        "做一个{usage_hint}的SwitchGroup,{switch_count}个状态",
+        "{usage_hint}需要{action}切换组来区分",
+        "帮{usage_hint}配置Switch切换,包含{switch_count}个选项",
+    ])
+    
+    STATE_GROUP_TEMPLATES = TemplateSet([
+        "{action}一套{usage_hint}的State状态组",
+        "帮我{action}{name}这个StateGroup",
+        "需要{action}一个{usage_hint}用的全局状态",
+        "给{usage_hint}{action}一组State",
+        "{action}{usage_hint}相关的状态切换",
+        "做一个{usage_hint}的StateGroup,{state_count}种状态",
+        "{usage_hint}需要{action}状态组来控制",
+        "帮{usage_hint}配置State状态,包含{state_count}个选项",
+    ])
+    
+    GENERAL_TEMPLATES = TemplateSet([
+        "{action}一个{name}的{type_desc}",
+        "帮我{action}{name}相关的音效结构",
+        "需要{action}{name}用的Wwise层级",
+        "给{name}{action}一套{type_desc}",
+        "做一套{name}的音效架构",
+        "{name}的声音层级需要{action}"
+    ])
+    
+    TYPE_DESCRIPTIONS = {
+        "ActorMixer": "Actor-Mixer层级",
+        "RandomSequenceContainer": "随机播放容器",
+        "SwitchContainer": "条件切换容器",
+        "BlendContainer": "混合容器"
+    }
+    
     def __init__(self, style: str = "professional"):
         self.style = style
         self.vocab = VocabularyBank()
@@ -289,18 +564,19 @@ class InstructionGenerator:
         depth = meta.get("depth", 0)
         
         # [V1.1] 优先按 root_type 分发(参数类型)
+        # [V1.3] 参数类型共用同一份 DSLFacts,按需提取结构信息
         if root_type == "Attenuation":
-            return self._generate_attenuation_instruction(root_name, dsl_output, meta)
+            return self._generate_attenuation_instruction(root_name, DSLFacts(dsl_output), meta)
         elif root_type == "GameParameter":
-            return self._generate_game_parameter_instruction(root_name, dsl_output, meta)
+            return self._generate_game_parameter_instruction(root_name, DSLFacts(dsl_output), meta)
         elif root_type == "SwitchGroup":
-            return self._generate_switch_group_instruction(root_name, dsl_output, meta)
+            return self._generate_switch_group_instruction(root_name, DSLFacts(dsl_output), meta)
         elif root_type == "StateGroup":
-            return self._generate_state_group_instruction(root_name, dsl_output, meta)
+            return self._generate_state_group_instruction(root_name, DSLFacts(dsl_output), meta)
         
         # 原有逻辑:按场景分发
-        context_type = self.analyzer.get_context_type(root_name, source)
         features = self.analyzer.analyze(root_name, source)
+        context_type = self.analyzer.get_context_type(root_name, source, features)
         
         if context_type == "boss":
             return self._generate_boss_instruction(root_name, features, commands, depth)
@@ -317,36 +593,22 @@ class InstructionGenerator:
         else:
             return self._generate_general_instruction(root_name, root_type, features, commands, depth)
     
+    # 注:槽位字典按原 f-string 版本的取值顺序构造,随机数消耗顺序不变
+    
     def _generate_player_skill_instruction(
         self, name: str, source: str, features: Dict, commands: Dict, depth: int
     ) -> str:
         """生成玩家技能相关的 instruction"""
         
-        skill_name = self._extract_skill_name(name)
-        player = random.choice(self.vocab.PLAYER_NAMES)
-        action = random.choice(self.vocab.ACTION_VERBS["create"])
-        structure = random.choice([
-            "音效层级结构", "声音架构", "SFX层级", "音频结构", 
-            "Wwise结构", "音效系统", "声音层次"
-        ])
-        class_info = self._get_class_info(source)
-        
-        templates = [
-            f"{action}{player}{skill_name}技能的{structure}",
-            f"帮我{action}一套{player}使用{skill_name}时的{structure}",
-            f"需要{action}{skill_name}这个技能的{structure},是{player}用的",
-            f"{player}的{skill_name}技能,帮我{action}一下{structure}",
-            f"给{player}{action}一个{skill_name}的{structure}",
-            f"我要给{player}{action}{skill_name}技能的{structure}",
-            f"{class_info}的{skill_name}技能,需要{action}{structure}",
-            f"帮我把{player}的{skill_name}技能{structure}搭起来",
-            f"{skill_name}这个技能的音效,帮{player}{action}一下",
-            f"做一套{player}{skill_name}的{structure}",
-            f"{action}一下{class_info}{skill_name}技能的声音层级",
-            f"{player}释放{skill_name}时的音效,需要{action}结构"
-        ]
-        
-        instruction = random.choice(templates)
+        slots = {
+            "skill_name": self._extract_skill_name(name),
+            "player": random.choice(self.vocab.PLAYER_NAMES),
+            "action": random.choice(self.vocab.ACTION_VERBS["create"]),
+            "structure": random.choice(self.STRUCTURE_WORDS),
+            "class_info": self._get_class_info(source),
+        }
+        
+        instruction = self.PLAYER_SKILL_TEMPLATES.render(slots)
         instruction += self._add_features(features, commands, depth)
         
         return instruction
@@ -356,24 +618,13 @@ class InstructionGenerator:
     ) -> str:
         """生成 BOSS 相关的 instruction"""
         
-        boss_name = self._extract_boss_name(name)
-        boss_ref = random.choice(self.vocab.BOSS_NAMES)
-        action = random.choice(self.vocab.ACTION_VERBS["create"])
-        
-        templates = [
-            f"{action}{boss_ref}「{boss_name}」的技能音效结构",
-            f"帮我{action}副本{boss_ref}{boss_name}的声音层级",
-            f"需要给{boss_name}这个{boss_ref}{action}音效架构",
-            f"{boss_ref}战斗中{boss_name}的音效,帮我{action}一下",
-            f"给{boss_name}{boss_ref}{action}一套完整的SFX结构",
-            f"副本里{boss_name}{boss_ref}的技能音效,需要{action}",
-            f"{action}一套{boss_name}的{boss_ref}战音效结构",
-            f"团队副本{boss_ref}{boss_name}需要{action}音效层级",
-            f"{boss_name}的{boss_ref}战,帮我{action}音效架构",
-            f"这个{boss_ref}{boss_name}的技能音效要{action}"
-        ]
-        
-        instruction = random.choice(templates)
+        slots = {
+            "boss_name": self._extract_boss_name(name),
+            "boss_ref": random.choice(self.vocab.BOSS_NAMES),
+            "action": random.choice(self.vocab.ACTION_VERBS["create"]),
+        }
+        
+        instruction = self.BOSS_TEMPLATES.render(slots)
         instruction += self._add_features(features, commands, depth)
         
         return instruction
@@ -383,22 +634,13 @@ class InstructionGenerator:
     ) -> str:
         """生成小怪相关的 instruction"""
         
-        monster_name = self._extract_monster_name(name)
-        monster_ref = random.choice(self.vocab.MONSTER_NAMES)
-        action = random.choice(self.vocab.ACTION_VERBS["create"])
-        
-        templates = [
-            f"{action}{monster_ref}「{monster_name}」的音效结构",
-            f"帮我给{monster_name}这个{monster_ref}{action}声音层级",
-            f"{monster_ref}{monster_name}的技能音效需要{action}",
-            f"需要{action}一套{monster_name}{monster_ref}用的SFX架构",
-            f"野外{monster_ref}{monster_name}的音效,帮我{action}",
-            f"给场景{monster_ref}{monster_name}{action}音效层级",
-            f"{monster_name}这个{monster_ref}的声音结构要{action}",
-            f"做一套{monster_name}{monster_ref}的音效"
-        ]
-        
-        instruction = random.choice(templates)
+        slots = {
+            "monster_name": self._extract_monster_name(name),
+            "monster_ref": random.choice(self.vocab.MONSTER_NAMES),
+            "action": random.choice(self.vocab.ACTION_VERBS["create"]),
+        }
+        
+        instruction = self.MONSTER_TEMPLATES.render(slots)
         instruction += self._add_features(features, commands, depth)
         
         return instruction
@@ -408,33 +650,15 @@ class InstructionGenerator:
     ) -> str:
         """生成脚步声相关的 instruction"""
         
-        action = random.choice(self.vocab.ACTION_VERBS["create"])
-        player = random.choice(self.vocab.PLAYER_NAMES)
-        has_material = features.get("material", False)
-        
-        if has_material:
-            material_templates = [
-                f"{action}一套支持多材质切换的脚步声系统",
-                f"帮我{action}{player}在不同地面材质上的脚步音效结构",
-                f"需要{action}能区分草地、石头、木头等材质的脚步声层级",
-                f"{player}的脚步声要根据材质变化,帮我{action}这套结构",
-                f"给{player}{action}一个带材质切换的Footstep系统",
-                f"{action}多材质响应的脚步声架构,要区分不同地面",
-                f"角色在不同地面走路的脚步声,需要{action}",
-                f"做一套能切换材质的脚步声系统"
-            ]
-            instruction = random.choice(material_templates)
+        slots = {
+            "action": random.choice(self.vocab.ACTION_VERBS["create"]),
+            "player": random.choice(self.vocab.PLAYER_NAMES),
+        }
+        
+        if features.get("material", False):
+            instruction = self.FOOTSTEP_MATERIAL_TEMPLATES.render(slots)
         else:
-            basic_templates = [
-                f"{action}{player}的脚步声音效结构",
-                f"帮我{action}一套脚步声的层级架构",
-                f"需要{action}角色移动的脚步音效",
-                f"{player}行走/跑步的脚步声,帮我{action}",
-                f"给角色{action}一套Footstep音效结构",
-                f"做一套脚步声的音效层级",
-                f"{player}的移动脚步声需要{action}"
-            ]
-            instruction = random.choice(basic_templates)
+            instruction = self.FOOTSTEP_BASIC_TEMPLATES.render(slots)
         
         instruction += self._add_features(features, commands, depth)
         
@@ -445,22 +669,13 @@ class InstructionGenerator:
     ) -> str:
         """生成坐骑相关的 instruction"""
         
-        mount_name = self._extract_mount_name(name)
-        action = random.choice(self.vocab.ACTION_VERBS["create"])
-        player = random.choice(self.vocab.PLAYER_NAMES)
-        
-        templates = [
-            f"{action}{player}骑乘{mount_name}坐骑时的音效结构",
-            f"帮我{action}坐骑{mount_name}的声音层级",
-            f"{mount_name}坐骑的移动音效需要{action}",
-            f"需要给{mount_name}坐骑{action}一套SFX架构",
-            f"{player}的{mount_name}坐骑,帮我{action}音效结构",
-            f"骑乘系统里{mount_name}的音效,需要{action}",
-            f"做一套{mount_name}坐骑的音效",
-            f"{mount_name}这个坐骑的声音层级要{action}"
-        ]
-        
-        instruction = random.choice(templates)
+        slots = {
+            "mount_name": self._extract_mount_name(name),
+            "action": random.choice(self.vocab.ACTION_VERBS["create"]),
+            "player": random.choice(self.vocab.PLAYER_NAMES),
+        }
+        
+        instruction = self.MOUNT_TEMPLATES.render(slots)
         instruction += self._add_features(features, commands, depth)
         
         return instruction
@@ -470,19 +685,9 @@ class InstructionGenerator:
     ) -> str:
         """生成 UI 相关的 instruction"""
         
-        action = random.choice(self.vocab.ACTION_VERBS["create"])
+        slots = {"action": random.choice(self.vocab.ACTION_VERBS["create"])}
         
-        templates = [
-            f"{action}一套UI界面的音效结构",
-            f"帮我{action}系统界面的声音层级",
-            f"需要{action}菜单和按钮的音效架构",
-            f"UI交互音效需要{action}一下结构",
-            f"给界面操作{action}一套反馈音效",
-            f"做一套UI操作的音效层级",
-            f"系统界面的声音反馈需要{action}"
-        ]
-        
-        instruction = random.choice(templates)
+        instruction = self.UI_TEMPLATES.render(slots)
         instruction += self._add_features(features, commands, depth)
         
         return instruction
@@ -492,45 +697,27 @@ class InstructionGenerator:
     # =========================================================================
     
     def _generate_attenuation_instruction(
-        self, name: str, dsl_output: str, meta: Dict
+        self, name: str, facts: DSLFacts, meta: Dict
     ) -> str:
         """生成 Attenuation 衰减曲线相关的 instruction"""
         
-        action = random.choice(["创建", "配置", "设计", "搭建", "定义"])
-        
-        # 分析衰减特性
-        has_volume_curve = "VolumeDry" in dsl_output
-        has_lowpass = "LowPassFilter" in dsl_output
-        has_spread = "Spread" in dsl_output
-        
-        # 提取 RadiusMax
-        radius_match = re.search(r'RadiusMax.*?=\s*(\d+)', dsl_output)
-        radius = radius_match.group(1) if radius_match else "3000"
-        
-        # 根据名称猜测用途
-        usage_hint = self._guess_attenuation_usage(name)
-        
-        # 模板
-        templates = [
-            f"{action}一个{usage_hint}的3D衰减曲线,最大距离{radius}米",
-            f"帮我{action}{name}的Attenuation,用于{usage_hint}",
-            f"需要{action}一套{usage_hint}的距离衰减设置",
-            f"给{usage_hint}{action}一个衰减配置,范围{radius}",
-            f"{action}{usage_hint}用的3D空间衰减曲线",
-            f"做一个{usage_hint}的Attenuation,衰减距离{radius}",
-            f"{usage_hint}的声音需要{action}衰减曲线",
-            f"帮{usage_hint}配置3D距离衰减,最远{radius}米",
-        ]
+        slots = {
+            "name": name,
+            "action": random.choice(["创建", "配置", "设计", "搭建", "定义"]),
+            "radius": facts.radius,
+            # 根据名称猜测用途
+            "usage_hint": self._guess_attenuation_usage(name),
+        }
         
-        instruction = random.choice(templates)
+        instruction = self.ATTENUATION_TEMPLATES.render(slots)
         
         # 添加曲线特性描述
         curve_features = []
-        if has_volume_curve:
+        if facts.has("VolumeDry"):
             curve_features.append(random.choice(["带音量衰减", "包含Volume曲线", "有音量距离衰减"]))
-        if has_lowpass:
+        if facts.has("LowPassFilter"):
             curve_features.append(random.choice(["低通滤波", "LowPass曲线", "远距离闷声"]))
-        if has_spread:
+        if facts.has("Spread"):
             curve_features.append(random.choice(["空间扩散", "Spread曲线", "近处宽远处窄"]))
         
         if curve_features and random.random() > 0.3:
@@ -540,47 +727,29 @@ class InstructionGenerator:
         return instruction
     
     def _generate_game_parameter_instruction(
-        self, name: str, dsl_output: str, meta: Dict
+        self, name: str, facts: DSLFacts, meta: Dict
     ) -> str:
         """生成 GameParameter 相关的 instruction"""
         
-        action = random.choice(["创建", "配置", "定义", "设置", "添加"])
-        
-        # 分析参数特性
-        has_min_max = "Min" in dsl_output or "Max" in dsl_output
-        has_slew = "SlewRate" in dsl_output
-        has_filter = "FilterTime" in dsl_output
-        has_builtin = "BindToBuiltInParam" in dsl_output
-        
-        # 提取范围
-        min_match = re.search(r'"Min".*?=\s*([-\d.]+)', dsl_output)
-        max_match = re.search(r'"Max".*?=\s*([-\d.]+)', dsl_output)
-        min_val = min_match.group(1) if min_match else "0"
-        max_val = max_match.group(1) if max_match else "100"
-        
-        # 根据名称猜测用途
-        usage_hint = self._guess_parameter_usage(name)
-        
-        templates = [
-            f"{action}一个{usage_hint}的RTPC参数",
-            f"帮我{action}{name}这个GameParameter",
-            f"需要{action}一个{usage_hint}用的游戏参数",
-            f"给{usage_hint}{action}一个RTPC控制参数",
-            f"{action}{usage_hint}相关的GameParameter",
-            f"做一个{usage_hint}的参数,范围{min_val}到{max_val}",
-            f"{usage_hint}需要{action}一个控制参数",
-            f"帮{usage_hint}配置RTPC参数{name}",
-        ]
+        min_val, max_val = facts.value_range
+        slots = {
+            "name": name,
+            "action": random.choice(["创建", "配置", "定义", "设置", "添加"]),
+            "min_val": min_val,
+            "max_val": max_val,
+            # 根据名称猜测用途
+            "usage_hint": self._guess_parameter_usage(name),
+        }
         
-        instruction = random.choice(templates)
+        instruction = self.GAME_PARAMETER_TEMPLATES.render(slots)
         
         # 添加特性描述
         param_features = []
-        if has_slew or has_filter:
+        if facts.has("SlewRate", "FilterTime"):
             param_features.append(random.choice(["平滑过渡", "带插值", "有缓动效果"]))
-        if has_builtin:
+        if facts.has("BindToBuiltInParam"):
             param_features.append(random.choice(["绑定内置参数", "关联引擎参数", "挂载系统参数"]))
-        if has_min_max:
+        if facts.has("Min", "Max"):
             param_features.append(f"范围{min_val}~{max_val}")
         
         if param_features and random.random() > 0.4:
@@ -590,31 +759,20 @@ class InstructionGenerator:
         return instruction
     
     def _generate_switch_group_instruction(
-        self, name: str, dsl_output: str, meta: Dict
+        self, name: str, facts: DSLFacts, meta: Dict
     ) -> str:
         """生成 SwitchGroup 相关的 instruction"""
         
-        action = random.choice(["创建", "配置", "设计", "搭建", "定义"])
-        
-        # 提取所有 Switch
-        switches = re.findall(r'CREATE Switch "([^"]+)"', dsl_output)
-        switch_count = len(switches)
-        
-        # 根据名称猜测用途
-        usage_hint = self._guess_switch_usage(name, switches)
-        
-        templates = [
-            f"{action}一套{usage_hint}的Switch切换组",
-            f"帮我{action}{name}这个SwitchGroup",
-            f"需要{action}一个{usage_hint}用的条件切换",
-            f"给{usage_hint}{action}一组Switch状态",
-            f"{action}{usage_hint}相关的切换逻辑",
-            f"做一个{usage_hint}的SwitchGroup,{switch_count}个状态",
-            f"{usage_hint}需要{action}切换组来区分",
-            f"帮{usage_hint}配置Switch切换,包含{switch_count}个选项",
-        ]
+        switches = facts.switches
+        slots = {
+            "name": name,
+            "action": random.choice(["创建", "配置", "设计", "搭建", "定义"]),
+            "switch_count": len(switches),
+            # 根据名称猜测用途
+            "usage_hint": self._guess_switch_usage(name, switches),
+        }
         
-        instruction = random.choice(templates)
+        instruction = self.SWITCH_GROUP_TEMPLATES.render(slots)
         
         # 添加状态示例
         if switches and random.random() > 0.5:
@@ -624,31 +782,20 @@ class InstructionGenerator:
         return instruction
     
     def _generate_state_group_instruction(
-        self, name: str, dsl_output: str, meta: Dict
+        self, name: str, facts: DSLFacts, meta: Dict
     ) -> str:
         """生成 StateGroup 相关的 instruction"""
         
-        action = random.choice(["创建", "配置", "设计", "搭建", "定义"])
-        
-        # 提取所有 State
-        states = re.findall(r'CREATE State "([^"]+)"', dsl_output)
-        state_count = len(states)
-        
-        # 根据名称猜测用途
-        usage_hint = self._guess_state_usage(name, states)
-        
-        templates = [
-            f"{action}一套{usage_hint}的State状态组",
-            f"帮我{action}{name}这个StateGroup",
-            f"需要{action}一个{usage_hint}用的全局状态",
-            f"给{usage_hint}{action}一组State",
-            f"{action}{usage_hint}相关的状态切换",
-            f"做一个{usage_hint}的StateGroup,{state_count}种状态",
-            f"{usage_hint}需要{action}状态组来控制",
-            f"帮{usage_hint}配置State状态,包含{state_count}个选项",
-        ]
+        states = facts.states
+        slots = {
+            "name": name,
+            "action": random.choice(["创建", "配置", "设计", "搭建", "定义"]),
+            "state_count": len(states),
+            # 根据名称猜测用途
+            "usage_hint": self._guess_state_usage(name, states),
+        }
         
-        instruction = random.choice(templates)
+        instruction = self.STATE_GROUP_TEMPLATES.render(slots)
         
         # 添加状态示例
         if states and random.random() > 0.5:
@@ -749,25 +896,13 @@ class InstructionGenerator:
     ) -> str:
         """生成通用的 instruction"""
         
-        action = random.choice(self.vocab.ACTION_VERBS["create"])
-        
-        type_desc = {
-            "ActorMixer": "Actor-Mixer层级",
-            "RandomSequenceContainer": "随机播放容器",
-            "SwitchContainer": "条件切换容器",
-            "BlendContainer": "混合容器"
-        }.get(root_type, "音效结构")
-        
-        templates = [
-            f"{action}一个{name}的{type_desc}",
-            f"帮我{action}{name}相关的音效结构",
-            f"需要{action}{name}用的Wwise层级",
-            f"给{name}{action}一套{type_desc}",
-            f"做一套{name}的音效架构",
-            f"{name}的声音层级需要{action}"
-        ]
-        
-        instruction = random.choice(templates)
+        slots = {
+            "name": name,
+            "action": random.choice(self.vocab.ACTION_VERBS["create"]),
+            "type_desc": self.TYPE_DESCRIPTIONS.get(root_type, "音效结构"),
+        }
+        
+        instruction = self.GENERAL_TEMPLATES.render(slots)
         instruction += self._add_features(features, commands, depth)
         
         return instruction
@@ -854,49 +989,138 @@ class InstructionGenerator:
 def process_jsonl(
     input_path: str, 
     output_path: str,
-    style: str = "professional"
+    style: str = "professional",
+    workers: int = 1,
+    seed: Optional[int] = None,
+    chunk_size: int = 1000
 ) -> Tuple[int, int]:
-    """处理 JSONL 文件,为每条记录生成 instruction"""
+    """
+    处理 JSONL 文件,为每条记录生成 instruction
+    
+    V1.2: 按块处理。workers > 1 时各块分发到进程池,结果按块顺序写出;
+    seed 不为 None 时每块以 (seed, 块编号) 重置随机流,输出与 worker 数无关
+    """
+    if workers > 1 and seed is None:
+        seed = random.randrange(2 ** 32)
+        print(f"   未指定 --seed,并行随机种子: {seed}")
     
-    generator = InstructionGenerator(style=style)
     success_count = 0
     fail_count = 0
     
     with open(input_path, 'r', encoding='utf-8') as f_in, \
          open(output_path, 'w', encoding='utf-8') as f_out:
         
-        for line_num, line in enumerate(f_in, 1):
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                data = json.loads(line)
-                
-                instruction = generator.generate(
-                    dsl_output=data.get("output", ""),
-                    meta=data.get("meta", {})
-                )
-                
-                data["instruction"] = instruction
-                
-                f_out.write(json.dumps(data, ensure_ascii=False) + "\n")
-                success_count += 1
+        tasks = (
+            (chunk_idx, chunk, seed)
+            for chunk_idx, chunk in enumerate(_iter_chunks(f_in, chunk_size))
+        )
+        
+        if workers > 1:
+            mp_pool = multiprocessing.Pool(workers, initializer=_init_instruction_worker, initargs=(style,))
+            results = _imap_window(mp_pool, tasks, window=workers * 2)
+        else:
+            mp_pool = None
+            _init_instruction_worker(style)
+            results = map(_run_instruction_chunk, tasks)
+        
+        try:
+            last_report = 0
+            for lines, failures in results:
+                f_out.writelines(lines)
+                success_count += len(lines)
+                for line_num, error in failures:
+                    print(f"   ⚠️ 第 {line_num} 行处理失败: {error}")
+                fail_count += len(failures)
                 
-                if success_count % 500 == 0:
+                if success_count // 500 > last_report:
+                    last_report = success_count // 500
                     print(f"   已处理 {success_count} 条...")
-                    
-            except Exception as e:
-                print(f"   ⚠️ 第 {line_num} 行处理失败: {e}")
-                fail_count += 1
+        finally:
+            if mp_pool is not None:
+                mp_pool.terminate()
     
     return success_count, fail_count
 
 
+def _iter_chunks(f_in, chunk_size: int) -> Iterator[List[Tuple[int, str]]]:
+    """按块读取非空行,保留行号 (用于错误提示)"""
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size 必须 >= 1 (收到 {chunk_size})")
+    numbered = ((line_num, line) for line_num, line in enumerate(f_in, 1) if line.strip())
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _imap_window(mp_pool, tasks, window: int):
+    """有序 imap,同时在途的任务不超过 window 个 (Pool.imap 会一次性读完输入)"""
+    in_flight = deque()
+    for task in tasks:
+        in_flight.append(mp_pool.apply_async(_run_instruction_chunk, (task,)))
+        if len(in_flight) >= window:
+            yield in_flight.popleft().get()
+    while in_flight:
+        yield in_flight.popleft().get()
+
+
+# =============================================================================
+# V1.2: 并行 worker
+# =============================================================================
+
+_WORKER_GENERATOR: Optional[InstructionGenerator] = None
+
+
+def _init_instruction_worker(style: str):
+    """worker 进程初始化:每个进程构建一次生成器"""
+    global _WORKER_GENERATOR
+    _WORKER_GENERATOR = InstructionGenerator(style=style)
+
+
+def _run_instruction_chunk(task: Tuple[int, List[Tuple[int, str]], Optional[int]]) -> Tuple[List[str], List[Tuple[int, str]]]:
+    """
+    处理一块 (块编号, [(行号, 原始行)], 主种子),返回 (输出行, [(行号, 错误)])
+    指定主种子时以 "主种子:块编号" 重置随机流,结果只取决于块内容,与被调度到哪个进程无关
+    """
+    chunk_idx, chunk, seed = task
+    if seed is not None:
+        random.seed(f"{seed}:{chunk_idx}")
+    
+    generator = _WORKER_GENERATOR
+    lines = []
+    failures = []
+    for line_num, line in chunk:
+        try:
+            data = json.loads(line)
+            
+            instruction = generator.generate(
+                dsl_output=data.get("output", ""),
+                meta=data.get("meta", {})
+            )
+            
+            data["instruction"] = instruction
+            lines.append(json.dumps(data, ensure_ascii=False) + "\n")
+        except Exception as e:
+            failures.append((line_num, str(e)))
+    return lines, failures
+
+
 # =============================================================================
 # 命令行入口
 # =============================================================================
 
+def _positive_int(text: str) -> int:
+    """argparse 用:>= 1 的整数"""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"需要整数 (收到 {text!r})")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"必须 >= 1 (收到 {value})")
+    return value
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="为 DSL 训练数据生成专业的自然语言指令"
@@ -908,6 +1132,12 @@ def main():
                         default="professional", help="生成风格")
     parser.add_argument("--preview", action="store_true", 
                         help="预览模式:只显示前10条生成结果")
+    parser.add_argument("-w", "--workers", type=_positive_int, default=1,
+                        help="并行进程数 (默认: 1)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="随机种子 (每块派生独立随机流,输出可复现且与 worker 数无关)")
+    parser.add_argument("--chunk-size", type=_positive_int, default=1000,
+                        help="每块行数 (默认: 1000)")
     
     args = parser.parse_args()
     
@@ -943,14 +1173,17 @@ def main():
             args.output = args.input.replace(".jsonl", "_with_instructions.jsonl")
         
         print("=" * 70)
-        print("🚀 Instruction Generator V1.0")
+        print("🚀 Instruction Generator V1.3")
         print("=" * 70)
         print(f"   输入: {args.input}")
         print(f"   输出: {args.output}")
         print(f"   风格: {args.style}")
+        print(f"   进程: {args.workers}")
         print("-" * 70)
         
-        success, fail = process_jsonl(args.input, args.output, args.style)
+        success, fail = process_jsonl(args.input, args.output, args.style,
+                                      workers=args.workers, seed=args.seed,
+                                      chunk_size=args.chunk_size)
         
         print("-" * 70)
         print(f"✅ 处理完成!")
@@ -3,6 +3,8 @@ import random
 import re
 from typing import Dict, List, Optional
 
+from keyword_matcher import KeywordAutomaton
+
 # ==========================================
 # 配置区域
 # ==========================================
@@ -47,6 +49,11 @@ SEMANTIC_MAPPINGS = {
     "switch": ["切状态", "Switch组", "逻辑判断"]
 }
 
+# 映射键的关键词自动机 (不区分大小写,单遍扫描命中全部键)
+SEMANTIC_MATCHER = KeywordAutomaton.from_mapping(
+    {key: [key] for key in SEMANTIC_MAPPINGS}, case_sensitive=False
+)
+
 # --- 2025 音频策划常用形容词/口头禅 ---
 VIBE_KEYWORDS = [
     "听感要润", "打击感拉满", "要有史诗感", "细节要丰富", 
@@ -85,8 +92,9 @@ class WwiseDataRefiner:
         lower_name = raw_name.lower()
         
         found_descriptors = []
+        hits = SEMANTIC_MATCHER.categories(lower_name)
         for key, choices in SEMANTIC_MAPPINGS.items():
-            if key in lower_name:
+            if key in hits:
                 # 随机选一个同义词,增加多样性
                 found_descriptors.append(random.choice(choices))
         
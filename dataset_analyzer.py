@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """
-[数据集分析与预处理工具]V1.0
+[数据集分析与预处理工具]V1.5
 功能:
 1. 分析数据集的样本分布(类型、长度、复杂度)
 2. 检查是否包含各类数据(Audio/Event/参数)
@@ -8,26 +8,514 @@
 4. 过滤或截断超长样本
 5. 生成训练就绪的数据集
 
+更新 V1.5:
+1. [Feat] balance_dataset 真正执行平衡:StratifiedSampler (stratified_sampler.py) 单遍分层水库采样,
+   占比为各类在结果中的上限,可按类别或 root_type|complexity|source 分层给出
+2. [Feat] --balance [JSON] / --balance-total / --seed:预处理后平衡再保存
+
+更新 V1.4:
+1. [Perf] 统计改为列式:每批样本抽成 DatasetFrame (dataset_frame.py) 的 numpy 列,
+   类型/复杂度计数、长度分桶、覆盖检查、超长计数都是整列运算,分位数草图批量写入
+2. [Perf] 预处理的超长判定改为布尔掩码,正常样本整段保留,只逐条处理超长样本
+3. 依赖:numpy (必需);需要 pandas 做进一步分析时可用 DatasetFrame.to_pandas()
+
+更新 V1.3:
+1. [Feat] --strategy split:DSLSplitter 按层级边界拆分超长样本,每块只补声明用到的祖先 CREATE,
+   行数与 token 都在限额内,长层级不再被截断或丢弃
+
+更新 V1.2:
+1. [Perf] 分析改为单遍流式扫描:逐行读文件、分批计数 token,只保留计数器/分桶/分位数草图,
+   内存占用与数据集大小无关 (不再先 load_jsonl 整个文件)
+2. [Perf] 行数/字符数/token 的中位数与 P90/P95/P99 由 KLL 分位数草图给出 (不再对整列反复排序),
+   样本数不超过草图容量 (--sketch-k) 时为精确值
+3. [Feat] -w/--workers:按字节区间分片多进程统计,各分片的 DatasetSummary 合并得到整体结果
+
+更新 V1.1:
+1. [Feat] --tokenizer:用本地 tokenizer.json (如 Qwen2.5) 精确统计 token 数,
+   按训练脚本的 alpaca 模板拼出完整文本再编码 (含 EOS)
+2. [Perf] 批量编码 (tokenizers 的 encode_batch 在 Rust 侧多核并行)
+3. [Perf] 按样本文本哈希缓存 token 数 (--token-cache),重复分析 / 预处理直接命中
+4. 未安装 tokenizers 或未指定 --tokenizer 时回退到原字符估算 (chars * 0.35)
+
 使用方法:
     python dataset_analyzer.py optimized_dataset_processed.jsonl
+    python dataset_analyzer.py data.jsonl --tokenizer Qwen2.5-7B/tokenizer.json
+    python dataset_analyzer.py huge.jsonl --analyze-only -w 8
+    python dataset_analyzer.py data.jsonl --balance '{"gameparam": 0.1, "event": 0.25}'
 """
 
+import re
 import json
+import math
+import random
+import hashlib
 import argparse
-from collections import Counter, defaultdict
-from typing import List, Dict, Tuple
+import multiprocessing
+from collections import Counter
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator
 import os
 
+import numpy as np
+
+from dataset_frame import DatasetFrame
+from stratified_sampler import StratifiedSampler, StratumMatcher
+
+# V1.1: 精确 token 统计需要 HuggingFace tokenizers (可选)
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+
+# =============================================================================
+# Token 统计
+# =============================================================================
+
+# 与 train_unsloth_v52.py 的 alpaca_prompt 保持一致
+ALPACA_PROMPT = """Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
+
+### Instruction:
+{}
+
+### Input:
+{}
+
+### Response:
+{}"""
+
+
+class TokenCounter:
+    """
+    样本 token 计数器
+    - 指定 tokenizer.json 且安装了 tokenizers 时精确计数:训练文本 = alpaca 模板 + EOS
+    - 否则回退到字符估算:(len(instruction) + len(output) + 100) * 0.35
+    - 精确计数按 (tokenizer 指纹, 训练文本) 的哈希缓存,可持久化到 JSON 文件
+    """
+    
+    def __init__(self, tokenizer_path: Optional[str] = None, cache_path: Optional[str] = None,
+                 batch_size: int = 512):
+        self.tokenizer = None
+        self.tokenizer_path = tokenizer_path
+        self.fingerprint = ""
+        self.cache_path = cache_path
+        self.batch_size = batch_size
+        self.cache: Dict[str, int] = {}
+        self.stats = {"hits": 0, "encoded": 0}
+        self._new_counts: Dict[str, int] = {}
+        
+        if tokenizer_path:
+            if Tokenizer is None:
+                print("⚠️ 未安装 tokenizers (pip install tokenizers),回退到字符估算")
+            else:
+                self.tokenizer = Tokenizer.from_file(tokenizer_path)
+                with open(tokenizer_path, 'rb') as f:
+                    self.fingerprint = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+                self._load_cache()
+    
+    @property
+    def exact(self) -> bool:
+        return self.tokenizer is not None
+    
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print(f"⚠️ token 缓存无法读取,忽略: {self.cache_path}")
+            return
+        # tokenizer 变了,旧计数全部作废
+        if data.get("tokenizer") == self.fingerprint:
+            self.cache = data.get("counts", {})
+    
+    def save(self):
+        """把新增的计数写回缓存文件"""
+        if not self.exact or not self.cache_path or not self._new_counts:
+            return
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"tokenizer": self.fingerprint, "counts": self.cache}, f)
+        os.replace(tmp_path, self.cache_path)
+        self._new_counts = {}
+    
+    def take_new_counts(self) -> Dict[str, int]:
+        """取出上次取出后新编码的计数 (worker 进程交回主进程合并)"""
+        new_counts, self._new_counts = self._new_counts, {}
+        return new_counts
+    
+    def absorb(self, counts: Dict[str, int]):
+        """并入其他进程算出的计数"""
+        self.cache.update(counts)
+        self._new_counts.update(counts)
+        self.stats["encoded"] += len(counts)
+    
+    @staticmethod
+    def estimate(sample: Dict) -> int:
+        """原字符估算 (V1.0 行为)"""
+        total_chars = len(sample.get("instruction", "")) + len(sample.get("output", "")) + 100
+        return int(total_chars * 0.35)
+    
+    def count(self, samples: List[Dict]) -> List[int]:
+        """返回每个样本的 token 数 (顺序与输入一致)"""
+        if not self.exact:
+            return [self.estimate(s) for s in samples]
+        
+        counts: List[Optional[int]] = [None] * len(samples)
+        pending: List[Tuple[int, str, str]] = []
+        for i, s in enumerate(samples):
+            text = ALPACA_PROMPT.format(s.get("instruction", ""), s.get("input", ""), s.get("output", ""))
+            key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+            cached = self.cache.get(key)
+            if cached is not None:
+                counts[i] = cached
+            else:
+                pending.append((i, key, text))
+        
+        self.stats["hits"] += len(samples) - len(pending)
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            encodings = self.tokenizer.encode_batch([text for _, _, text in batch], add_special_tokens=False)
+            for (i, key, _), encoding in zip(batch, encodings):
+                n = len(encoding.ids) + 1  # + EOS
+                counts[i] = n
+                self.cache[key] = n
+                self._new_counts[key] = n
+        
+        self.stats["encoded"] += len(pending)
+        return counts
+
+
+# =============================================================================
+# V1.2: 可合并的流式统计
+# =============================================================================
+
+AUDIO_ROOT_TYPES = ["RandomSequenceContainer", "SwitchContainer", "BlendContainer", "ActorMixer"]
+
+LENGTH_BUCKETS = [
+    ("1-30行", 30),
+    ("31-50行", 50),
+    ("51-100行", 100),
+    ("101-150行", 150),
+    ("151-200行", 200),
+    ("200+行", None),
+]
+
+
+class QuantileSketch:
+    """
+    KLL 分位数草图
+    - 第 h 层每个元素代表 2^h 个原始值,层满时排序后隔一取一 (随机起点) 晋升到上一层
+    - 越靠近顶层容量越大 (k * c^深度),总内存约 k / (1 - c) 个元素,与数据量无关
+    - 元素数不超过 k 时不发生压缩,分位数为精确值
+    - merge() 逐层拼接后再压缩,分片统计可任意顺序合并
+    """
+    
+    C = 2.0 / 3.0
+    
+    def __init__(self, k: int = 1000, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.compactors: List[List[float]] = [[]]
+        self._rng = random.Random(seed)
+        self._size = 0
+        self._max_size = self._capacity(0)
+    
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * self.C ** depth)) + 1
+    
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+    
+    def add(self, value: float):
+        self.compactors[0].append(value)
+        self.n += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+    
+    def extend(self, values: List[float]):
+        """批量加入:一次放入第 0 层,再压缩到容量以内"""
+        self.compactors[0].extend(values)
+        self.n += len(values)
+        self._size += len(values)
+        while self._size >= self._max_size:
+            self._compress()
+    
+    def _compress(self):
+        for level in range(len(self.compactors)):
+            items = self.compactors[level]
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 == len(self.compactors):
+                self._grow()
+            items.sort()
+            # 奇数个时留下最大的一个,其余成对压缩 (总权重不变)
+            keep = [items.pop()] if len(items) % 2 else []
+            self.compactors[level + 1].extend(items[self._rng.random() < 0.5::2])
+            self.compactors[level] = keep
+            self._size = sum(len(c) for c in self.compactors)
+            if self._size < self._max_size:
+                break
+    
+    def merge(self, other: "QuantileSketch"):
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self._size = sum(len(c) for c in self.compactors)
+        while self._size >= self._max_size:
+            self._compress()
+    
+    def quantile(self, q: float) -> float:
+        """排名为 int(n * q) 的值 (与 sorted(values)[int(n * q)] 含义一致)"""
+        weighted = sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self.compactors)
+            for value in items
+        )
+        target = int(self.n * q)
+        cumulative = 0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative > target:
+                return value
+        return weighted[-1][0]
+
+
+class NumericSummary:
+    """数值列的流式统计:精确的 count/sum/min/max + 分位数草图"""
+    
+    def __init__(self, sketch_k: int = 1000):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.sketch = QuantileSketch(sketch_k)
+    
+    def add(self, value: int):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.sketch.add(value)
+    
+    def extend(self, values: np.ndarray):
+        """整列累积 (V1.4)"""
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.total += int(values.sum())
+        low, high = int(values.min()), int(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.sketch.extend(values.tolist())
+    
+    def merge(self, other: "NumericSummary"):
+        if other.count == 0:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+    
+    @property
+    def avg(self) -> float:
+        return self.total / self.count
+
+
+class DatasetSummary:
+    """
+    单遍扫描累积的数据集统计,可在分片之间合并
+    - 类型 / 复杂度计数、长度分桶、覆盖标记、超长计数:精确
+    - 行数 / 字符数 / token 数的分位数:KLL 草图 (小数据集时精确)
+    """
+    
+    def __init__(self, sketch_k: int = 1000):
+        self.total = 0
+        self.by_type = Counter()
+        self.by_complexity = Counter()
+        self.line_count = NumericSummary(sketch_k)
+        self.char_count = NumericSummary(sketch_k)
+        self.tokens = NumericSummary(sketch_k)
+        self.length_buckets = Counter()
+        self.coverage = {
+            "has_audio": False,      # Container/Sound 层级
+            "has_event": False,      # Event + ADD_ACTION
+            "has_attenuation": False, # Attenuation 曲线
+            "has_game_param": False,  # GameParameter
+            "has_switch_group": False, # SwitchGroup
+            "has_state_group": False,  # StateGroup
+            "has_workflow": False,    # Event + Target 组合
+        }
+        self.overlength = Counter()
+    
+    def update(self, samples: Iterable[Dict], token_counter: "TokenCounter"):
+        """逐批消费样本 (每批构建一个 DatasetFrame,内存占用与批大小相关,与总量无关)"""
+        batch = []
+        for s in samples:
+            batch.append(s)
+            if len(batch) >= FRAME_BATCH:
+                self._add_batch(batch, token_counter)
+                batch = []
+        if batch:
+            self._add_batch(batch, token_counter)
+    
+    def _add_batch(self, batch: List[Dict], token_counter: "TokenCounter"):
+        self.add_frame(DatasetFrame.from_samples(batch, token_counter.count(batch), with_commands=False))
+    
+    def add_frame(self, frame: DatasetFrame):
+        """V1.4: 整批向量化累积"""
+        if len(frame) == 0:
+            return
+        self.total += len(frame)
+        self.by_type.update(frame.category_counts("root_type"))
+        self.by_complexity.update(frame.category_counts("complexity"))
+        
+        # 长度
+        self.line_count.extend(frame.line_count)
+        self.char_count.extend(frame.chars)
+        bucket_counts = frame.bucket_counts("line_count", [upper for _, upper in LENGTH_BUCKETS[:-1]])
+        for (bucket, _), count in zip(LENGTH_BUCKETS, bucket_counts):
+            if count:
+                self.length_buckets[bucket] += int(count)
+        
+        # 数据完整性 (Workflow 类型由 dataset_optimizer 生成,同时算作 Event 与工作流)
+        coverage = self.coverage
+        coverage["has_audio"] |= bool(frame.is_type(*AUDIO_ROOT_TYPES).any())
+        coverage["has_event"] |= bool(frame.is_type("Event", "Workflow").any())
+        coverage["has_workflow"] |= bool(frame.event_has_container.any() or frame.is_type("Workflow").any())
+        coverage["has_attenuation"] |= bool(frame.is_type("Attenuation").any())
+        coverage["has_game_param"] |= bool(frame.is_type("GameParameter").any())
+        coverage["has_switch_group"] |= bool(frame.is_type("SwitchGroup").any())
+        coverage["has_state_group"] |= bool(frame.is_type("StateGroup").any())
+        
+        # Token
+        self.tokens.extend(frame.tokens)
+        for limit in (2048, 4096):
+            over = int(np.count_nonzero(frame.tokens > limit))
+            if over:
+                self.overlength[f"over_{limit}"] += over
+    
+    def merge(self, other: "DatasetSummary") -> "DatasetSummary":
+        self.total += other.total
+        self.by_type.update(other.by_type)
+        self.by_complexity.update(other.by_complexity)
+        self.line_count.merge(other.line_count)
+        self.char_count.merge(other.char_count)
+        self.tokens.merge(other.tokens)
+        self.length_buckets.update(other.length_buckets)
+        for key, value in other.coverage.items():
+            self.coverage[key] = self.coverage[key] or value
+        self.overlength.update(other.overlength)
+        return self
+
+
+# 流式统计时每批构建的帧大小
+FRAME_BATCH = 2048
+
+
+def iter_jsonl(path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Dict]:
+    """逐行读取 JSONL;指定 [start, end) 时只读起始位置落在该字节区间内的行"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while end is None or f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                yield json.loads(line)
+
+
+def _file_shards(path: str, num_shards: int) -> List[Tuple[int, int]]:
+    """按字节把文件切成 num_shards 段,边界对齐到行首"""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, num_shards):
+            f.seek(max(size * i // num_shards, bounds[-1]))
+            if f.tell() > 0:
+                f.seek(f.tell() - 1)
+                f.readline()
+            bounds.append(f.tell())
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+_WORKER_COUNTER: Optional["TokenCounter"] = None
+
+
+def _init_summary_worker(tokenizer_path: Optional[str], cache_path: Optional[str], batch_size: int):
+    """worker 进程初始化:每个进程加载一次 tokenizer 与计数缓存"""
+    global _WORKER_COUNTER
+    _WORKER_COUNTER = TokenCounter(tokenizer_path, cache_path, batch_size)
+
+
+def _run_summary_shard(task: Tuple[str, int, int, int]) -> Tuple[DatasetSummary, Dict[str, int], int]:
+    """统计一个字节区间,返回 (分片统计, 新增的 token 计数, 缓存命中数)"""
+    path, start, end, sketch_k = task
+    hits_before = _WORKER_COUNTER.stats["hits"]
+    summary = DatasetSummary(sketch_k)
+    summary.update(iter_jsonl(path, start, end), _WORKER_COUNTER)
+    return summary, _WORKER_COUNTER.take_new_counts(), _WORKER_COUNTER.stats["hits"] - hits_before
+
+
+def summarize_file(path: str, token_counter: "TokenCounter", workers: int = 1,
+                   sketch_k: int = 1000) -> DatasetSummary:
+    """
+    单遍流式统计 JSONL 文件
+    workers > 1 时按字节区间分片并行统计,再按分片顺序合并 (新增 token 计数并入 token_counter)
+    """
+    if workers <= 1:
+        summary = DatasetSummary(sketch_k)
+        summary.update(iter_jsonl(path), token_counter)
+        return summary
+    
+    tasks = [(path, start, end, sketch_k) for start, end in _file_shards(path, workers)]
+    initargs = (token_counter.tokenizer_path, token_counter.cache_path, token_counter.batch_size)
+    summary = DatasetSummary(sketch_k)
+    with multiprocessing.Pool(workers, initializer=_init_summary_worker, initargs=initargs) as mp_pool:
+        for shard, new_counts, hits in mp_pool.imap(_run_summary_shard, tasks):
+            summary.merge(shard)
+            token_counter.absorb(new_counts)
+            token_counter.stats["hits"] += hits
+    return summary
+
+
 # =============================================================================
 # 数据集分析器
 # =============================================================================
 
 class DatasetAnalyzer:
-    """数据集分析器"""
+    """
+    数据集分析器
+    V1.2: 单遍扫描累积 DatasetSummary 后统一输出;
+    from_file() 流式读取文件 (可多进程分片),不需要把样本全部载入内存
+    """
     
-    def __init__(self, samples: List[Dict]):
+    def __init__(self, samples: Optional[Iterable[Dict]] = None, token_counter: Optional[TokenCounter] = None,
+                 sketch_k: int = 1000):
         self.samples = samples
         self.stats = {}
+        self.token_counter = token_counter or TokenCounter()
+        self.sketch_k = sketch_k
+        self.path: Optional[str] = None
+        self.workers = 1
+        self.summary: Optional[DatasetSummary] = None
+    
+    @classmethod
+    def from_file(cls, path: str, token_counter: Optional[TokenCounter] = None,
+                  workers: int = 1, sketch_k: int = 1000) -> "DatasetAnalyzer":
+        analyzer = cls(None, token_counter, sketch_k)
+        analyzer.path = path
+        analyzer.workers = workers
+        return analyzer
     
     def analyze(self) -> Dict:
         """完整分析"""
@@ -35,9 +523,19 @@ class DatasetAnalyzer:
         print("📊 数据集分析")
         print("=" * 60)
         
+        if self.path is not None:
+            self.summary = summarize_file(self.path, self.token_counter, self.workers, self.sketch_k)
+        else:
+            self.summary = DatasetSummary(self.sketch_k)
+            self.summary.update(self.samples, self.token_counter)
+        
         # 基础统计
-        self.stats["total_samples"] = len(self.samples)
+        self.stats["total_samples"] = self.summary.total
         print(f"\n总样本数: {self.stats['total_samples']}")
+        if self.summary.total == 0:
+            print("⚠️ 数据集为空")
+            self.stats["recommended_max_seq_length"] = 2048
+            return self.stats
         
         # 按类型统计
         self._analyze_by_type()
@@ -58,79 +556,47 @@ class DatasetAnalyzer:
     
     def _analyze_by_type(self):
         """按 root_type 分类统计"""
-        type_counter = Counter()
-        for s in self.samples:
-            root_type = s.get("meta", {}).get("root_type", "Unknown")
-            type_counter[root_type] += 1
+        type_counter = self.summary.by_type
         
         self.stats["by_type"] = dict(type_counter)
         
         print(f"\n📂 按类型分布:")
         for t, count in type_counter.most_common():
-            pct = count / len(self.samples) * 100
+            pct = count / self.summary.total * 100
             print(f"   {t}: {count} ({pct:.1f}%)")
     
     def _analyze_by_complexity(self):
         """按复杂度统计"""
-        complexity_counter = Counter()
-        for s in self.samples:
-            complexity = s.get("meta", {}).get("complexity", "Unknown")
-            complexity_counter[complexity] += 1
+        complexity_counter = self.summary.by_complexity
         
         self.stats["by_complexity"] = dict(complexity_counter)
         
         print(f"\n📈 按复杂度分布:")
         for c, count in complexity_counter.most_common():
-            pct = count / len(self.samples) * 100
+            pct = count / self.summary.total * 100
             print(f"   {c}: {count} ({pct:.1f}%)")
     
     def _analyze_length(self):
         """长度分析"""
-        line_counts = []
-        char_counts = []
-        
-        for s in self.samples:
-            output = s.get("output", "")
-            line_counts.append(s.get("meta", {}).get("line_count", output.count("\n") + 1))
-            char_counts.append(len(output))
+        lines = self.summary.line_count
+        chars = self.summary.char_count
         
         self.stats["line_count"] = {
-            "min": min(line_counts),
-            "max": max(line_counts),
-            "avg": sum(line_counts) / len(line_counts),
-            "median": sorted(line_counts)[len(line_counts) // 2]
+            "min": lines.min,
+            "max": lines.max,
+            "avg": lines.avg,
+            "median": lines.sketch.quantile(0.5)
         }
         
         self.stats["char_count"] = {
-            "min": min(char_counts),
-            "max": max(char_counts),
-            "avg": sum(char_counts) / len(char_counts),
-            "median": sorted(char_counts)[len(char_counts) // 2]
+            "min": chars.min,
+            "max": chars.max,
+            "avg": chars.avg,
+            "median": chars.sketch.quantile(0.5)
         }
         
         # 长度分布
-        length_buckets = {
-            "1-30行": 0,
-            "31-50行": 0,
-            "51-100行": 0,
-            "101-150行": 0,
-            "151-200行": 0,
-            "200+行": 0
-        }
-        
-        for lc in line_counts:
-            if lc <= 30:
-                length_buckets["1-30行"] += 1
-            elif lc <= 50:
-                length_buckets["31-50行"] += 1
-            elif lc <= 100:
-                length_buckets["51-100行"] += 1
-            elif lc <= 150:
-                length_buckets["101-150行"] += 1
-            elif lc <= 200:
-                length_buckets["151-200行"] += 1
-            else:
-                length_buckets["200+行"] += 1
+        length_buckets = {bucket: self.summary.length_buckets[bucket] for bucket, _ in LENGTH_BUCKETS}
         
         self.stats["length_distribution"] = length_buckets
         
@@ -140,51 +606,13 @@ class DatasetAnalyzer:
         
         print(f"\n📊 长度分布:")
         for bucket, count in length_buckets.items():
-            pct = count / len(self.samples) * 100
+            pct = count / self.summary.total * 100
             bar = "█" * int(pct / 2)
             print(f"   {bucket}: {count:5d} ({pct:5.1f}%) {bar}")
     
     def _check_data_coverage(self):
         """检查数据覆盖完整性"""
-        coverage = {
-            "has_audio": False,      # Container/Sound 层级
-            "has_event": False,      # Event + ADD_ACTION
-            "has_attenuation": False, # Attenuation 曲线
-            "has_game_param": False,  # GameParameter
-            "has_switch_group": False, # SwitchGroup
-            "has_state_group": False,  # StateGroup
-            "has_workflow": False,    # Event + Target 组合
-        }
-        
-        for s in self.samples:
-            root_type = s.get("meta", {}).get("root_type", "")
-            output = s.get("output", "")
-            
-            if root_type in ["RandomSequenceContainer", "SwitchContainer", "BlendContainer", "ActorMixer"]:
-                coverage["has_audio"] = True
-            
-            if root_type == "Event":
-                coverage["has_event"] = True
-                # 检查是否有完整工作流(Event + 包含 Container 创建)
-                if "RandomSequenceContainer" in output or "SwitchContainer" in output:
-                    coverage["has_workflow"] = True
-            
-            # 检查 Workflow 类型(由 dataset_optimizer 生成)
-            if root_type == "Workflow":
-                coverage["has_event"] = True
-                coverage["has_workflow"] = True
-            
-            if root_type == "Attenuation":
-                coverage["has_attenuation"] = True
-            
-            if root_type == "GameParameter":
-                coverage["has_game_param"] = True
-            
-            if root_type == "SwitchGroup":
-                coverage["has_switch_group"] = True
-            
-            if root_type == "StateGroup":
-                coverage["has_state_group"] = True
+        coverage = dict(self.summary.coverage)
         
         self.stats["coverage"] = coverage
         
@@ -199,41 +627,34 @@ class DatasetAnalyzer:
         print(f"   {status[coverage['has_workflow']]} Event+Target 工作流")
     
     def _estimate_tokens(self):
-        """估算 Token 数量"""
-        # 粗略估算: 中文约 1.5 token/字符, 英文约 0.25 token/字符
-        # DSL 代码主要是英文,估算 0.3 token/字符
-        
-        token_estimates = []
-        for s in self.samples:
-            instruction = s.get("instruction", "")
-            output = s.get("output", "")
-            
-            # 完整 prompt 的字符数
-            total_chars = len(instruction) + len(output) + 100  # 100 for system prompt overhead
-            
-            # 估算 tokens (DSL代码主要是英文关键词)
-            estimated_tokens = int(total_chars * 0.35)
-            token_estimates.append(estimated_tokens)
+        """统计 Token 数量 (V1.1: 有 tokenizer 时精确计数,否则按字符估算)"""
+        tokens = self.summary.tokens
+        total = self.summary.total
         
         self.stats["token_estimate"] = {
-            "min": min(token_estimates),
-            "max": max(token_estimates),
-            "avg": sum(token_estimates) / len(token_estimates),
-            "p90": sorted(token_estimates)[int(len(token_estimates) * 0.9)],
-            "p95": sorted(token_estimates)[int(len(token_estimates) * 0.95)],
-            "p99": sorted(token_estimates)[int(len(token_estimates) * 0.99)],
+            "min": tokens.min,
+            "max": tokens.max,
+            "avg": tokens.avg,
+            "p90": tokens.sketch.quantile(0.9),
+            "p95": tokens.sketch.quantile(0.95),
+            "p99": tokens.sketch.quantile(0.99),
         }
         
         # 超长样本统计
-        over_2048 = len([t for t in token_estimates if t > 2048])
-        over_4096 = len([t for t in token_estimates if t > 4096])
+        over_2048 = self.summary.overlength["over_2048"]
+        over_4096 = self.summary.overlength["over_4096"]
         
         self.stats["overlength"] = {
             "over_2048": over_2048,
             "over_4096": over_4096,
         }
         
-        print(f"\n🔢 Token 估算 (近似值):")
+        
+        counter = self.token_counter
+        if counter.exact:
+            print(f"\n🔢 Token 统计 (tokenizer 精确计数, 缓存命中 {counter.stats['hits']}, 新编码 {counter.stats['encoded']}):")
+        else:
+            print(f"\n🔢 Token 估算 (近似值):")
         print(f"   最小: {self.stats['token_estimate']['min']}")
         print(f"   最大: {self.stats['token_estimate']['max']}")
         print(f"   平均: {self.stats['token_estimate']['avg']:.0f}")
@@ -242,8 +663,8 @@ class DatasetAnalyzer:
         print(f"   P99: {self.stats['token_estimate']['p99']}")
         
         print(f"\n⚠️ 超长样本:")
-        print(f"   超过 2048 tokens: {over_2048} ({over_2048/len(self.samples)*100:.1f}%)")
-        print(f"   超过 4096 tokens: {over_4096} ({over_4096/len(self.samples)*100:.1f}%)")
+        print(f"   超过 2048 tokens: {over_2048} ({over_2048/total*100:.1f}%)")
+        print(f"   超过 4096 tokens: {over_4096} ({over_4096/total*100:.1f}%)")
         
         # 推荐 max_seq_length
         if self.stats['token_estimate']['p95'] <= 2048:
@@ -257,6 +678,195 @@ class DatasetAnalyzer:
         print(f"\n💡 推荐 max_seq_length: {recommended}")
 
 
+# =============================================================================
+# V1.3: 依赖感知的 DSL 拆分
+# =============================================================================
+
+_SPLIT_CREATE_RE = re.compile(r'^\s*CREATE(?:_EVENT)?\s+.*?"([^"]+)"(?:\s+UNDER\s+"([^"]+)")?', re.IGNORECASE)
+_SPLIT_QUOTED_RE = re.compile(r'"([^"]+)"')
+
+
+class _SplitUnit:
+    """一个对象的 CREATE 行 + 以该对象为主语的其余行 (SET_PROP / LINK / 曲线 ...)"""
+    
+    __slots__ = ("name", "create", "body", "parent", "children", "lines", "cost")
+    
+    def __init__(self, name: str, create: str, parent: Optional["_SplitUnit"]):
+        self.name = name
+        self.create = create
+        self.body: List[str] = []
+        self.parent = parent
+        self.children: List["_SplitUnit"] = []
+        self.lines = 0   # 子树总行数
+        self.cost = 0.0  # 子树总 token 估计
+
+
+class DSLSplitter:
+    """
+    按层级边界拆分超长 DSL
+    - 每个 CREATE 与其后以该对象为主语的行组成一个单元,单元按 UNDER 关系组成树
+    - 按原顺序 (先序) 装箱:整棵子树放得下就整体放入;当前块已过半就换块再放,
+      否则拆到子节点把当前块填满;单个单元过大时按行切开,每段重复该单元的 CREATE
+    - 每块只补声明用到、但块内没有的祖先 CREATE 行 (不带它们的属性行),
+      保证块内每个 UNDER / SET_PROP / LINK 按名称解析到的都是原样本中的同一个对象
+    - 限额:行数 max_lines,以及可选的 token 估计 max_cost (每字符 cost_per_char)
+    """
+    
+    def __init__(self, max_lines: int, max_cost: Optional[float] = None, cost_per_char: float = 0.0):
+        self.max_lines = max_lines
+        self.max_cost = max_cost
+        self.cost_per_char = cost_per_char
+    
+    def _line_cost(self, line: str) -> float:
+        return (len(line) + 1) * self.cost_per_char
+    
+    def _build(self, lines: List[str]) -> Tuple[List[str], List[_SplitUnit]]:
+        """解析为 (前导行, 根单元列表)"""
+        preamble: List[str] = []
+        units: Dict[str, _SplitUnit] = {}
+        roots: List[_SplitUnit] = []
+        last: Optional[_SplitUnit] = None
+        
+        # 同名对象允许重复创建 (不同父级,甚至 X UNDER X),名称总是指向最近一次创建的对象
+        for line in lines:
+            m = _SPLIT_CREATE_RE.match(line)
+            if m:
+                parent = units.get(m.group(2)) if m.group(2) else None
+                unit = _SplitUnit(m.group(1), line, parent)
+                units[unit.name] = unit
+                (parent.children if parent is not None else roots).append(unit)
+                last = unit
+                continue
+            
+            # 主语:IMPORT_AUDIO 取 INTO 的目标,其余取第一个引号名;
+            # 主语不是本样本创建的对象时归到最近的单元,保持相对顺序
+            quoted = _SPLIT_QUOTED_RE.findall(line)
+            if line.lstrip().upper().startswith("IMPORT_AUDIO") and len(quoted) > 1:
+                subject = quoted[1]
+            else:
+                subject = quoted[0] if quoted else None
+            owner = units.get(subject, last)
+            if owner is None:
+                preamble.append(line)
+            else:
+                owner.body.append(line)
+        
+        def measure(unit: _SplitUnit):
+            unit.lines = 1 + len(unit.body)
+            unit.cost = self._line_cost(unit.create) + sum(self._line_cost(l) for l in unit.body)
+            for child in unit.children:
+                measure(child)
+                unit.lines += child.lines
+                unit.cost += child.cost
+        
+        for root in roots:
+            measure(root)
+        return preamble, roots
+    
+    def split(self, output: str) -> List[str]:
+        lines = [line for line in output.split("\n") if line.strip()]
+        self._preamble, roots = self._build(lines)
+        self._chunks: List[List[str]] = []
+        self._start_chunk()
+        for root in roots:
+            self._place(root)
+        self._flush()
+        return ["\n".join(chunk) for chunk in self._chunks]
+    
+    # ---------------------------------------------------------------- 装箱
+    
+    def _start_chunk(self):
+        self._lines = list(self._preamble)
+        self._cost = sum(self._line_cost(l) for l in self._preamble)
+        self._latest: Dict[str, _SplitUnit] = {}  # 块内名称 -> 最近声明的单元
+        self._has_body = False
+    
+    def _flush(self):
+        if self._has_body:
+            self._chunks.append(self._lines)
+        self._start_chunk()
+    
+    def _missing_ancestors(self, unit: _SplitUnit) -> List[_SplitUnit]:
+        chain = []
+        parent = unit.parent
+        while parent is not None and self._latest.get(parent.name) is not parent:
+            chain.append(parent)
+            parent = parent.parent
+        chain.reverse()
+        return chain
+    
+    def _fits(self, lines: int, cost: float, ancestors: List[_SplitUnit]) -> bool:
+        lines += len(self._lines) + len(ancestors)
+        cost += self._cost + sum(self._line_cost(a.create) for a in ancestors)
+        return lines <= self.max_lines and (self.max_cost is None or cost <= self.max_cost)
+    
+    def _ensure_room(self, unit: _SplitUnit, lines: int, cost: float) -> bool:
+        """当前块放不下而新块放得下时换块;返回放入后是否在限额内"""
+        if self._fits(lines, cost, self._missing_ancestors(unit)):
+            return True
+        if self._has_body:
+            self._flush()
+            return self._fits(lines, cost, self._missing_ancestors(unit))
+        return False
+    
+    def _append(self, line: str):
+        self._lines.append(line)
+        self._cost += self._line_cost(line)
+    
+    def _declare(self, unit: _SplitUnit):
+        for ancestor in self._missing_ancestors(unit):
+            self._append(ancestor.create)
+            self._latest[ancestor.name] = ancestor
+        self._append(unit.create)
+        self._latest[unit.name] = unit
+        self._has_body = True
+    
+    def _emit_subtree(self, unit: _SplitUnit):
+        self._declare(unit)
+        for line in unit.body:
+            self._append(line)
+        for child in unit.children:
+            self._emit_subtree(child)
+    
+    def _half_full(self) -> bool:
+        return (len(self._lines) * 2 >= self.max_lines
+                or (self.max_cost is not None and self._cost * 2 >= self.max_cost))
+    
+    def _place(self, unit: _SplitUnit):
+        if self._fits(unit.lines, unit.cost, self._missing_ancestors(unit)):
+            self._emit_subtree(unit)
+            return
+        # 当前块已过半时换块整体放入;否则拆开子树把当前块填满,避免产生大量零碎小块
+        if self._has_body and self._half_full():
+            self._flush()
+            if self._fits(unit.lines, unit.cost, self._missing_ancestors(unit)):
+                self._emit_subtree(unit)
+                return
+        
+        # 先放本单元,再逐个放子树
+        own_cost = self._line_cost(unit.create) + sum(self._line_cost(l) for l in unit.body)
+        if self._ensure_room(unit, 1 + len(unit.body), own_cost):
+            self._declare(unit)
+            for line in unit.body:
+                self._append(line)
+        else:
+            # 单元本身过大:按行切开,每段重新声明该单元
+            for line in unit.body:
+                declared = self._latest.get(unit.name) is unit
+                pending = 0 if declared else 1
+                pending_cost = 0.0 if declared else self._line_cost(unit.create)
+                if not self._fits(pending + 1, pending_cost + self._line_cost(line), self._missing_ancestors(unit)):
+                    self._flush()
+                if self._latest.get(unit.name) is not unit:
+                    self._declare(unit)
+                self._append(line)
+            if self._latest.get(unit.name) is not unit:
+                self._declare(unit)
+        
+        for child in unit.children:
+            self._place(child)
+
+
 # =============================================================================
 # 数据集预处理器
 # =============================================================================
@@ -264,9 +874,10 @@ class DatasetAnalyzer:
 class DatasetPreprocessor:
     """数据集预处理器"""
     
-    def __init__(self, samples: List[Dict]):
+    def __init__(self, samples: List[Dict], token_counter: Optional[TokenCounter] = None):
         self.samples = samples
         self.processed = []
+        self.token_counter = token_counter or TokenCounter()
     
     def process(
         self,
@@ -280,11 +891,11 @@ class DatasetPreprocessor:
         
         Args:
             max_lines: 最大行数
-            max_tokens: 最大 token 数(估算)
+            max_tokens: 最大 token 数 (有 tokenizer 时为精确值,否则为估算)
             strategy: 处理策略
                 - truncate: 截断超长部分
                 - filter: 过滤超长样本
-                - split: 拆分超长样本(暂未实现)
+                - split: 按层级边界拆分超长样本 (V1.3,见 DSLSplitter)
             keep_ratio: 期望保留的样本比例
         """
         print("\n" + "=" * 60)
@@ -292,34 +903,35 @@ class DatasetPreprocessor:
         print("=" * 60)
         print(f"   策略: {strategy}")
         print(f"   最大行数: {max_lines}")
-        print(f"   最大 tokens (估算): {max_tokens}")
+        print(f"   最大 tokens ({'精确' if self.token_counter.exact else '估算'}): {max_tokens}")
         
         self.processed = []
         truncated_count = 0
         filtered_count = 0
+        split_count = 0
+        split_chunks = 0
         
-        for s in self.samples:
-            output = s.get("output", "")
-            lines = output.split("\n")
-            line_count = len(lines)
-            
-            # 估算 token 数
-            total_chars = len(s.get("instruction", "")) + len(output) + 100
-            estimated_tokens = int(total_chars * 0.35)
-            
-            # 判断是否超长
-            is_overlength = line_count > max_lines or estimated_tokens > max_tokens
+        # V1.4: 超长判定在列上一次算完,正常样本按区间整段保留,只逐条处理超长样本
+        frame = DatasetFrame.from_samples(self.samples, self.token_counter.count(self.samples),
+                                          with_commands=False)
+        overlength = frame.where((frame.output_lines > max_lines) | (frame.tokens > max_tokens))
+        
+        start = 0
+        for i in overlength.tolist():
+            self.processed.extend(self.samples[start:i])
+            start = i + 1
+            s = self.samples[i]
+            estimated_tokens = int(frame.tokens[i])
+            line_count = int(frame.output_lines[i])
             
-            if not is_overlength:
-                # 正常样本直接添加
-                self.processed.append(s)
-            elif strategy == "filter":
+            if strategy == "filter":
                 # 过滤策略:直接跳过
                 filtered_count += 1
             elif strategy == "truncate":
                 # 截断策略
                 if line_count > max_lines:
                     # 保留前 max_lines 行
+                    lines = s.get("output", "").split("\n")
                     truncated_output = "\n".join(lines[:max_lines])
                     new_sample = s.copy()
                     new_sample["output"] = truncated_output
@@ -331,6 +943,16 @@ class DatasetPreprocessor:
                     truncated_count += 1
                 else:
                     self.processed.append(s)
+            elif strategy == "split":
+                # 拆分策略:按层级边界切成多个合规样本
+                parts = self._split_sample(s, estimated_tokens, max_lines, max_tokens)
+                if parts:
+                    self.processed.extend(parts)
+                    split_count += 1
+                    split_chunks += len(parts)
+                else:
+                    filtered_count += 1
+        self.processed.extend(self.samples[start:])
         
         print(f"\n📊 处理结果:")
         print(f"   原始样本: {len(self.samples)}")
@@ -339,18 +961,81 @@ class DatasetPreprocessor:
             print(f"   截断样本: {truncated_count}")
         elif strategy == "filter":
             print(f"   过滤样本: {filtered_count}")
+        elif strategy == "split":
+            print(f"   拆分样本: {split_count} -> {split_chunks} 条")
+            if filtered_count:
+                print(f"   无法拆分 (已丢弃): {filtered_count}")
         
         actual_ratio = len(self.processed) / len(self.samples)
         print(f"   保留比例: {actual_ratio*100:.1f}%")
         
         return self.processed
     
-    def balance_dataset(self, target_ratio: Dict[str, float] = None) -> List[Dict]:
+    def _split_sample(self, s: Dict, tokens: int, max_lines: int, max_tokens: int,
+                      max_attempts: int = 3) -> List[Dict]:
+        """
+        用 DSLSplitter 拆分一个超长样本,返回拆出的样本 (每块都不超过 max_lines / max_tokens)
+        token 限额按本样本的 token/字符比例换算到 DSL 行上;实测仍超限时收紧预算重拆,
+        多次仍超限的块丢弃
+        """
+        output = s.get("output", "")
+        meta = s.get("meta", {})
+        # 模板 + instruction + 分段标注的固定开销
+        overhead = self.token_counter.count([{**s, "instruction": s.get("instruction", "") + "(第 99/99 部分)",
+                                              "output": ""}])[0]
+        cost_per_char = max(tokens - overhead, 1) / max(len(output), 1)
+        budget = float(max_tokens - overhead)
+        if budget <= 0:
+            return []
+        
+        for _ in range(max_attempts):
+            chunks = DSLSplitter(max_lines, budget, cost_per_char).split(output)
+            parts = []
+            for i, chunk in enumerate(chunks):
+                part = dict(s)
+                if len(chunks) > 1:
+                    part["instruction"] = f"{s.get('instruction', '')}(第 {i + 1}/{len(chunks)} 部分)"
+                part["output"] = chunk
+                part["meta"] = dict(meta)
+                part["meta"]["line_count"] = chunk.count("\n") + 1
+                part["meta"]["split_part"] = i + 1
+                part["meta"]["split_total"] = len(chunks)
+                part["meta"]["original_line_count"] = output.count("\n") + 1
+                parts.append(part)
+            
+            counts = self.token_counter.count(parts)
+            if max(counts) <= max_tokens:
+                break
+            budget *= max_tokens / max(counts) * 0.95
+        
+        return [p for p, n in zip(parts, counts)
+                if n <= max_tokens and p["meta"]["line_count"] <= max_lines]
+    
+    # balance_dataset 的默认分类 (root_type -> 类别)
+    BALANCE_CATEGORIES = {
+        "RandomSequenceContainer": "audio",
+        "SwitchContainer": "audio",
+        "BlendContainer": "audio",
+        "ActorMixer": "audio",
+        "Event": "event",
+        "Attenuation": "attenuation",
+        "GameParameter": "gameparam",
+        "SwitchGroup": "switch_state",
+        "StateGroup": "switch_state",
+    }
+    
+    def balance_dataset(self, target_ratio: Dict[str, float] = None,
+                        total: Optional[int] = None, seed: int = 42) -> List[Dict]:
         """
         平衡数据集(按类型)
         
         Args:
-            target_ratio: 目标比例,如 {"audio": 0.5, "event": 0.2, ...}
+            target_ratio: 目标比例,如 {"audio": 0.5, "event": 0.2, ...};
+                占比是该类在结果中的上限,样本不足的类全部保留,未列出的类 (other) 原样保留。
+                键也可以是 root_type|complexity|source 分层 (见 stratified_sampler),
+                此时按分层而非上面的类别采样
+            total: 结果样本数上限
+            seed: 随机种子
         """
         if target_ratio is None:
             # 默认比例
@@ -362,27 +1047,22 @@ class DatasetPreprocessor:
                 "switch_state": 0.08,
             }
         
-        # 分类样本
-        categorized = defaultdict(list)
-        for s in self.processed:
-            root_type = s.get("meta", {}).get("root_type", "")
-            
-            if root_type in ["RandomSequenceContainer", "SwitchContainer", "BlendContainer", "ActorMixer"]:
-                categorized["audio"].append(s)
-            elif root_type == "Event":
-                categorized["event"].append(s)
-            elif root_type == "Attenuation":
-                categorized["attenuation"].append(s)
-            elif root_type == "GameParameter":
-                categorized["gameparam"].append(s)
-            elif root_type in ["SwitchGroup", "StateGroup"]:
-                categorized["switch_state"].append(s)
-            else:
-                categorized["other"].append(s)
+        # 分类样本:类别名 或 分层键
+        if set(target_ratio) <= set(self.BALANCE_CATEGORIES.values()):
+            categories = self.BALANCE_CATEGORIES
+            key = lambda s: categories.get(s.get("meta", {}).get("root_type", ""), "other")
+        else:
+            key = StratumMatcher(target_ratio)
+        
+        sampler = StratifiedSampler(target_ratio, total=total, seed=seed)
+        sampler.extend(self.processed, key)
+        self.processed = sampler.result()
         
-        print(f"\n📊 当前分布:")
-        for cat, samples in categorized.items():
-            print(f"   {cat}: {len(samples)}")
+        report = sampler.report()
+        print(f"\n📊 平衡前 -> 平衡后:")
+        for cat, (before, after) in sorted(report.items(), key=lambda item: -item[1][0]):
+            print(f"   {cat}: {before} -> {after}")
+        print(f"   总计: {sum(before for before, _ in report.values())} -> {len(self.processed)}")
         
         return self.processed
     
@@ -417,31 +1097,57 @@ def main():
     parser.add_argument("--max-lines", type=int, default=100, help="最大行数 (默认 100)")
     parser.add_argument("--max-tokens", type=int, default=2048, help="最大 tokens (默认 2048)")
     parser.add_argument("--strategy", type=str, default="truncate", 
-                        choices=["truncate", "filter"], help="处理策略")
+                        choices=["truncate", "filter", "split"], help="处理策略")
     parser.add_argument("--analyze-only", action="store_true", help="仅分析,不处理")
+    parser.add_argument("--tokenizer", type=str, default=None,
+                        help="tokenizer.json 路径 (如 Qwen2.5),指定后精确统计 token 数")
+    parser.add_argument("--token-cache", type=str, default=None,
+                        help="token 计数缓存文件 (默认: <输入文件>.tokens.json)")
+    parser.add_argument("--token-batch", type=int, default=512, help="每批编码的样本数 (默认 512)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="分析阶段的并行进程数 (默认 1)")
+    parser.add_argument("--sketch-k", type=int, default=1000,
+                        help="分位数草图精度参数,越大越精确 (默认 1000)")
+    parser.add_argument("--balance", type=str, nargs="?", const="default", default=None,
+                        help="预处理后按类型/分层重新平衡;可给 JSON 占比,如 '{\"Event|complex\": 0.1}'")
+    parser.add_argument("--balance-total", type=int, default=None, help="平衡后的样本数上限")
+    parser.add_argument("--seed", type=int, default=42, help="平衡采样的随机种子")
     
     args = parser.parse_args()
     
-    # 加载数据
-    print(f"📂 加载数据集: {args.input}")
-    samples = load_jsonl(args.input)
+    token_counter = TokenCounter(
+        tokenizer_path=args.tokenizer,
+        cache_path=args.token_cache or f"{args.input}.tokens.json",
+        batch_size=args.token_batch,
+    )
     
-    # 分析
-    analyzer = DatasetAnalyzer(samples)
+    # 分析 (流式读取)
+    print(f"📂 分析数据集: {args.input}")
+    analyzer = DatasetAnalyzer.from_file(args.input, token_counter,
+                                         workers=args.workers, sketch_k=args.sketch_k)
     stats = analyzer.analyze()
+    token_counter.save()
     
     if args.analyze_only:
         print("\n✅ 分析完成 (仅分析模式)")
         return
     
-    # 预处理
-    preprocessor = DatasetPreprocessor(samples)
+    # 加载数据
+    print(f"\n📂 加载数据集: {args.input}")
+    samples = load_jsonl(args.input)
+    
+    # 预处理 (与分析共用计数缓存)
+    preprocessor = DatasetPreprocessor(samples, token_counter)
     processed = preprocessor.process(
         max_lines=args.max_lines,
         max_tokens=args.max_tokens,
         strategy=args.strategy
     )
     
+    # 平衡 (可选)
+    if args.balance:
+        target_ratio = None if args.balance == "default" else json.loads(args.balance)
+        processed = preprocessor.balance_dataset(target_ratio, total=args.balance_total, seed=args.seed)
+    
     # 保存
     if args.output:
         output_path = args.output
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+[数据集近似去重工具]V1.0
+功能:
+1. 全语料近似去重:裂变 / 工作流生成 / 多次合并会产生大量几乎相同的样本,白白消耗训练算力
+2. MinHash + LSH:分片 = DSL 连续行分片 ∪ instruction 字符 n-gram (dsl_dedupe 的 MinHasher)
+3. 候选对按签名相似度复核,达到 --threshold 的合并为同一簇 (并查集)
+4. 每簇保留一个代表 (文件中最先出现的样本),报告簇大小分布与最大的若干簇
+
+规模:
+- 签名计算按字节区间分片多进程并行 (-w),主进程只保存 n x num_perm 的 uint32 签名矩阵
+  (100 万样本 x 64 约 256 MB),不保存样本本身
+- LSH 分段分组、候选相似度复核都是 numpy 整列运算
+- 输出时再顺序读一遍原文件,按行原样写出代表样本 (不重新序列化)
+
+使用方法:
+    python dataset_dedupe.py data.jsonl -o data_dedup.jsonl
+    python dataset_dedupe.py huge.jsonl --threshold 0.8 -w 8 --clusters clusters.jsonl
+    python dataset_dedupe.py data.jsonl --no-instruction        # 只按 DSL 判重
+"""
+
+import os
+import json
+import argparse
+import multiprocessing
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dsl_dedupe import MinHasher, choose_bands, line_shingles, ngram_shingles
+
+# 候选复核每块的样本数
+VERIFY_CHUNK = 65536
+
+# 簇大小分布的分桶 (上界含)
+CLUSTER_BUCKETS = [(2, "2"), (5, "3-5"), (10, "6-10"), (50, "11-50"), (None, ">50")]
+
+
+# =============================================================================
+# 签名计算
+# =============================================================================
+
+class SampleHasher:
+    """样本 -> MinHash 签名 (DSL 行分片 + instruction n-gram)"""
+
+    def __init__(self, num_perm: int = 64, line_k: int = 2, ngram_n: int = 3,
+                 use_instruction: bool = True):
+        self.minhasher = MinHasher(num_perm)
+        self.line_k = line_k
+        self.ngram_n = ngram_n
+        self.use_instruction = use_instruction
+
+    def shingles(self, sample: Dict) -> List[int]:
+        hashes = line_shingles(sample.get("output", ""), self.line_k)
+        if self.use_instruction:
+            hashes += ngram_shingles(sample.get("instruction", ""), self.ngram_n)
+        return hashes
+
+    def signature(self, sample: Dict) -> np.ndarray:
+        # 取低 32 位:只用于相等比较,碰撞概率 2^-32,签名矩阵内存减半
+        sig = self.minhasher.signature_from_hashes(self.shingles(sample))
+        return np.frombuffer(sig, dtype=np.uint64).astype(np.uint32)
+
+
+def _file_shards(path: str, num_shards: int) -> List[Tuple[int, int]]:
+    """按字节把文件切成 num_shards 段,边界对齐到行首"""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, num_shards):
+            f.seek(max(size * i // num_shards, bounds[-1]))
+            if f.tell() > 0:
+                f.seek(f.tell() - 1)
+                f.readline()
+            bounds.append(f.tell())
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _iter_lines(path: str, start: int = 0, end: Optional[int] = None):
+    """逐行读取非空行 (原始字节);指定 [start, end) 时只读起始位置落在该字节区间内的行"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while end is None or f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                yield line
+
+
+def _sign_lines(hasher: SampleHasher, lines) -> Tuple[np.ndarray, np.ndarray]:
+    """签名一批行,返回 (签名矩阵, 有效行掩码);无法解析或不是 JSON 对象的行签名为 0 且标记无效"""
+    sigs = []
+    valid = []
+    for line in lines:
+        try:
+            sample = json.loads(line)
+        except json.JSONDecodeError:
+            sample = None
+        if not isinstance(sample, dict):
+            sigs.append(np.zeros(hasher.minhasher.num_perm, dtype=np.uint32))
+            valid.append(False)
+            continue
+        sigs.append(hasher.signature(sample))
+        valid.append(True)
+    if not sigs:
+        return np.zeros((0, hasher.minhasher.num_perm), dtype=np.uint32), np.zeros(0, dtype=bool)
+    return np.vstack(sigs), np.array(valid, dtype=bool)
+
+
+_WORKER_HASHER: Optional[SampleHasher] = None
+
+
+def _init_dedupe_worker(num_perm: int, line_k: int, ngram_n: int, use_instruction: bool):
+    global _WORKER_HASHER
+    _WORKER_HASHER = SampleHasher(num_perm, line_k, ngram_n, use_instruction)
+
+
+def _run_dedupe_shard(task: Tuple[str, int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    path, start, end = task
+    return _sign_lines(_WORKER_HASHER, _iter_lines(path, start, end))
+
+
+def sign_file(path: str, hasher: SampleHasher, workers: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    计算文件中每个非空行的签名 (行序与 _iter_lines 一致)
+    workers > 1 时按字节区间分片并行,分片数取 workers 的 4 倍以均衡负载
+    """
+    tasks = [(path, start, end) for start, end in _file_shards(path, workers * 4)]
+    if workers <= 1 or not tasks:
+        return _sign_lines(hasher, _iter_lines(path))
+
+    initargs = (hasher.minhasher.num_perm, hasher.line_k, hasher.ngram_n, hasher.use_instruction)
+    sig_parts, valid_parts = [], []
+    with multiprocessing.Pool(workers, initializer=_init_dedupe_worker, initargs=initargs) as mp_pool:
+        for sigs, valid in mp_pool.imap(_run_dedupe_shard, tasks):
+            sig_parts.append(sigs)
+            valid_parts.append(valid)
+    return np.concatenate(sig_parts), np.concatenate(valid_parts)
+
+
+# =============================================================================
+# LSH 聚类
+# =============================================================================
+
+class NearDuplicateClusterer:
+    """
+    签名矩阵 -> 近似重复簇
+    - 每个 LSH 分段:按分段内容分组,组内每个样本与组首 (下标最小者) 复核签名相似度
+    - 相似度 >= threshold 的样本并入组首所在的簇;簇根始终是下标最小的样本 (即代表)
+    """
+
+    def __init__(self, signatures: np.ndarray, valid: np.ndarray, threshold: float = 0.85,
+                 bands: Optional[int] = None):
+        self.signatures = signatures
+        self.valid = valid
+        self.threshold = threshold
+        num_perm = signatures.shape[1]
+        self.bands = bands or choose_bands(num_perm, threshold)
+        if num_perm % self.bands:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.rows = num_perm // self.bands
+        self.parent = list(range(len(signatures)))
+        self.stats = {"candidates": 0, "verified": 0}
+
+    def _find(self, i: int) -> int:
+        parent = self.parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def _union(self, a: int, b: int):
+        ra, rb = self._find(a), self._find(b)
+        if ra != rb:
+            # 下标小的作根,代表即最先出现的样本
+            if ra < rb:
+                self.parent[rb] = ra
+            else:
+                self.parent[ra] = rb
+
+    def cluster(self) -> np.ndarray:
+        """返回每个样本所属簇的代表下标 (无效行为 -1)"""
+        indices = np.flatnonzero(self.valid)
+        # 全部有效时直接用原矩阵,不再复制一份
+        sigs = self.signatures if len(indices) == len(self.valid) else self.signatures[indices]
+        r = self.rows
+        for band in range(self.bands):
+            keys = np.ascontiguousarray(sigs[:, band * r:(band + 1) * r]).view(np.dtype((np.void, 4 * r))).ravel()
+            _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            head = first[inverse.ravel()]
+            candidates = np.flatnonzero(head != np.arange(len(indices)))
+            if len(candidates) == 0:
+                continue
+            self.stats["candidates"] += len(candidates)
+            # 分块复核,临时矩阵大小有上界
+            for lo in range(0, len(candidates), VERIFY_CHUNK):
+                chunk = candidates[lo:lo + VERIFY_CHUNK]
+                similarity = (sigs[chunk] == sigs[head[chunk]]).mean(axis=1)
+                matched = chunk[similarity >= self.threshold]
+                self.stats["verified"] += len(matched)
+                for i, h in zip(indices[matched].tolist(), indices[head[matched]].tolist()):
+                    self._union(i, h)
+
+        roots = np.array([self._find(i) for i in range(len(self.parent))], dtype=np.int64)
+        roots[~self.valid] = -1
+        return roots
+
+
+# =============================================================================
+# 报告与输出
+# =============================================================================
+
+def cluster_report(roots: np.ndarray, top: int = 10) -> Dict:
+    """簇大小分布;只统计大小 >= 2 的簇"""
+    valid_roots = roots[roots >= 0]
+    sizes = np.bincount(valid_roots, minlength=len(roots)) if len(valid_roots) else np.zeros(0, dtype=np.int64)
+    dup_roots = np.flatnonzero(sizes >= 2)
+    dup_sizes = sizes[dup_roots]
+
+    buckets = Counter()
+    for size in dup_sizes.tolist():
+        for upper, label in CLUSTER_BUCKETS:
+            if upper is None or size <= upper:
+                buckets[label] += 1
+                break
+
+    order = np.argsort(-dup_sizes, kind="stable")[:top]
+    return {
+        "samples": int(len(valid_roots)),
+        "invalid": int(np.count_nonzero(roots < 0)),
+        "clusters": int(np.count_nonzero(sizes)),
+        "dup_clusters": int(len(dup_roots)),
+        "removed": int(len(valid_roots) - np.count_nonzero(sizes)),
+        "buckets": {label: buckets[label] for _, label in CLUSTER_BUCKETS},
+        "largest": [(int(dup_roots[i]), int(dup_sizes[i])) for i in order],
+    }
+
+
+def write_outputs(path: str, roots: np.ndarray, output_path: str,
+                  clusters_path: Optional[str] = None, preview: Optional[List[int]] = None) -> Dict[int, str]:
+    """
+    顺序读原文件,原样写出每簇的代表;可选把各簇成员下标写到 clusters_path
+    返回 preview 中代表样本的 instruction (用于报告)
+    """
+    wanted = set(preview or [])
+    previews = {}
+    with open(output_path, 'wb') as out:
+        for i, line in enumerate(_iter_lines(path)):
+            if roots[i] != i:
+                continue
+            out.write(line if line.endswith(b"\n") else line + b"\n")
+            if i in wanted:
+                previews[i] = json.loads(line).get("instruction", "")
+
+    if clusters_path:
+        members: Dict[int, List[int]] = {}
+        for i, root in enumerate(roots.tolist()):
+            if root >= 0:
+                members.setdefault(root, []).append(i)
+        with open(clusters_path, 'w', encoding='utf-8') as f:
+            for root, group in members.items():
+                if len(group) >= 2:
+                    f.write(json.dumps({"representative": root, "size": len(group), "members": group}) + "\n")
+    return previews
+
+
+# =============================================================================
+# 主函数
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="数据集近似去重工具 (MinHash LSH)")
+    parser.add_argument("input", type=str, help="输入 JSONL 文件")
+    parser.add_argument("-o", "--output", type=str, help="输出文件路径 (默认: <输入>_dedup.jsonl)")
+    parser.add_argument("--threshold", type=float, default=0.85,
+                        help="估计 Jaccard 相似度阈值,达到即视为近似重复 (默认 0.85)")
+    parser.add_argument("--num-perm", type=int, default=64, help="MinHash 签名长度 (默认 64)")
+    parser.add_argument("--bands", type=int, default=None, help="LSH 分段数 (默认按阈值自动选择)")
+    parser.add_argument("--line-k", type=int, default=2, help="DSL 行分片的连续行数 (默认 2)")
+    parser.add_argument("--ngram", type=int, default=3, help="instruction 字符 n-gram 长度 (默认 3)")
+    parser.add_argument("--no-instruction", action="store_true", help="只按 DSL 判重,不看 instruction")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="签名计算的并行进程数 (默认 1)")
+    parser.add_argument("--clusters", type=str, default=None, help="把各簇成员下标写到此 JSONL 文件")
+    parser.add_argument("--top", type=int, default=10, help="报告中列出的最大簇个数 (默认 10)")
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🧹 数据集近似去重工具 V1.0")
+    print("=" * 60)
+
+    hasher = SampleHasher(args.num_perm, args.line_k, args.ngram, not args.no_instruction)
+    print(f"\n📂 计算签名: {args.input} (workers={args.workers})")
+    signatures, valid = sign_file(args.input, hasher, workers=args.workers)
+
+    clusterer = NearDuplicateClusterer(signatures, valid, args.threshold, args.bands)
+    print(f"🔗 LSH 聚类: threshold={args.threshold}, bands={clusterer.bands} x rows={clusterer.rows}")
+    roots = clusterer.cluster()
+    report = cluster_report(roots, args.top)
+
+    if args.output:
+        output_path = args.output
+    else:
+        base, ext = os.path.splitext(args.input)
+        output_path = f"{base}_dedup{ext}"
+    previews = write_outputs(args.input, roots, output_path, args.clusters,
+                             preview=[root for root, _ in report["largest"]])
+
+    print("\n" + "=" * 60)
+    print("📊 去重结果")
+    print("=" * 60)
+    print(f"   输入样本: {report['samples']}")
+    if report["invalid"]:
+        print(f"   ⚠️ 无法解析 (已丢弃): {report['invalid']}")
+    print(f"   候选对: {clusterer.stats['candidates']}  复核通过: {clusterer.stats['verified']}")
+    print(f"   近似重复簇: {report['dup_clusters']}")
+    print(f"   删除样本: {report['removed']} ({report['removed'] / max(report['samples'], 1) * 100:.1f}%)")
+    print(f"   保留样本: {report['clusters']}")
+
+    print(f"\n📏 簇大小分布:")
+    for label, count in report["buckets"].items():
+        print(f"   {label:>5}: {count}")
+
+    if report["largest"]:
+        print(f"\n🔝 最大的 {len(report['largest'])} 个簇:")
+        for root, size in report["largest"]:
+            print(f"   [{size}] #{root} {' '.join(previews.get(root, '').split())[:50]}")
+
+    print(f"\n✅ 已保存: {output_path}")
+    if args.clusters:
+        print(f"   簇成员: {args.clusters}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+[数据工具]列式数据集帧 (V1.1)
+功能:为分析 / 预处理 / 优化流程提供样本标量字段的列式视图,
+      统计、分位数、过滤条件全部用 numpy 向量化计算
+维护者:NeuroWwise Architecture Team
+
+列:
+- chars:         output 字符数
+- output_lines:  output 实际行数 (换行数 + 1)
+- line_count:    meta.line_count (缺省时同 output_lines)
+- tokens:        token 数 (构建时传入,缺省为 0)
+- root_type / complexity: 类别编码 (int32),类别名按首次出现顺序保存在 *_names
+- commands:      (n, 5) 命令计数,列顺序见 COMMAND_COLUMNS;
+                 优先取 meta.commands,缺失时按行首命令词计数 (count_commands)
+- event_has_container: Event 样本的 output 中是否创建了容器 (工作流判定)
+
+只保存数值列,不保留 DSL 文本:百万级样本也只占几十 MB
+
+依赖:numpy;to_pandas() 额外需要 pandas
+
+更新 V1.1:
+1. [Fix] count_commands:按每行的行首命令词计数,取代 output.count("CREATE") 这类子串计数
+   (后者会把 CREATE_EVENT 记成 CREATE,名字里带 LINK 的也会被计入)
+"""
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+COMMAND_COLUMNS = ("CREATE", "SET_PROP", "LINK", "ASSIGN", "ADD_ACTION")
+
+
+def count_commands(dsl: str) -> Dict[str, int]:
+    """{命令: 条数},按每行的第一个词判定 (与 meta.commands 口径一致)"""
+    counts = dict.fromkeys(COMMAND_COLUMNS, 0)
+    for line in dsl.split("\n"):
+        head = line.split(None, 1)
+        if head and head[0] in counts:
+            counts[head[0]] += 1
+    return counts
+
+
+class _Categories:
+    """类别名 <-> 编码 (按首次出现顺序编码,与 Counter 的插入顺序一致)"""
+
+    def __init__(self, names: Optional[List[str]] = None):
+        self.names: List[str] = list(names or [])
+        self.codes: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+
+    def encode(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+class DatasetFrame:
+    """
+    样本标量字段的列式表
+
+    用法:
+        frame = DatasetFrame.from_samples(samples, token_counts)
+        frame.value_counts("root_type")                 # [("Sound", 120), ...]
+        frame.quantile("tokens", 0.95)
+        idx = frame.where(frame.is_type("Event") & (frame.tokens > 2048))
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], root_types: List[str], complexities: List[str]):
+        self.chars = columns["chars"]
+        self.output_lines = columns["output_lines"]
+        self.line_count = columns["line_count"]
+        self.tokens = columns["tokens"]
+        self.root_type = columns["root_type"]
+        self.complexity = columns["complexity"]
+        self.commands = columns["commands"]
+        self.event_has_container = columns["event_has_container"]
+        self.root_types = root_types
+        self.complexities = complexities
+
+    # ------------------------------------------------------------------ 构建
+
+    @classmethod
+    def from_samples(cls, samples: Iterable[Dict], token_counts: Optional[Sequence[int]] = None,
+                     root_types: Optional[List[str]] = None,
+                     complexities: Optional[List[str]] = None,
+                     with_commands: bool = True) -> "DatasetFrame":
+        """
+        单遍抽取列 (这是唯一的逐样本循环,之后的统计都在数组上完成)
+        root_types / complexities 可传入已有类别表,使多个帧的编码一致
+        with_commands=False 时跳过命令计数 (commands 列全为 0),省去 meta 缺失时对 output 的逐行扫描
+        """
+        types = _Categories(root_types)
+        levels = _Categories(complexities)
+        chars = array('q')
+        output_lines = array('q')
+        line_count = array('q')
+        type_codes = array('i')
+        level_codes = array('i')
+        commands = array('q')
+        event_has_container = array('b')
+        event_code = types.encode("Event") if "Event" in types.codes else None
+
+        for s in samples:
+            output = s.get("output", "")
+            meta = s.get("meta", {})
+            n_lines = output.count("\n") + 1
+            chars.append(len(output))
+            output_lines.append(n_lines)
+            line_count.append(meta.get("line_count", n_lines))
+
+            code = types.encode(meta.get("root_type", "Unknown"))
+            type_codes.append(code)
+            level_codes.append(levels.encode(meta.get("complexity", "Unknown")))
+
+            if with_commands:
+                cmd = meta.get("commands")
+                if isinstance(cmd, dict):
+                    commands.extend(cmd.get(k, 0) for k in COMMAND_COLUMNS)
+                else:
+                    commands.extend(count_commands(output).values())
+
+            if event_code is None and types.names[code] == "Event":
+                event_code = code
+            event_has_container.append(
+                code == event_code
+                and ("RandomSequenceContainer" in output or "SwitchContainer" in output)
+            )
+
+        n = len(chars)
+        if token_counts is None:
+            tokens = np.zeros(n, dtype=np.int64)
+        else:
+            tokens = np.asarray(token_counts, dtype=np.int64)
+            if len(tokens) != n:
+                raise ValueError(f"token_counts 长度 {len(tokens)} 与样本数 {n} 不一致")
+
+        columns = {
+            "chars": np.frombuffer(chars, dtype=np.int64).copy(),
+            "output_lines": np.frombuffer(output_lines, dtype=np.int64).copy(),
+            "line_count": np.frombuffer(line_count, dtype=np.int64).copy(),
+            "tokens": tokens,
+            "root_type": np.frombuffer(type_codes, dtype=np.int32).copy(),
+            "complexity": np.frombuffer(level_codes, dtype=np.int32).copy(),
+            "commands": (np.frombuffer(commands, dtype=np.int64).reshape(n, len(COMMAND_COLUMNS)).copy()
+                         if with_commands else np.zeros((n, len(COMMAND_COLUMNS)), dtype=np.int64)),
+            "event_has_container": np.frombuffer(event_has_container, dtype=np.int8).astype(bool),
+        }
+        return cls(columns, types.names, levels.names)
+
+    def _columns(self) -> Dict[str, np.ndarray]:
+        return {
+            "chars": self.chars,
+            "output_lines": self.output_lines,
+            "line_count": self.line_count,
+            "tokens": self.tokens,
+            "root_type": self.root_type,
+            "complexity": self.complexity,
+            "commands": self.commands,
+            "event_has_container": self.event_has_container,
+        }
+
+    def take(self, indices) -> "DatasetFrame":
+        """按下标 (或布尔掩码) 取子表,类别表共享"""
+        return DatasetFrame({k: v[indices] for k, v in self._columns().items()},
+                            self.root_types, self.complexities)
+
+    @classmethod
+    def concat(cls, frames: List["DatasetFrame"]) -> "DatasetFrame":
+        """拼接多个帧 (类别编码按名称重映射到统一的类别表)"""
+        types = _Categories()
+        levels = _Categories()
+        parts: Dict[str, List[np.ndarray]] = {}
+        for frame in frames:
+            cols = frame._columns()
+            type_map = np.array([types.encode(t) for t in frame.root_types] or [0], dtype=np.int32)
+            level_map = np.array([levels.encode(c) for c in frame.complexities] or [0], dtype=np.int32)
+            cols["root_type"] = type_map[cols["root_type"]]
+            cols["complexity"] = level_map[cols["complexity"]]
+            for k, v in cols.items():
+                parts.setdefault(k, []).append(v)
+        if not parts:
+            return cls.from_samples([])
+        return cls({k: np.concatenate(v) for k, v in parts.items()}, types.names, levels.names)
+
+    def __len__(self) -> int:
+        return len(self.chars)
+
+    # ------------------------------------------------------------------ 谓词
+
+    def type_code(self, name: str) -> int:
+        """类别名 -> 编码 (不存在时返回 -1,匹配不到任何样本)"""
+        try:
+            return self.root_types.index(name)
+        except ValueError:
+            return -1
+
+    def is_type(self, *names: str) -> np.ndarray:
+        """root_type 属于 names 之一的布尔掩码"""
+        codes = [self.type_code(name) for name in names]
+        return np.isin(self.root_type, codes)
+
+    def command(self, name: str) -> np.ndarray:
+        return self.commands[:, COMMAND_COLUMNS.index(name)]
+
+    @staticmethod
+    def where(mask: np.ndarray) -> np.ndarray:
+        return np.flatnonzero(mask)
+
+    # ------------------------------------------------------------------ 统计
+
+    def category_counts(self, column: str = "root_type") -> Dict[str, int]:
+        """{类别名: 数量},按类别首次出现顺序 (可直接 Counter.update,保持插入顺序语义)"""
+        names = self.root_types if column == "root_type" else self.complexities
+        codes, first, counts = np.unique(getattr(self, column), return_index=True, return_counts=True)
+        # take / 打乱之后类别表顺序不再是行内首次出现顺序,按首行下标重排
+        order = np.argsort(first, kind="stable")
+        return {names[codes[i]]: int(counts[i]) for i in order}
+
+    def value_counts(self, column: str = "root_type") -> List[tuple]:
+        """[(类别名, 数量), ...],按数量降序,同数量按首次出现顺序 (与 Counter.most_common 一致)"""
+        return sorted(self.category_counts(column).items(), key=lambda item: -item[1])
+
+    def quantile(self, column: str, q: float) -> int:
+        """排名为 int(n * q) 的值 (与 sorted(values)[int(n * q)] 一致,O(n) 选择)"""
+        values = getattr(self, column)
+        k = min(int(len(values) * q), len(values) - 1)
+        return int(np.partition(values, k)[k])
+
+    def describe(self, column: str) -> Dict[str, float]:
+        values = getattr(self, column)
+        return {
+            "min": int(values.min()),
+            "max": int(values.max()),
+            "avg": float(values.mean()),
+            "median": self.quantile(column, 0.5),
+        }
+
+    def bucket_counts(self, column: str, upper_bounds: Sequence[int]) -> np.ndarray:
+        """按上界 (含) 分桶计数,最后一个桶收 > 最大上界的值;返回长度 len(upper_bounds) + 1"""
+        buckets = np.searchsorted(np.asarray(upper_bounds), getattr(self, column), side="left")
+        return np.bincount(buckets, minlength=len(upper_bounds) + 1)
+
+    def to_pandas(self):
+        """转成 pandas.DataFrame (类别列为 Categorical)"""
+        import pandas as pd
+        data = {
+            "chars": self.chars,
+            "output_lines": self.output_lines,
+            "line_count": self.line_count,
+            "tokens": self.tokens,
+            "root_type": pd.Categorical.from_codes(self.root_type, self.root_types),
+            "complexity": pd.Categorical.from_codes(self.complexity, self.complexities),
+            "event_has_container": self.event_has_container,
+        }
+        for i, name in enumerate(COMMAND_COLUMNS):
+            data[name] = self.commands[:, i]
+        return pd.DataFrame(data)
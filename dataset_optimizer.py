@@ -1,20 +1,46 @@
 # -*- coding: utf-8 -*-
 """
-[数据集优化器]V1.0
+[数据集优化器]V1.3
 功能:
 1. 自动降采样过多的 GameParameter
 2. 生成真正的 Event+Target 工作流样本(Container + Event 一体)
 3. 平衡数据集各类型占比
 
+更新 V1.3:
+1. [Fix] 工作流样本的 commands 由容器样本的 meta.commands 加上 Event 两行的增量 (CREATE +1, ADD_ACTION +1) 得到,
+   meta 缺失时按行首命令词计数 (count_commands);不再对合并后的整段 DSL 做子串计数
+   (原先 "CREATE" 会匹配 CREATE_EVENT,"LINK" 会匹配名字里的 LINK);line_count 同理按增量计算
+2. [Feat] --stream / optimize_to_file:输入按行偏移随机读取 (JsonlIndex),
+   降采样、工作流抽选、打乱都只在下标上完成,样本边生成边写出,不拼接合并列表,
+   内存只与样本数 (数值列与偏移) 有关,与样本文本大小无关;同一 seed 下输出与 optimize 一致
+3. 工作流的行数上限改用 DatasetFrame.line_count (meta.line_count 缺失时为实际行数,原先记为 0)
+
+更新 V1.2:
+1. [Feat] --ratios:一次给多个类型/分层 (root_type|complexity|source) 设目标占比,
+   由 StratifiedSampler (stratified_sampler.py) 单遍分层水库采样,替代逐类型 random.sample
+2. 降采样结果保持原样本顺序;采样使用独立 RNG (同一 seed 下与 V1.1 的抽样结果不同)
+
+更新 V1.1:
+1. [Perf] 加载后一次性抽成 DatasetFrame (dataset_frame.py),类型分布、降采样候选、
+   可生成工作流的容器都由 numpy 掩码得到,报告不再逐样本遍历字典
+2. 同一 seed 下随机数消耗顺序不变,输出与 V1.0 一致
+
 使用方法:
     python dataset_optimizer.py combined_wwise_data_v1.jsonl -o optimized_dataset.jsonl
+    python dataset_optimizer.py huge.jsonl -o optimized_dataset.jsonl --stream
 """
 
 import json
 import random
 import argparse
+from array import array
 from collections import Counter
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from dataset_frame import COMMAND_COLUMNS, DatasetFrame, count_commands
+from stratified_sampler import STRATUM_SEP, StratifiedSampler, StratumMatcher
 
 # =============================================================================
 # 目标占比配置
@@ -62,19 +88,34 @@ class WorkflowGenerator:
     # Event 父级选项
     EVENT_PARENTS = ["Default Work Unit", "SFX", "Skills", "Combat", "Player", "Monster"]
     
+    # Event 部分带来的增量:一个空行 + CREATE Event + ADD_ACTION
+    EVENT_LINES = 3
+    EVENT_COMMANDS = {"CREATE": 1, "ADD_ACTION": 1}
+    
     @classmethod
-    def generate_workflow_sample(cls, container_sample: Dict) -> Dict:
+    def draw_choices(cls) -> Tuple[str, str]:
+        """抽取 (Event 父级, instruction 模板),随机数消耗顺序与逐个生成时一致"""
+        return random.choice(cls.EVENT_PARENTS), random.choice(cls.WORKFLOW_TEMPLATES)
+    
+    @classmethod
+    def generate_workflow_sample(cls, container_sample: Dict,
+                                 event_parent: Optional[str] = None,
+                                 template: Optional[str] = None) -> Dict:
         """
         从 Container 样本生成工作流样本
         
         将 Container 的 DSL 代码 + Event 创建合并为一个完整工作流
+        event_parent / template 可预先由 draw_choices 抽好 (流式优化时先抽选、后生成)
         """
-        root_name = container_sample.get("meta", {}).get("root_name", "Unknown")
-        root_type = container_sample.get("meta", {}).get("root_type", "")
+        meta = container_sample.get("meta", {})
+        root_name = meta.get("root_name", "Unknown")
+        root_type = meta.get("root_type", "")
         original_output = container_sample.get("output", "")
         
+        if event_parent is None or template is None:
+            event_parent, template = cls.draw_choices()
+        
         # 生成 Event 部分
-        event_parent = random.choice(cls.EVENT_PARENTS)
         event_name = f"Play_{root_name}"
         
         event_dsl = f'\nCREATE Event "{event_name}" UNDER "{event_parent}"\n'
@@ -84,16 +125,17 @@ class WorkflowGenerator:
         combined_output = original_output + "\n" + event_dsl
         
         # 生成新的 instruction
-        instruction = random.choice(cls.WORKFLOW_TEMPLATES).format(name=root_name)
+        instruction = template.format(name=root_name)
         
-        # 统计命令
-        commands = {
-            "CREATE": combined_output.count("CREATE"),
-            "SET_PROP": combined_output.count("SET_PROP"),
-            "LINK": combined_output.count("LINK"),
-            "ASSIGN": combined_output.count("ASSIGN"),
-            "ADD_ACTION": combined_output.count("ADD_ACTION"),
-        }
+        # 统计命令:容器部分沿用 meta (缺失时按行首命令词计数),再加 Event 部分的增量
+        base_commands = meta.get("commands")
+        if not isinstance(base_commands, dict):
+            base_commands = count_commands(original_output)
+        commands = {k: base_commands.get(k, 0) + cls.EVENT_COMMANDS.get(k, 0) for k in COMMAND_COLUMNS}
+        
+        base_lines = meta.get("line_count")
+        if base_lines is None:
+            base_lines = original_output.count("\n") + 1
         
         # 构建新样本
         workflow_sample = {
@@ -104,8 +146,8 @@ class WorkflowGenerator:
                 "source": "workflow_generated",
                 "root_type": "Workflow",  # 标记为工作流类型
                 "root_name": root_name,
-                "line_count": combined_output.count("\n") + 1,
-                "depth": container_sample.get("meta", {}).get("depth", 1) + 1,
+                "line_count": base_lines + cls.EVENT_LINES,
+                "depth": meta.get("depth", 1) + 1,
                 "complexity": "medium",
                 "commands": commands,
                 "container_type": root_type,
@@ -125,15 +167,13 @@ class DatasetOptimizer:
     
     def __init__(self, samples: List[Dict], seed: int = 42):
         self.samples = samples
+        self.frame = DatasetFrame.from_samples(samples, with_commands=False)
         self.seed = seed
         random.seed(seed)
     
     def analyze(self):
         """分析当前数据集"""
-        type_counter = Counter()
-        for s in self.samples:
-            root_type = s.get("meta", {}).get("root_type", "Unknown")
-            type_counter[root_type] += 1
+        type_counter = Counter(self.frame.category_counts("root_type"))
         
         print("=" * 60)
         print("📊 当前数据集分布")
@@ -150,114 +190,170 @@ class DatasetOptimizer:
         """
         降采样指定类型到目标占比
         """
-        # 分离目标类型和其他类型
-        target_samples = []
-        other_samples = []
-        
-        for s in self.samples:
-            if s.get("meta", {}).get("root_type") == type_name:
-                target_samples.append(s)
-            else:
-                other_samples.append(s)
-        
-        current_count = len(target_samples)
-        other_count = len(other_samples)
-        
-        # 计算目标数量
-        # target_ratio = target_count / (target_count + other_count)
-        # target_count = target_ratio * other_count / (1 - target_ratio)
-        target_count = int(target_ratio * other_count / (1 - target_ratio))
-        target_count = min(target_count, current_count)  # 不能超过当前数量
-        
-        print(f"\n🔧 降采样 {type_name}:")
-        print(f"   当前: {current_count}")
-        print(f"   目标: {target_count}")
-        print(f"   删除: {current_count - target_count}")
+        return self.downsample({type_name: target_ratio})
+    
+    def downsample(self, ratios: Dict[str, float]) -> List[Dict]:
+        """
+        一次降采样多个类型/分层到各自的目标占比 (V1.2)
+        键为 root_type,或 root_type|complexity|source 分层 (支持 * 通配,见 stratified_sampler)
+        """
+        return [self.samples[i] for i in self._downsample_indices(ratios)]
+    
+    def _downsample_indices(self, ratios: Dict[str, float]) -> np.ndarray:
+        """降采样后保留的样本下标 (保持原顺序)"""
+        sampler = StratifiedSampler(ratios, seed=self.seed)
+        if all(STRATUM_SEP not in key for key in ratios):
+            # 只按 root_type 分层:每个类别匹配一次,逐行查表
+            matcher = StratumMatcher(ratios, fields=("root_type",))
+            keys = [matcher.match(name) for name in self.frame.root_types]
+            for i, code in enumerate(self.frame.root_type.tolist()):
+                sampler.add(keys[code], i)
+        else:
+            matcher = StratumMatcher(ratios)
+            sampler.extend(range(len(self.samples)), lambda i: matcher(self.samples[i]))
         
-        # 随机采样
-        if target_count < current_count:
-            target_samples = random.sample(target_samples, target_count)
+        for stratum, (current_count, target_count) in sampler.report().items():
+            if stratum not in ratios:
+                continue
+            print(f"\n🔧 降采样 {stratum}:")
+            print(f"   当前: {current_count}")
+            print(f"   目标: {target_count}")
+            print(f"   删除: {current_count - target_count}")
         
-        return other_samples + target_samples
+        return np.array(sampler.result(), dtype=np.int64)
     
-    def generate_workflows(self, ratio: float = 0.3) -> List[Dict]:
+    def _plan_workflows(self, ratio: float, indices: np.ndarray) -> List[Tuple[int, str, str]]:
         """
-        为部分 Container 样本生成工作流版本
-        
-        Args:
-            ratio: 生成工作流的比例(默认 30% 的 Container 会有工作流版本)
+        在 indices (保持顺序) 中抽选生成工作流的容器,并预先抽好随机选项
+        返回 [(样本下标, Event 父级, instruction 模板), ...],此时不读取样本
         """
-        workflow_samples = []
-        container_count = 0
+        plans = []
+        containers = indices[self.frame.is_type(*WORKFLOW_CONTAINER_TYPES)[indices]]
+        line_counts = self.frame.line_count[containers]
+        container_count = len(containers)
         
-        for s in self.samples:
-            root_type = s.get("meta", {}).get("root_type", "")
-            
-            if root_type not in WORKFLOW_CONTAINER_TYPES:
-                continue
-            
-            container_count += 1
-            
-            # 按比例生成
+        for i, original_lines in zip(containers.tolist(), line_counts.tolist()):
+            # 按比例生成 (每个容器抽一次随机数,与逐样本遍历时的消耗顺序一致)
             if random.random() > ratio:
                 continue
             
             # 检查原始 output 长度,太长的不生成工作流
-            original_lines = s.get("meta", {}).get("line_count", 0)
             if original_lines > 60:  # 超过60行的不生成,避免太长
                 continue
             
-            workflow = WorkflowGenerator.generate_workflow_sample(s)
-            workflow_samples.append(workflow)
+            event_parent, template = WorkflowGenerator.draw_choices()
+            plans.append((i, event_parent, template))
         
         print(f"\n🔧 生成 Event+Target 工作流:")
         print(f"   可用 Container: {container_count}")
-        print(f"   生成工作流: {len(workflow_samples)}")
+        print(f"   生成工作流: {len(plans)}")
         
-        return workflow_samples
+        return plans
     
-    def optimize(
+    def generate_workflows(self, ratio: float = 0.3) -> List[Dict]:
+        """
+        为部分 Container 样本生成工作流版本
+        
+        Args:
+            ratio: 生成工作流的比例(默认 30% 的 Container 会有工作流版本)
+        """
+        plans = self._plan_workflows(ratio, np.arange(len(self.samples)))
+        return [WorkflowGenerator.generate_workflow_sample(self.samples[i], event_parent, template)
+                for i, event_parent, template in plans]
+    
+    def iter_optimized(
         self,
         downsample_gameparam: bool = True,
         generate_workflows: bool = True,
         workflow_ratio: float = 0.3,
-    ) -> List[Dict]:
+        ratios: Dict[str, float] = None,
+    ) -> Iterator[Dict]:
         """
-        执行完整优化
+        按最终顺序逐个产出优化后的样本,不拼接合并列表 (V1.3)
+        降采样、工作流抽选、打乱都只在下标上完成;工作流样本在产出时才生成
         """
         print("\n" + "=" * 60)
         print("🚀 开始数据集优化")
         print("=" * 60)
         
-        optimized = self.samples.copy()
+        # 1. 降采样 (默认 GameParameter)
+        if ratios is None:
+            ratios = {"GameParameter": TARGET_RATIOS["GameParameter"]}
+        if downsample_gameparam and ratios:
+            keep = self._downsample_indices(ratios)
+        else:
+            keep = np.arange(len(self.samples))
+        
+        # 2. 抽选工作流
+        plans = self._plan_workflows(workflow_ratio, keep) if generate_workflows else []
         
-        # 1. 降采样 GameParameter
-        if downsample_gameparam:
-            optimized = self.downsample_type("GameParameter", TARGET_RATIOS["GameParameter"])
-            self.samples = optimized  # 更新引用
+        # 3. 打乱 (前 len(keep) 个位置是保留样本,其后是工作流)
+        order = list(range(len(keep) + len(plans)))
+        random.shuffle(order)
         
-        # 2. 生成工作流样本
-        workflows = []
-        if generate_workflows:
-            workflows = self.generate_workflows(ratio=workflow_ratio)
+        kept = keep.tolist()
+        for pos in order:
+            if pos < len(kept):
+                yield self.samples[kept[pos]]
+            else:
+                i, event_parent, template = plans[pos - len(kept)]
+                yield WorkflowGenerator.generate_workflow_sample(self.samples[i], event_parent, template)
+    
+    def optimize(
+        self,
+        downsample_gameparam: bool = True,
+        generate_workflows: bool = True,
+        workflow_ratio: float = 0.3,
+        ratios: Dict[str, float] = None,
+    ) -> List[Dict]:
+        """
+        执行完整优化
         
-        # 3. 合并
-        final = optimized + workflows
+        Args:
+            ratios: 降采样目标占比 (默认只降 GameParameter 到 TARGET_RATIOS 中的占比)
+        """
+        final = []
+        type_counter = Counter()
+        for s in self.iter_optimized(downsample_gameparam, generate_workflows, workflow_ratio, ratios):
+            type_counter[s.get("meta", {}).get("root_type", "Unknown")] += 1
+            final.append(s)
         
-        # 4. 打乱
-        random.shuffle(final)
+        self.report(type_counter)
+        return final
+    
+    def optimize_to_file(
+        self,
+        output_path: str,
+        downsample_gameparam: bool = True,
+        generate_workflows: bool = True,
+        workflow_ratio: float = 0.3,
+        ratios: Dict[str, float] = None,
+    ) -> Optional[Dict]:
+        """
+        流式优化:边生成边写出 JSONL,与 optimize + save_jsonl 的输出一致 (V1.3)
+        返回第一个工作流样本 (用于展示示例),没有时返回 None
+        """
+        example = None
+        type_counter = Counter()
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for s in self.iter_optimized(downsample_gameparam, generate_workflows, workflow_ratio, ratios):
+                root_type = s.get("meta", {}).get("root_type", "Unknown")
+                type_counter[root_type] += 1
+                if example is None and root_type == "Workflow":
+                    example = s
+                f.write(json.dumps(s, ensure_ascii=False) + '\n')
         
-        # 5. 最终统计
+        self.report(type_counter)
+        return example
+    
+    @staticmethod
+    def report(type_counter: Counter):
+        """最终统计 (type_counter 按样本首次出现顺序插入)"""
         print("\n" + "=" * 60)
         print("📊 优化后数据集分布")
         print("=" * 60)
         
-        type_counter = Counter()
-        for s in final:
-            root_type = s.get("meta", {}).get("root_type", "Unknown")
-            type_counter[root_type] += 1
-        
-        total = len(final)
+        total = sum(type_counter.values())
         for t, count in type_counter.most_common():
             pct = count / total * 100
             # 标记改善
@@ -270,8 +366,6 @@ class DatasetOptimizer:
             print(f"   {t}: {count} ({pct:.1f}%) {status}")
         
         print(f"\n   总计: {total}")
-        
-        return final
 
 
 # =============================================================================
@@ -288,6 +382,41 @@ def load_jsonl(path: str) -> List[Dict]:
     return samples
 
 
+class JsonlIndex:
+    """
+    JSONL 的只读序列视图:内存中只保存每个非空行的字节偏移,
+    按下标读取时 seek + 解析 (供 --stream 使用,样本不常驻内存)
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets = array('q')
+        with open(path, 'rb') as f:
+            pos = 0
+            for line in f:
+                if line.strip():
+                    self.offsets.append(pos)
+                pos += len(line)
+        self._file = open(path, 'rb')
+    
+    def __len__(self) -> int:
+        return len(self.offsets)
+    
+    def __getitem__(self, index: int) -> Dict:
+        self._file.seek(self.offsets[index])
+        return json.loads(self._file.readline())
+    
+    def __iter__(self) -> Iterator[Dict]:
+        """顺序读取 (构建 DatasetFrame 时只扫描一遍文件)"""
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    
+    def close(self):
+        self._file.close()
+
+
 def save_jsonl(samples: List[Dict], path: str):
     """保存 JSONL 文件"""
     with open(path, 'w', encoding='utf-8') as f:
@@ -300,36 +429,33 @@ def main():
     parser.add_argument("input", type=str, help="输入 JSONL 文件")
     parser.add_argument("-o", "--output", type=str, help="输出文件路径")
     parser.add_argument("--no-downsample", action="store_true", 
-                        help="不降采样 GameParameter")
+                        help="不降采样 (GameParameter 或 --ratios 指定的类型)")
     parser.add_argument("--no-workflow", action="store_true",
                         help="不生成工作流样本")
     parser.add_argument("--workflow-ratio", type=float, default=0.3,
                         help="工作流生成比例 (默认 0.3)")
+    parser.add_argument("--ratios", type=str, default=None,
+                        help="降采样目标占比 JSON,如 '{\"GameParameter\": 0.1, \"Sound|simple\": 0.3}'")
     parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式模式:按行偏移读取输入,边生成边写出,样本不常驻内存 (大数据集)")
     
     args = parser.parse_args()
     
     print("=" * 60)
-    print("🎮 Wwise 数据集优化器 V1.0")
+    print("🎮 Wwise 数据集优化器 V1.3")
     print("=" * 60)
     
     # 加载
     print(f"\n📂 加载: {args.input}")
-    samples = load_jsonl(args.input)
+    samples = JsonlIndex(args.input) if args.stream else load_jsonl(args.input)
     print(f"   样本数: {len(samples)}")
     
     # 分析
     optimizer = DatasetOptimizer(samples, seed=args.seed)
     optimizer.analyze()
     
-    # 优化
-    optimized = optimizer.optimize(
-        downsample_gameparam=not args.no_downsample,
-        generate_workflows=not args.no_workflow,
-        workflow_ratio=args.workflow_ratio,
-    )
-    
-    # 保存
+    # 保存路径
     if args.output:
         output_path = args.output
     else:
@@ -337,16 +463,27 @@ def main():
         base, ext = os.path.splitext(args.input)
         output_path = f"{base}_optimized{ext}"
     
-    save_jsonl(optimized, output_path)
+    # 优化
+    options = dict(
+        downsample_gameparam=not args.no_downsample,
+        generate_workflows=not args.no_workflow,
+        workflow_ratio=args.workflow_ratio,
+        ratios=json.loads(args.ratios) if args.ratios else None,
+    )
+    if args.stream:
+        example = optimizer.optimize_to_file(output_path, **options)
+        samples.close()
+    else:
+        optimized = optimizer.optimize(**options)
+        save_jsonl(optimized, output_path)
+        example = next((s for s in optimized if s.get("meta", {}).get("root_type") == "Workflow"), None)
     print(f"\n✅ 已保存: {output_path}")
     
     # 输出工作流示例
-    workflow_samples = [s for s in optimized if s.get("meta", {}).get("root_type") == "Workflow"]
-    if workflow_samples:
+    if example:
         print("\n" + "=" * 60)
         print("📝 工作流样本示例")
         print("=" * 60)
-        example = workflow_samples[0]
         print(f"\nInstruction: {example['instruction']}")
         print(f"\nOutput (前30行):")
         lines = example['output'].split('\n')[:30]
@@ -355,6 +492,5 @@ def main():
         if len(example['output'].split('\n')) > 30:
             print("  ...")
 
-
 if __name__ == "__main__":
     main()
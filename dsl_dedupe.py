@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+[数据工具]DSL 去重索引 (V1.1)
+功能:为裂变/预处理等流程提供 O(1) 的 DSL 去重判定
+维护者:NeuroWwise Architecture Team
+
+更新 V1.1:
+- line_shingles / ngram_shingles:DSL 行分片与文本字符 n-gram 分片 (供 dataset_dedupe 全语料近似去重)
+- MinHasher.signature_from_hashes:由任意分片哈希集合生成签名,可混合多种分片
+
+模式:
+- exact: 规范化 DSL 文本后取 128 位 blake2b 摘要,哈希集合判重
+- near:  在 exact 基础上增加 MinHash + LSH 分桶,
+         估计 Jaccard 相似度 >= threshold 即视为近似重复
+         (每个 LSH 桶最多保留 max_bucket 个代表,单次查询开销有上界)
+
+规范化规则:
+- 逐行去除首尾空白,丢弃空行
+- 引号外的连续空白折叠为单个空格 (引号内的对象名保持原样)
+"""
+import re
+import hashlib
+import operator
+from array import array
+from typing import Iterable, List, Optional
+
+_WS_RE = re.compile(r'\s+')
+_TOKEN_RE = re.compile(r'"[^"]*"|[^\s"]+')
+
+# MinHash 空桶标记与致密化偏移 (分桶后的值 < 2^58,偏移后仍在 64 位以内)
+_EMPTY_BIN = (1 << 64) - 1
+_ROTATION_OFFSET = 1 << 58
+
+
+def normalize_dsl(dsl: str) -> str:
+    """规范化 DSL 文本 (用于判重,不用于输出)"""
+    lines = []
+    for line in dsl.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if '"' in line:
+            parts = line.split('"')
+            parts[0::2] = [_WS_RE.sub(" ", p) for p in parts[0::2]]
+            line = '"'.join(parts)
+        else:
+            line = _WS_RE.sub(" ", line)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def dsl_digest(dsl: str) -> bytes:
+    """规范化 DSL 的 128 位摘要"""
+    return hashlib.blake2b(normalize_dsl(dsl).encode('utf-8'), digest_size=16).digest()
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def line_shingles(dsl: str, k: int = 2, prefix: str = "L") -> List[int]:
+    """规范化 DSL 的连续 k 行分片哈希 (行数不足 k 时整段作为一个分片)"""
+    lines = normalize_dsl(dsl).split("\n")
+    if len(lines) <= k:
+        return [_hash64(prefix + "\n".join(lines))]
+    return list({_hash64(prefix + "\n".join(lines[i:i + k])) for i in range(len(lines) - k + 1)})
+
+
+def ngram_shingles(text: str, n: int = 3, prefix: str = "T") -> List[int]:
+    """文本 (折叠空白后) 的字符 n-gram 分片哈希;prefix 区分不同字段,避免与 DSL 分片碰撞"""
+    text = _WS_RE.sub(" ", text).strip()
+    if len(text) <= n:
+        return [_hash64(prefix + text)] if text else []
+    return list({_hash64(prefix + text[i:i + n]) for i in range(len(text) - n + 1)})
+
+
+class MinHasher:
+    """
+    MinHash 签名生成器 (单置换 MinHash + 旋转致密化)
+    - 词元 k-gram 分片,每个分片只计算一次 64 位哈希,按低位分入 num_perm 个桶取最小值
+      (开销与分片数线性相关,而非 分片数 x num_perm)
+    - 空桶借用右侧最近的非空桶,保证任意两个签名可比
+    - 不依赖进程哈希种子,跨进程结果一致
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+    def shingles(self, dsl: str) -> List[int]:
+        """DSL -> 分片哈希列表 (引号内的名称视为单个词元)"""
+        tokens = _TOKEN_RE.findall(normalize_dsl(dsl))
+        k = self.shingle_size
+        if len(tokens) <= k:
+            return [_hash64(" ".join(tokens))]
+        return list({_hash64(" ".join(tokens[i:i + k])) for i in range(len(tokens) - k + 1)})
+
+    def signature(self, dsl: str) -> array:
+        return self.signature_from_hashes(self.shingles(dsl))
+
+    def signature_from_hashes(self, hashes: Iterable[int]) -> array:
+        """分片哈希集合 -> 签名 (空集合时全为空桶标记)"""
+        n = self.num_perm
+        bins = [_EMPTY_BIN] * n
+        for h in hashes:
+            b = h % n
+            v = h // n
+            if v < bins[b]:
+                bins[b] = v
+
+        # 旋转致密化:空桶取右侧最近非空桶的值,并按距离偏移以区分来源
+        if _EMPTY_BIN in bins and any(v != _EMPTY_BIN for v in bins):
+            filled = list(bins)
+            for i in range(n):
+                if bins[i] != _EMPTY_BIN:
+                    continue
+                for dist in range(1, n):
+                    v = bins[(i + dist) % n]
+                    if v != _EMPTY_BIN:
+                        filled[i] = v + dist * _ROTATION_OFFSET
+                        break
+            bins = filled
+        return array('Q', bins)
+
+    @staticmethod
+    def similarity(sig1: array, sig2: array) -> float:
+        """两个签名的 Jaccard 相似度估计"""
+        return sum(map(operator.eq, sig1, sig2)) / len(sig1)
+
+
+def choose_bands(num_perm: int, threshold: float) -> int:
+    """
+    按阈值选择 LSH 分段数:近似碰撞阈值 (1/b)^(1/r) 不超过 threshold 的前提下取最大值,
+    既不漏掉相似度达标的样本,又尽量减少需要逐一比对的候选
+    """
+    best_b, best_t = num_perm, 0.0
+    for b in range(1, num_perm + 1):
+        if num_perm % b:
+            continue
+        t = (1.0 / b) ** (b / num_perm)
+        if best_t < t <= threshold:
+            best_b, best_t = b, t
+    return best_b
+
+
+class DedupeIndex:
+    """
+    DSL 去重索引
+
+    用法:
+        index = DedupeIndex()
+        if index.add(dsl):   # True = 新样本 (已加入索引), False = 重复
+            ...
+    """
+
+    def __init__(self, mode: str = "exact", threshold: float = 0.9,
+                 num_perm: int = 64, bands: Optional[int] = None, shingle_size: int = 3,
+                 max_bucket: int = 32):
+        if mode not in ("exact", "near"):
+            raise ValueError(f"未知去重模式: {mode}")
+        if bands is None:
+            bands = choose_bands(num_perm, threshold)
+        if mode == "near" and num_perm % bands != 0:
+            raise ValueError("num_perm 必须能被 bands 整除")
+
+        self.mode = mode
+        self.threshold = threshold
+        self.digests = set()
+
+        # near 模式:签名表 + LSH 分桶
+        self.hasher: Optional[MinHasher] = None
+        if mode == "near":
+            self.hasher = MinHasher(num_perm, shingle_size)
+            self.bands = bands
+            self.rows = num_perm // bands
+            self.max_bucket = max_bucket
+            self.signatures: List[array] = []
+            self.buckets = [dict() for _ in range(bands)]
+
+        self.stats = {"added": 0, "exact_duplicates": 0, "near_duplicates": 0}
+
+    def _band_keys(self, sig: array):
+        r = self.rows
+        for band in range(self.bands):
+            yield band, hash(tuple(sig[band * r:(band + 1) * r]))
+
+    def _find_near(self, sig: array) -> bool:
+        checked = set()
+        for band, key in self._band_keys(sig):
+            for idx in self.buckets[band].get(key, ()):
+                if idx in checked:
+                    continue
+                checked.add(idx)
+                if MinHasher.similarity(sig, self.signatures[idx]) >= self.threshold:
+                    return True
+        return False
+
+    def add(self, dsl: str) -> bool:
+        """尝试加入索引;重复 (或近似重复) 时返回 False 且不加入"""
+        digest = dsl_digest(dsl)
+        if digest in self.digests:
+            self.stats["exact_duplicates"] += 1
+            return False
+
+        if self.hasher is not None:
+            sig = self.hasher.signature(dsl)
+            if self._find_near(sig):
+                self.stats["near_duplicates"] += 1
+                return False
+            idx = len(self.signatures)
+            self.signatures.append(sig)
+            for band, key in self._band_keys(sig):
+                bucket = self.buckets[band].setdefault(key, [])
+                # 桶已满说明该区域已有足够代表,新样本仍会出现在其他未满的桶中
+                if len(bucket) < self.max_bucket:
+                    bucket.append(idx)
+
+        self.digests.add(digest)
+        self.stats["added"] += 1
+        return True
+
+    def __contains__(self, dsl: str) -> bool:
+        """仅做精确 (规范化后) 判重,不修改索引"""
+        return dsl_digest(dsl) in self.digests
+
+    def __len__(self) -> int:
+        return len(self.digests)
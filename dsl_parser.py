@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 """
-[逻辑引擎]DSL 解析器 (V7.3 - Attenuation 曲线支持版)
+[逻辑引擎]DSL 解析器 (V7.4 - 类型化指令节点版)
 功能:将 DSL (Domain Specific Language) 翻译为 WAAPI JSON 执行计划。
 维护者:NeuroWwise Architecture Team
 
 版本历史:
+V7.4:   [Perf] 指令分发改为按行首关键字直接定位正则 (未命中时按原优先级兜底)
+        [Feat] parse() 同步产出类型化指令节点 DSLCommand,供验证器等下游复用
+        [Feat] set_profiler() 可选注入剖析器,按指令类型累计单行解析耗时
+
 V7.3:   [Feat] 新增 SET_ATTEN_CURVE 语法 (Attenuation 衰减曲线设置)
         [Feat] 支持 VolumeDry, LowPassFilter, Spread 等曲线类型
 
@@ -26,12 +30,46 @@ V6.0:   [Feat] Registry 协同完全体。
 """
 import re
 import json
+import time
+from collections import namedtuple
+
+# [V7.4] 类型化指令节点:每条非空、非注释的 DSL 行对应一个
+# kind: 指令关键字 (如 "CREATE"/"LINK"),未识别时为 None
+# args: 该指令正则的捕获组 (未识别时为 None)
+# text: 清洗行号前缀后的原始行
+DSLCommand = namedtuple("DSLCommand", ["line_idx", "kind", "args", "text"])
+
 
 class DSLParser:
+    VERSION = "7.4"
+
+    # ==========================================================
+    # [V7.4] 指令正则表 (顺序即旧版逐条匹配的优先级)
+    # ==========================================================
+    COMMAND_PATTERNS = {
+        "CREATE": re.compile(r'CREATE\s+(\w+[\-\w\s]*)\s+"([^"]+)"\s+UNDER\s+"([^"]+)"', re.IGNORECASE),
+        "SET_PROP": re.compile(r'SET_PROP\s+"([^"]+)"\s+"([^"]+)"\s*=\s*(.+)', re.IGNORECASE),
+        "LINK": re.compile(r'LINK\s+"([^"]+)"\s+TO\s+"([^"]+)"\s+AS\s+"([^"]+)"', re.IGNORECASE),
+        "ASSIGN": re.compile(r'ASSIGN\s+"([^"]+)"\s+TO\s+"([^"]+)"', re.IGNORECASE),
+        "ADD_ACTION": re.compile(r'ADD_ACTION\s+"([^"]+)"\s+(\w+)\s+"([^"]+)"(?:\s+"([^"]+)")?', re.IGNORECASE),
+        "CREATE_EVENT": re.compile(r'CREATE_EVENT\s+"([^"]+)"(?:\s+UNDER\s+"([^"]+)")?\s+PLAY\s+"([^"]+)"', re.IGNORECASE),
+        "IMPORT_AUDIO": re.compile(r'IMPORT_AUDIO\s+"([^"]+)"\s+INTO\s+"([^"]+)"(?:\s+AS\s+"([^"]+)")?', re.IGNORECASE),
+        "SET_RTPC_CURVE": re.compile(r'SET_RTPC_CURVE\s+"([^"]+)"\s+"([^"]+)"\s+"([^"]+)"\s+POINTS\s+\[(.+)\]', re.IGNORECASE),
+        "SET_ATTEN_CURVE": re.compile(r'SET_ATTEN_CURVE\s+"([^"]+)"\s+"([^"]+)"\s+POINTS\s+\[(.+)\]', re.IGNORECASE),
+        "DELETE": re.compile(r'DELETE\s+"([^"]+)"', re.IGNORECASE),
+        "COPY": re.compile(r'COPY\s+"([^"]+)"\s+TO\s+"([^"]+)"\s+AS\s+"([^"]+)"', re.IGNORECASE),
+        "MOVE": re.compile(r'MOVE\s+"([^"]+)"\s+TO\s+"([^"]+)"', re.IGNORECASE),
+        "RENAME": re.compile(r'RENAME\s+"([^"]+)"\s+TO\s+"([^"]+)"', re.IGNORECASE),
+    }
+    _KEYWORD_RE = re.compile(r'\w+')
+    _LINE_NO_RE = re.compile(r'^\d+\.\s*')
+
     def __init__(self):
         self.registry = None  # [V6.0] 外部注入的注册表引用
         self.parse_errors = []  # [V7.0 New] 解析错误收集
         self.parse_warnings = []  # [V7.0 New] 解析警告收集
+        self.last_commands = []  # [V7.4 New] 最近一次 parse() 的类型化指令节点
+        self.profiler = None  # [V7.4 New] 可选剖析器 (需实现 add_command(kind, elapsed))
 
         # ==========================================================
         # 1. 引用映射表 (Reference Mapping)
@@ -124,6 +162,10 @@ class DSLParser:
         """ [V6.0] 注入 Registry 实例,用于增强路径解析能力 """
         self.registry = registry
 
+    def set_profiler(self, profiler):
+        """ [V7.4] 注入剖析器,传 None 关闭 """
+        self.profiler = profiler
+
     def parse(self, dsl_lines):
         """
         [核心解析函数]
@@ -133,6 +175,7 @@ class DSLParser:
         plan = []
         self.parse_errors = []
         self.parse_warnings = []
+        self.last_commands = []
         
         for line_idx, line in enumerate(dsl_lines):
             line = line.strip()
@@ -141,30 +184,55 @@ class DSLParser:
                 continue
             
             # [V7.0] 清洗行号前缀 (LLM 可能生成 "1. CREATE..." 格式)
-            line = re.sub(r'^\d+\.\s*', '', line)
-                
+            line = self._LINE_NO_RE.sub('', line)
+            
+            start = time.perf_counter() if self.profiler else None
             try:
                 parsed = self._parse_single_line(line, line_idx, plan)
                 if parsed:
                     plan.extend(parsed)
             except Exception as e:
                 self.parse_errors.append(f"Line {line_idx+1}: {str(e)}")
+            if start is not None:
+                kind = self.last_commands[-1].kind if self.last_commands else None
+                self.profiler.add_command(kind or "UNRECOGNIZED", time.perf_counter() - start)
 
         return plan
 
+    def match_command(self, line):
+        """
+        [V7.4 New] 指令识别:返回 (kind, groups),未识别时返回 (None, None)
+        先按行首关键字直接定位对应正则;关键字不在表中时按原优先级逐条尝试,
+        因此识别结果与旧版逐条 re.match 完全一致。
+        """
+        head = self._KEYWORD_RE.match(line)
+        if head:
+            kind = head.group(0).upper()
+            pattern = self.COMMAND_PATTERNS.get(kind)
+            if pattern is not None:
+                m = pattern.match(line)
+                return (kind, m.groups()) if m else (None, None)
+
+        for kind, pattern in self.COMMAND_PATTERNS.items():
+            m = pattern.match(line)
+            if m:
+                return kind, m.groups()
+        return None, None
+
     def _parse_single_line(self, line, line_idx, current_plan):
         """
         [V7.0 Refactored] 解析单行 DSL,返回生成的 plan 步骤列表
+        [V7.4] 经 match_command 分发,并记录类型化指令节点
         """
-        steps = []
-        
+        kind, groups = self.match_command(line)
+        self.last_commands.append(DSLCommand(line_idx, kind, groups, line))
+
         # ------------------------------------------------------
         # 指令 1: CREATE (创建对象)
         # 语法: CREATE [Type] "Name" UNDER "Parent"
         # ------------------------------------------------------
-        match_create = re.match(r'CREATE\s+(\w+[\-\w\s]*)\s+"([^"]+)"\s+UNDER\s+"([^"]+)"', line, re.IGNORECASE)
-        if match_create:
-            raw_type, name, raw_parent = match_create.groups()
+        if kind == "CREATE":
+            raw_type, name, raw_parent = groups
             raw_type = raw_type.strip()
             return self._handle_create(raw_type, name, raw_parent, current_plan)
 
@@ -172,9 +240,8 @@ class DSLParser:
         # 指令 2: SET_PROP (设置属性)
         # 语法: SET_PROP "Object" "Prop" = Value
         # ------------------------------------------------------
-        match_set = re.match(r'SET_PROP\s+"([^"]+)"\s+"([^"]+)"\s*=\s*(.+)', line, re.IGNORECASE)
-        if match_set:
-            obj_name, prop, val = match_set.groups()
+        if kind == "SET_PROP":
+            obj_name, prop, val = groups
             val = self._parse_val(val)
             return [{
                 "action": "ak.wwise.core.object.setProperty",
@@ -189,18 +256,16 @@ class DSLParser:
         # 指令 3: LINK (建立引用/路由)
         # 语法: LINK "Child" TO "Target" AS "Type"
         # ------------------------------------------------------
-        match_link = re.match(r'LINK\s+"([^"]+)"\s+TO\s+"([^"]+)"\s+AS\s+"([^"]+)"', line, re.IGNORECASE)
-        if match_link:
-            child, target, link_type = match_link.groups()
+        if kind == "LINK":
+            child, target, link_type = groups
             return self._handle_link(child, target, link_type)
 
         # ------------------------------------------------------
         # 指令 4: ASSIGN (Switch/State 赋值) [V5.7]
         # 语法: ASSIGN "ChildObject" TO "SwitchState"
         # ------------------------------------------------------
-        match_assign = re.match(r'ASSIGN\s+"([^"]+)"\s+TO\s+"([^"]+)"', line, re.IGNORECASE)
-        if match_assign:
-            child, state = match_assign.groups()
+        if kind == "ASSIGN":
+            child, state = groups
             return [{
                 "action": "ak.wwise.core.switchContainer.addAssignment",
                 "args": {
@@ -214,9 +279,8 @@ class DSLParser:
         # 语法: ADD_ACTION "EventName" [ActionType] "Target"
         # ActionType: PLAY, STOP, PAUSE, RESUME, SETSWITCH, SETSTATE
         # ------------------------------------------------------
-        match_action = re.match(r'ADD_ACTION\s+"([^"]+)"\s+(\w+)\s+"([^"]+)"(?:\s+"([^"]+)")?', line, re.IGNORECASE)
-        if match_action:
-            event_name, action_type, target, extra = match_action.groups()
+        if kind == "ADD_ACTION":
+            event_name, action_type, target, extra = groups
             return self._handle_add_action(event_name, action_type.lower(), target, extra)
 
         # ------------------------------------------------------
@@ -224,9 +288,8 @@ class DSLParser:
         # 语法: CREATE_EVENT "EventName" PLAY "SoundName"
         #       CREATE_EVENT "EventName" UNDER "Parent" PLAY "SoundName"
         # ------------------------------------------------------
-        match_event = re.match(r'CREATE_EVENT\s+"([^"]+)"(?:\s+UNDER\s+"([^"]+)")?\s+PLAY\s+"([^"]+)"', line, re.IGNORECASE)
-        if match_event:
-            event_name, parent, target = match_event.groups()
+        if kind == "CREATE_EVENT":
+            event_name, parent, target = groups
             parent = parent or "Default Work Unit"
             return self._handle_create_event(event_name, parent, target)
 
@@ -234,18 +297,16 @@ class DSLParser:
         # 指令 7: IMPORT_AUDIO (音频导入) [V7.0 New]
         # 语法: IMPORT_AUDIO "FilePath" INTO "Parent" AS "SoundName"
         # ------------------------------------------------------
-        match_import = re.match(r'IMPORT_AUDIO\s+"([^"]+)"\s+INTO\s+"([^"]+)"(?:\s+AS\s+"([^"]+)")?', line, re.IGNORECASE)
-        if match_import:
-            file_path, parent, sound_name = match_import.groups()
+        if kind == "IMPORT_AUDIO":
+            file_path, parent, sound_name = groups
             return self._handle_import_audio(file_path, parent, sound_name)
 
         # ------------------------------------------------------
         # 指令 8: SET_RTPC_CURVE (RTPC 曲线设置) [V7.0 New]
         # 语法: SET_RTPC_CURVE "Object" "GameParameter" "Property" POINTS [(x1,y1), (x2,y2)]
         # ------------------------------------------------------
-        match_rtpc = re.match(r'SET_RTPC_CURVE\s+"([^"]+)"\s+"([^"]+)"\s+"([^"]+)"\s+POINTS\s+\[(.+)\]', line, re.IGNORECASE)
-        if match_rtpc:
-            obj, param, prop, points_str = match_rtpc.groups()
+        if kind == "SET_RTPC_CURVE":
+            obj, param, prop, points_str = groups
             return self._handle_rtpc_curve(obj, param, prop, points_str)
 
         # ------------------------------------------------------
@@ -253,18 +314,16 @@ class DSLParser:
         # 语法: SET_ATTEN_CURVE "AttenuationName" "CurveType" POINTS [(x1,y1), (x2,y2), ...]
         # CurveType: VolumeDry, LowPassFilter, HighPassFilter, Spread, Focus
         # ------------------------------------------------------
-        match_atten_curve = re.match(r'SET_ATTEN_CURVE\s+"([^"]+)"\s+"([^"]+)"\s+POINTS\s+\[(.+)\]', line, re.IGNORECASE)
-        if match_atten_curve:
-            atten_name, curve_type, points_str = match_atten_curve.groups()
+        if kind == "SET_ATTEN_CURVE":
+            atten_name, curve_type, points_str = groups
             return self._handle_atten_curve(atten_name, curve_type, points_str)
 
         # ------------------------------------------------------
         # 指令 9: DELETE (删除对象) [V7.0 New]
         # 语法: DELETE "ObjectName"
         # ------------------------------------------------------
-        match_delete = re.match(r'DELETE\s+"([^"]+)"', line, re.IGNORECASE)
-        if match_delete:
-            obj_name = match_delete.group(1)
+        if kind == "DELETE":
+            obj_name = groups[0]
             return [{
                 "action": "ak.wwise.core.object.delete",
                 "args": {"object": obj_name}
@@ -274,9 +333,8 @@ class DSLParser:
         # 指令 10: COPY (复制对象) [V7.0 New]
         # 语法: COPY "Source" TO "Parent" AS "NewName"
         # ------------------------------------------------------
-        match_copy = re.match(r'COPY\s+"([^"]+)"\s+TO\s+"([^"]+)"\s+AS\s+"([^"]+)"', line, re.IGNORECASE)
-        if match_copy:
-            source, parent, new_name = match_copy.groups()
+        if kind == "COPY":
+            source, parent, new_name = groups
             return [{
                 "action": "ak.wwise.core.object.copy",
                 "args": {
@@ -291,9 +349,8 @@ class DSLParser:
         # 指令 11: MOVE (移动对象) [V7.0 New]
         # 语法: MOVE "Object" TO "NewParent"
         # ------------------------------------------------------
-        match_move = re.match(r'MOVE\s+"([^"]+)"\s+TO\s+"([^"]+)"', line, re.IGNORECASE)
-        if match_move:
-            obj, new_parent = match_move.groups()
+        if kind == "MOVE":
+            obj, new_parent = groups
             return [{
                 "action": "ak.wwise.core.object.move",
                 "args": {
@@ -307,9 +364,8 @@ class DSLParser:
         # 指令 12: RENAME (重命名) [V7.0 Enhanced]
         # 语法: RENAME "OldName" TO "NewName"
         # ------------------------------------------------------
-        match_rename = re.match(r'RENAME\s+"([^"]+)"\s+TO\s+"([^"]+)"', line, re.IGNORECASE)
-        if match_rename:
-            old_name, new_name = match_rename.groups()
+        if kind == "RENAME":
+            old_name, new_name = groups
             return [{
                 "action": "ak.wwise.core.object.setName",
                 "args": {
@@ -870,4 +926,8 @@ class DSLParser:
         return {
             "errors": self.parse_errors,
             "warnings": self.parse_warnings
-        }
\ No newline at end of file
+        }
+
+    def get_commands(self):
+        """[V7.4 New] 获取最近一次 parse() 产出的类型化指令节点 (List[DSLCommand])"""
+        return self.last_commands
\ No newline at end of file
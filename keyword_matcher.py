@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+[数据工具]多关键词匹配自动机 (V1.0)
+功能:为名称分析 / 话术映射等流程提供单遍扫描的多关键词匹配
+维护者:NeuroWwise Architecture Team
+
+原理:
+- Aho-Corasick:关键词建 trie,BFS 计算失败指针
+- 构建时把失败链预先展开为确定性转移表,扫描每个字符只做一次字典查找
+- 每个状态的输出为类别集合 (含失败链上的所有后缀关键词)
+
+用法:
+    matcher = KeywordAutomaton.from_mapping({"boss": ["Boss", "Elite"], "ui": ["UI"]})
+    matcher.categories("Boss_UI_Click")   # frozenset({"boss", "ui"})
+
+categories() 的结果按输入文本缓存 (同一对象名反复出现时直接命中)
+"""
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List
+
+_EMPTY: FrozenSet[str] = frozenset()
+
+
+class KeywordAutomaton:
+    """
+    多关键词 -> 类别匹配器
+    - 一个类别可有多个关键词,一个关键词也可属于多个类别
+    - case_sensitive=False 时关键词与文本都先转小写
+    - build() 之后不可再 add
+    """
+
+    def __init__(self, case_sensitive: bool = True, cache_size: int = 65536):
+        self.case_sensitive = case_sensitive
+        self.cache_size = cache_size
+
+        # trie: 每个节点一个 {字符: 子节点} 字典,以及以该节点结尾的关键词所属类别
+        self._goto: List[Dict[str, int]] = [{}]
+        self._node_categories: List[set] = [set()]
+        self._delta: List[Dict[str, int]] = []
+        self._out: List[FrozenSet[str]] = []
+        self._built = False
+        self._cache: Dict[str, FrozenSet[str]] = {}
+
+    @classmethod
+    def from_mapping(cls, mapping: Dict[str, Iterable[str]], **kwargs) -> "KeywordAutomaton":
+        """由 {类别: [关键词, ...]} 构建并编译"""
+        automaton = cls(**kwargs)
+        for category, keywords in mapping.items():
+            for keyword in keywords:
+                automaton.add(keyword, category)
+        return automaton.build()
+
+    def add(self, keyword: str, category: str):
+        if self._built:
+            raise RuntimeError("自动机已编译,不能再添加关键词")
+        if not keyword:
+            return
+        if not self.case_sensitive:
+            keyword = keyword.lower()
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._node_categories.append(set())
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._node_categories[node].add(category)
+
+    def build(self) -> "KeywordAutomaton":
+        """计算失败指针,展开为确定性转移表"""
+        goto = self._goto
+        size = len(goto)
+        fail = [0] * size
+        delta: List[Dict[str, int]] = [dict() for _ in range(size)]
+        out: List[FrozenSet[str]] = [_EMPTY] * size
+
+        delta[0] = dict(goto[0])
+        out[0] = frozenset(self._node_categories[0])
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            # 父节点先出队,失败节点深度更小,其转移表已完整
+            delta[node] = {**delta[fail[node]], **goto[node]}
+            out[node] = frozenset(self._node_categories[node]) | out[fail[node]]
+            for ch, child in goto[node].items():
+                fail[child] = delta[fail[node]].get(ch, 0)
+                queue.append(child)
+
+        self._delta = delta
+        self._out = out
+        self._built = True
+        return self
+
+    def categories(self, text: str) -> FrozenSet[str]:
+        """单遍扫描,返回文本中出现过关键词的全部类别"""
+        cached = self._cache.get(text)
+        if cached is not None:
+            return cached
+        if not self._built:
+            self.build()
+
+        delta = self._delta
+        out = self._out
+        hits = set()
+        state = 0
+        for ch in (text if self.case_sensitive else text.lower()):
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                hits |= out[state]
+
+        result = frozenset(hits)
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[text] = result
+        return result
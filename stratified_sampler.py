@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+[数据工具]分层水库采样器 (V1.1)
+功能:按多个分层 (root_type × complexity × source) 的目标占比一次性重新平衡数据集,
+      单遍流式处理,内存只与输出规模有关
+维护者:NeuroWwise Architecture Team
+
+更新 V1.1:
+1. [Fix] total 计入透传分层:透传样本也按水库采样,输出与内存都受 total 限制 (原先透传样本全部保留)
+2. result() / report() 共用同一次抽样
+
+原理:
+- 每个分层一个水库 (Algorithm R),容量 = ceil(占比 * total) (按占比之和归一),超出后等概率替换
+- 扫描结束后按各分层实际数量求最终规模 F (注水法):
+  占比是该分层在输出中的上限,样本不足的分层全部保留,
+  不在 ratios 中的分层透传 (keep_unlisted=False 时丢弃)
+- total 是整个输出的上限,透传样本也计入:透传部分共用一个容量为 total 的水库,
+  F 达到 total 时透传样本只保留 total 减去各分层配额的部分 (仍为均匀样本,各透传分层按比例缩减)
+- 各分层保留 floor(占比 * F) 条,从水库中再等概率抽取 (水库本身是均匀样本,子集仍均匀)
+- 输出保持输入顺序
+
+分层键:
+    stratum_key(sample)  ->  "Event|medium|workflow_generated"
+    ratios 的键可以只写前几段,或用 * 通配:{"GameParameter": 0.1, "Event|complex": 0.05, "*|simple|*": 0.3}
+    StratumMatcher 把样本映射到第一个匹配的键
+
+用法:
+    sampler = StratifiedSampler({"GameParameter": 0.10, "Event": 0.25}, total=100000, seed=42)
+    for s in iter_jsonl(path):
+        sampler.add(matcher(s), s)
+    balanced = sampler.result()
+"""
+import math
+import random
+from fnmatch import fnmatchcase
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+STRATUM_FIELDS = ("root_type", "complexity", "source")
+STRATUM_SEP = "|"
+
+
+def stratum_key(sample: Dict, fields: Tuple[str, ...] = STRATUM_FIELDS) -> str:
+    """样本 -> 分层键 (meta 字段缺失时记为 Unknown)"""
+    meta = sample.get("meta", {})
+    return STRATUM_SEP.join(str(meta.get(field, "Unknown")) for field in fields)
+
+
+class StratumMatcher:
+    """
+    把样本映射到 ratios 中第一个匹配的键 (无匹配时返回原始分层键)
+    - 键按 | 分段,段数少于 fields 时其余段视为 *
+    - 每段支持 fnmatch 通配 (* ?)
+    - 结果按原始分层键缓存
+    """
+
+    def __init__(self, patterns: Iterable[str], fields: Tuple[str, ...] = STRATUM_FIELDS):
+        self.fields = fields
+        self.patterns: List[Tuple[str, List[str]]] = []
+        for pattern in patterns:
+            parts = pattern.split(STRATUM_SEP)
+            if len(parts) > len(fields):
+                raise ValueError(f"分层键 {pattern!r} 的段数超过 {len(fields)} ({STRATUM_SEP.join(fields)})")
+            self.patterns.append((pattern, parts + ["*"] * (len(fields) - len(parts))))
+        self._cache: Dict[str, str] = {}
+
+    def match(self, key: str) -> str:
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        values = key.split(STRATUM_SEP)
+        result = key
+        for pattern, parts in self.patterns:
+            if all(fnmatchcase(v, p) for v, p in zip(values, parts)):
+                result = pattern
+                break
+        self._cache[key] = result
+        return result
+
+    def __call__(self, sample: Dict) -> str:
+        return self.match(stratum_key(sample, self.fields))
+
+
+class StratifiedSampler:
+    """
+    多分层水库采样
+
+    Args:
+        ratios: {分层: 输出占比上限},占比之和不超过 1 (没有透传样本时按和归一)
+        total: 输出规模上限 (含透传样本);给定时每个水库容量为 ceil(占比 / 占比之和 * total),
+               透传样本共用一个容量为 total 的水库,内存与输出规模同阶;
+               不给定时水库不设容量 (仍是单遍,但需容纳全部样本)
+        seed: 随机种子 (采样器自带 RNG,不影响全局 random)
+        keep_unlisted: 不在 ratios 中的分层是否原样保留
+    """
+
+    def __init__(self, ratios: Dict[str, float], total: Optional[int] = None,
+                 seed: int = 42, keep_unlisted: bool = True):
+        for stratum, ratio in ratios.items():
+            if not 0.0 <= ratio <= 1.0:
+                raise ValueError(f"分层 {stratum} 的占比 {ratio} 不在 [0, 1] 内")
+        if sum(ratios.values()) > 1.0 + 1e-9:
+            raise ValueError(f"占比之和 {sum(ratios.values()):.3f} 超过 1")
+
+        self.ratios = dict(ratios)
+        self.total = total
+        self.keep_unlisted = keep_unlisted
+        self._rng = random.Random(seed)
+        self._seq = 0
+
+        # 容量按归一后的占比取 (无论最终是否归一都够用)
+        scale = sum(self.ratios.values()) or 1.0
+        self.capacity: Dict[str, Optional[int]] = {
+            stratum: (math.ceil(ratio / scale * total) if total is not None else None)
+            for stratum, ratio in self.ratios.items()
+        }
+        self.reservoirs: Dict[str, List[Tuple[int, Any]]] = {stratum: [] for stratum in self.ratios}
+        self.seen: Dict[str, int] = {stratum: 0 for stratum in self.ratios}
+        # 透传样本:(序号, 分层, 样本),给定 total 时按水库采样
+        self.unlisted: List[Tuple[int, str, Any]] = []
+        self.unlisted_seen: Dict[str, int] = {}
+        self._unlisted_total = 0
+        self._selection: Optional[List[Tuple[int, Any]]] = None
+        self._unlisted_kept: Dict[str, int] = {}
+
+    def add(self, stratum: str, item: Any):
+        seq = self._seq
+        self._seq += 1
+        self._selection = None
+
+        reservoir = self.reservoirs.get(stratum)
+        if reservoir is None:
+            self.unlisted_seen[stratum] = self.unlisted_seen.get(stratum, 0) + 1
+            if self.keep_unlisted:
+                self._unlisted_total += 1
+                if self.total is None or len(self.unlisted) < self.total:
+                    self.unlisted.append((seq, stratum, item))
+                elif self.total > 0:
+                    j = self._rng.randrange(self._unlisted_total)
+                    if j < self.total:
+                        self.unlisted[j] = (seq, stratum, item)
+            return
+
+        self.seen[stratum] += 1
+        cap = self.capacity[stratum]
+        if cap is None or len(reservoir) < cap:
+            reservoir.append((seq, item))
+        elif cap > 0:
+            j = self._rng.randrange(self.seen[stratum])
+            if j < cap:
+                reservoir[j] = (seq, item)
+
+    def extend(self, items: Iterable[Any], key: Callable[[Any], str]):
+        for item in items:
+            self.add(key(item), item)
+
+    def _final_size(self) -> float:
+        """
+        注水法求输出规模 F:未饱和分层各占 ratio * F,饱和分层 (样本不足) 全部保留,
+        F = (透传数 + 饱和分层样本数) / (1 - 未饱和分层占比之和),再受 total 限制
+        """
+        fixed = self._unlisted_total
+        ratios = self._effective_ratios()
+        active = {s for s, r in ratios.items() if r > 0}
+        while True:
+            share = sum(ratios[s] for s in active)
+            size = fixed / (1.0 - share) if share < 1.0 - 1e-9 else math.inf
+            if self.total is not None:
+                size = min(size, self.total)
+            limited = [s for s in active if self.seen[s] < ratios[s] * size]
+            if not limited:
+                return size
+            # 最先耗尽的分层转为饱和,重新分配其余占比
+            tightest = min(limited, key=lambda s: self.seen[s] / ratios[s])
+            active.remove(tightest)
+            fixed += self.seen[tightest]
+
+    def _effective_ratios(self) -> Dict[str, float]:
+        """没有透传样本时,输出只由列出的分层组成,占比按其和归一"""
+        scale = sum(self.ratios.values())
+        if self._unlisted_total or scale <= 0:
+            return self.ratios
+        return {stratum: ratio / scale for stratum, ratio in self.ratios.items()}
+
+    def quotas(self) -> Dict[str, int]:
+        """各分层最终保留数"""
+        size = self._final_size()
+        return {
+            stratum: min(self.seen[stratum], int(ratio * size + 1e-9))
+            for stratum, ratio in self._effective_ratios().items()
+        }
+
+    def _unlisted_quota(self, quotas: Dict[str, int]) -> int:
+        """透传样本保留数:F 未触及 total 时全部保留,否则为 total 减去各分层配额"""
+        if self.total is None:
+            return self._unlisted_total
+        return max(0, min(self._unlisted_total, self.total - sum(quotas.values())))
+
+    def _select(self) -> List[Tuple[int, Any]]:
+        """抽取最终样本 (结果缓存,result / report 看到同一次抽样)"""
+        if self._selection is not None:
+            return self._selection
+        quotas = self.quotas()
+        kept = []
+        for stratum, quota in quotas.items():
+            reservoir = self.reservoirs[stratum]
+            kept.extend(reservoir if quota >= len(reservoir) else self._rng.sample(reservoir, quota))
+        unlisted_quota = self._unlisted_quota(quotas)
+        unlisted = (self.unlisted if unlisted_quota >= len(self.unlisted)
+                    else self._rng.sample(self.unlisted, unlisted_quota))
+        self._unlisted_kept = {}
+        for seq, stratum, item in unlisted:
+            self._unlisted_kept[stratum] = self._unlisted_kept.get(stratum, 0) + 1
+            kept.append((seq, item))
+        kept.sort(key=lambda pair: pair[0])
+        self._selection = kept
+        return kept
+
+    def result(self) -> List[Any]:
+        """采样结果 (按输入顺序)"""
+        return [item for _, item in self._select()]
+
+    def report(self) -> Dict[str, Tuple[int, int]]:
+        """{分层: (输入数, 输出数)},透传分层的输出数为实际保留数 (keep_unlisted=False 时为 0)"""
+        self._select()
+        quotas = self.quotas()
+        rows = {stratum: (self.seen[stratum], quotas[stratum]) for stratum in self.ratios}
+        for stratum, count in self.unlisted_seen.items():
+            rows[stratum] = (count, self._unlisted_kept.get(stratum, 0))
+        return rows
+
+
+def sample_stratified(samples: Iterable[Dict], ratios: Dict[str, float],
+                      total: Optional[int] = None, seed: int = 42,
+                      fields: Tuple[str, ...] = STRATUM_FIELDS,
+                      keep_unlisted: bool = True) -> List[Dict]:
+    """按 meta 字段分层的便捷入口 (samples 可以是文件迭代器)"""
+    sampler = StratifiedSampler(ratios, total=total, seed=seed, keep_unlisted=keep_unlisted)
+    sampler.extend(samples, StratumMatcher(ratios, fields))
+    return sampler.result()
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+[数据工具]统一文本清洗引擎 (V1.0)
+功能:为 unicode_fixer / 合并jsonl / 解析脚本 (人物动作/活动) 提供同一套清洗实现,
+      基于 in 预判 + str.replace / bytes.translate 删除表 + 一个预编译正则
+维护者:NeuroWwise Architecture Team
+
+清洗口径:
+- fix_text:    unicode_fixer 的隐形字符 / 全角符号替换 (REPLACEMENT_MAP),同时返回各字符的替换次数
+- clean_line:  合并 JSONL 时的逐行清洗 (NFKC + 剔除不可打印字符 + 去首尾空白 + 换行)
+- clean_text:  解析脚本的"核弹级清洗" (全角标点转 ASCII + NFKC + 白名单正则 + 去首尾空白)
+
+实现要点:
+- 替换前先用 in 判定哪些字符实际出现,只对出现的字符做 str.replace (C 层整串操作);
+  dict 表的 str.translate 对非 ASCII 文本逐字符查表,中文行上比 replace 链慢一个数量级,只用于删除不可打印字符
+- 纯 ASCII 文本 (语料中绝大多数行是转义过的 JSON) 走快速路径:
+  待替换的全角字符都不是 ASCII,NFKC 不改变 ASCII,只需用 bytes.translate 删除表去掉控制字符
+- 非 ASCII 文本:NFKC 先用 unicodedata.is_normalized 判定,已规范化时不重建字符串;
+  不可打印字符表按码位惰性填充,每个码位只调用一次 isprintable
+- 所有表都用 \\u 转义书写:unicode_fixer 会把源码中的全角字符替换掉,字面量写法会被它改坏
+
+自检与基准:
+    python text_cleaner.py --check data.jsonl ...   # 与原实现逐条比对 (另含内置的边界用例)
+    python text_cleaner.py --bench data.jsonl ...   # 各口径新旧实现的 MB/s
+"""
+import re
+import sys
+import time
+import argparse
+import unicodedata
+from typing import Dict, List, Tuple
+
+# =============================================================================
+# 替换表
+# =============================================================================
+
+# unicode_fixer:隐形字符 / 全角符号 (Bad -> Good)
+REPLACEMENT_MAP = {
+    # 1. 隐形字符 / 空白符
+    '\u200b': '',    # Zero Width Space (零宽空格)
+    '\ufeff': '',    # BOM (Byte Order Mark)
+    '\u3000': ' ',   # Ideographic Space (全角空格) -> 标准空格
+    '\xa0': ' ',     # Non-breaking Space (NBSP) -> 标准空格
+
+    # 2. 标点符号 (全角 -> 半角),只替换会导致代码 / DSL 语法错误的符号
+    '\uff1a': ':',   # Full-width Colon
+    '\uff1b': ';',   # Full-width Semicolon
+    '\uff0c': ',',   # Full-width Comma
+    '\uff08': '(',   # Full-width Parenthesis Left
+    '\uff09': ')',   # Full-width Parenthesis Right
+    '\u201c': '"',   # Left Double Quote
+    '\u201d': '"',   # Right Double Quote
+    '\u2018': "'",   # Left Single Quote
+    '\u2019': "'",   # Right Single Quote
+    '\u3010': '[',   # 左方头括号 (DSL 中 [ ] 常用于列表)
+    '\u3011': ']',   # 右方头括号
+}
+
+# clean_text 第 1 步:全角 / 中文标点强制转 ASCII
+FULLWIDTH_MAP = {
+    '\u201c': '"', '\u201d': '"', '\u2018': "'", '\u2019': "'",
+    '\uff1a': ':', '\uff08': '(', '\uff09': ')', '\uff0c': ',',
+    '\uff1b': ';', '\u3000': ' ', '\u3002': '.',
+    '\u3001': ',', '\uff1f': '?', '\uff01': '!',
+    '\u3010': '[', '\u3011': ']',
+}
+
+# 纯 ASCII 文本要删除的字符:除 \t \n \r 以外的控制字符与 DEL
+# (不可打印字符与白名单之外的字符在 ASCII 范围内恰好都是这一组),用 bytes.translate 的删除表处理
+_ASCII_CONTROLS = bytes([c for c in range(128) if not chr(c).isprintable() and chr(c) not in '\n\r\t'])
+
+# clean_text 第 3 步:白名单 (Tab, 换行, 回车, ASCII 可见字符, 中文)
+_NON_WHITELIST_RE = re.compile(r'[^\u0009\u000A\u000D -~\u4e00-\u9fff]')
+
+
+class _PrintableTable(dict):
+    """
+    str.translate 用的删除表:不可打印字符 -> None (换行 / 回车 / 制表符除外)
+    按码位惰性填充,每个码位只判定一次;之后都是 C 层字典查找
+    """
+
+    def __missing__(self, codepoint: int):
+        ch = chr(codepoint)
+        value = codepoint if (ch.isprintable() or ch in '\n\r\t') else None
+        self[codepoint] = value
+        return value
+
+
+_PRINTABLE_TABLE = _PrintableTable()
+
+
+def _nfkc(text: str) -> str:
+    if unicodedata.is_normalized('NFKC', text):
+        return text
+    return unicodedata.normalize('NFKC', text)
+
+
+def _all_printable(text: str) -> bool:
+    """除换行 / 回车 / 制表符外都是可打印字符"""
+    if text.isprintable():
+        return True
+    return text.replace('\n', '').replace('\r', '').replace('\t', '').isprintable()
+
+
+def _strip_ascii_controls(text: str) -> str:
+    """纯 ASCII 文本的快速路径:ASCII 文本已是 NFKC 形式,只需删除控制字符"""
+    raw = text.encode('ascii')
+    kept = raw.translate(None, _ASCII_CONTROLS)
+    return text if len(kept) == len(raw) else kept.decode('ascii')
+
+
+# =============================================================================
+# 清洗函数
+# =============================================================================
+
+def fix_text(text: str) -> Tuple[str, Dict[str, int]]:
+    """unicode_fixer 口径:返回 (替换后的文本, {被替换字符: 次数});无需替换时原样返回"""
+    # 待替换字符都不是 ASCII;纯 ASCII 文件 (代码 / 转义过的 JSONL) 一次判定即可跳过
+    if text.isascii():
+        return text, {}
+    counts = {ch: text.count(ch) for ch in REPLACEMENT_MAP if ch in text}
+    for ch in counts:
+        text = text.replace(ch, REPLACEMENT_MAP[ch])
+    return text, counts
+
+
+def clean_line(text: str) -> str:
+    """
+    合并 JSONL 口径:
+    1. NFKC 标准化 (已规范化时跳过)
+    2. 剔除所有不可见控制字符 (保留换行符/回车符和制表符)
+    3. 去首尾空白,补换行
+    """
+    if not text:
+        return ""
+    if text.isascii():
+        return _strip_ascii_controls(text).strip() + "\n"
+    text = _nfkc(text)
+    # 绝大多数行没有不可打印字符:C 层整串判定后跳过逐字符查表
+    if not _all_printable(text):
+        text = text.translate(_PRINTABLE_TABLE)
+    return text.strip() + "\n"
+
+
+def clean_text(text: str) -> str:
+    """
+    解析脚本口径 (核弹级清洗):将所有全角/中文标点强制转换为 ASCII 标点,
+    并剔除所有非白名单字符。
+    """
+    if not text:
+        return ""
+    if text.isascii():
+        return _strip_ascii_controls(text).strip()
+    # 只替换实际出现的字符:str.replace 是 C 层整串操作,
+    # 而 dict 表的 translate 遇到非 ASCII 文本会逐字符查表,对中文行慢一个数量级
+    for k, v in FULLWIDTH_MAP.items():
+        if k in text:
+            text = text.replace(k, v)
+    text = _nfkc(text)
+    return _NON_WHITELIST_RE.sub('', text).strip()
+
+
+# =============================================================================
+# 原实现 (自检基准)
+# =============================================================================
+
+def _reference_fix_text(text: str) -> Tuple[str, Dict[str, int]]:
+    """unicode_fixer V1.1 fix_file 的替换循环"""
+    changes = {}
+    for bad_char, good_char in REPLACEMENT_MAP.items():
+        if bad_char in text:
+            changes[bad_char] = text.count(bad_char)
+            text = text.replace(bad_char, good_char)
+    return text, changes
+
+
+def _reference_clean_line(text: str) -> str:
+    """合并jsonl.py V1 的 clean_line"""
+    if not text:
+        return ""
+    text = unicodedata.normalize('NFKC', text)
+    text = "".join(ch for ch in text if ch.isprintable() or ch in '\n\r\t')
+    return text.strip() + "\n"
+
+
+def _reference_clean_text(text: str) -> str:
+    """人物动作.py / 活动.py 的 clean_text (替换表按其原意:全角标点 -> ASCII)"""
+    if not text:
+        return ""
+    for k, v in FULLWIDTH_MAP.items():
+        text = text.replace(k, v)
+    text = unicodedata.normalize('NFKC', text)
+    pattern = re.compile(r'[^\u0009\u000A\u000D -~\u4e00-\u9fff]')
+    text = pattern.sub('', text)
+    return text.strip()
+
+
+CLEANERS = {
+    "fix_text": (fix_text, _reference_fix_text),
+    "clean_line": (clean_line, _reference_clean_line),
+    "clean_text": (clean_text, _reference_clean_text),
+}
+
+# 边界用例:隐形字符/全角标点/兼容字符/组合字符/代理区以外的补充平面/控制字符
+EDGE_CASES = [
+    "",
+    " ",
+    "\n",
+    "plain ascii line\n",
+    "\u200b\ufeffCREATE Sound \u201cA\u201d UNDER \u201cB\u201d\u3000\n",
+    "\uff08测试\uff09\uff1a\u3010列表\u3011\uff0c\uff1b\u2018x\u2019\u3002\u3001\uff1f\uff01",
+    "\xa0\xa0nbsp\xa0\r\n",
+    "\uff21\uff22\uff23 \u2460 \ufb01 \xbd \u2126 \u212b",
+    "e\u0301 \u1100\u1161\u11a8 \u0928\u093c",
+    "\x00\x01\x07\x1b[31m\x7f\x85\u2028\u2029\xad\u200e\u200f\u2066",
+    "\U0001F3B5 \U0001D400 \U00020000 \ue000",
+    "\t indented\tline \t\n",
+    '{"instruction": "做一个技能音效", "output": "CREATE Sound \\"a\\""}\n',
+]
+
+
+def _load_lines(paths: List[str]) -> List[str]:
+    lines = list(EDGE_CASES)
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines.extend(f)
+    return lines
+
+
+def run_check(paths: List[str]) -> bool:
+    """新旧实现逐条比对;返回是否全部一致"""
+    lines = _load_lines(paths)
+    ok = True
+    for name, (fast, reference) in CLEANERS.items():
+        mismatches = [line for line in lines if fast(line) != reference(line)]
+        status = "✅" if not mismatches else "❌"
+        print(f"   {status} {name}: {len(lines) - len(mismatches)}/{len(lines)} 一致")
+        for line in mismatches[:3]:
+            print(f"      {ascii(line[:80])}")
+        ok = ok and not mismatches
+    return ok
+
+
+def run_bench(paths: List[str], repeat: int = 3):
+    """各口径新旧实现的吞吐 (取 repeat 次中最快的一次)"""
+    lines = _load_lines(paths)
+    size_mb = sum(len(line.encode('utf-8')) for line in lines) / 1e6
+    print(f"   语料: {len(lines)} 行, {size_mb:.1f} MB")
+    for name, (fast, reference) in CLEANERS.items():
+        timings = []
+        for func in (reference, fast):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for line in lines:
+                    func(line)
+                best = min(best, time.perf_counter() - start)
+            timings.append(best)
+        old, new = timings
+        print(f"   {name:<11} 原实现 {size_mb / old:8.1f} MB/s  新实现 {size_mb / new:8.1f} MB/s  "
+              f"({old / size_mb * 1000:.0f} -> {new / size_mb * 1000:.0f} ms/MB, x{old / new:.1f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="统一文本清洗引擎:自检与基准")
+    parser.add_argument("files", nargs="*", help="用作语料的文本 / JSONL 文件 (逐行)")
+    parser.add_argument("--check", action="store_true", help="与原实现逐条比对")
+    parser.add_argument("--bench", action="store_true", help="测量各口径的 MB/s")
+    parser.add_argument("--repeat", type=int, default=3, help="基准重复次数 (默认 3)")
+    args = parser.parse_args()
+
+    if not args.check and not args.bench:
+        args.check = True
+    ok = True
+    if args.check:
+        print("🔍 等价性自检")
+        ok = run_check(args.files)
+    if args.bench:
+        print("\n⏱️ 基准")
+        run_bench(args.files, args.repeat)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
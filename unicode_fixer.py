@@ -1,128 +1,260 @@
 # -*- coding: utf-8 -*-
 """
-【工具脚本】Unicode 隐形字符与全角符号修复器 (V1.1)
+【工具脚本】Unicode 隐形字符与全角符号修复器 (V1.3)
 功能：
 1. 扫描当前目录下所有代码和数据文件 (.py, .json, .jsonl, .dsl, .md)。
 2. 自动检测并修复“全角符号”、“零宽空格”、“非断行空格”等隐形杀手。
 3. 会自动为修改过的文件创建备份，统一存放在 _backups 目录下，保持原有目录结构。
+
+更新 V1.2:
+1. [Perf] 替换改用 text_cleaner 统一清洗引擎:先判定实际出现的字符,只替换这些字符,
+   纯 ASCII 文件一次判定即跳过
+2. [Fix] 规则表改为 \\u 转义写法,统一放在 text_cleaner.py (原先的字面量写法曾被本工具改坏,
+   解析脚本的 clean_text 因此把 “”‘’【】 直接删掉而不是转成 ASCII)
+
+更新 V1.3:
+1. [Perf] 增量扫描:根目录下的清单文件记录每个文件修复后的 mtime / 大小 / 内容哈希,
+   mtime 与大小都没变的文件不再打开;只是被 touch 过 (内容哈希不变) 的文件不再做替换
+2. [Perf] -w/--workers:线程池并行读取 / 修复 / 写回,日志由主线程统一输出
+3. [Perf] 超过 --stream-mb 的大文件逐行流式修复,写入同目录临时文件后原子替换 (os.replace),
+   不再把整个文件读进内存;中途出错时原文件保持不变
+4. [Feat] --full 忽略清单全量扫描;清单记录替换规则表的指纹,规则变化后自动全量扫描
+
+使用方法:
+    python unicode_fixer.py                 # 增量扫描当前目录
+    python unicode_fixer.py -w 8 --full     # 8 线程全量扫描
 """
 import os
+import json
 import shutil
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from text_cleaner import REPLACEMENT_MAP, fix_text
 
 # =============================================================================
 # 配置项
 # =============================================================================
 BACKUP_DIR_NAME = "_backups"  # 统一备份目录名称
+MANIFEST_NAME = ".unicode_fixer_manifest.json"  # 增量清单 (位于扫描根目录)
+STREAM_THRESHOLD_MB = 64  # 超过该大小的文件逐行流式处理
 
 # =============================================================================
 # 替换规则表 (Bad -> Good)
+# 统一维护在 text_cleaner.REPLACEMENT_MAP (用 \u 转义书写,本工具扫描时不会把规则表自己改坏)
 # =============================================================================
-REPLACEMENT_MAP = {
-    # 1. 隐形字符 / 空白符
-    '\u200b': '',    # Zero Width Space (零宽空格) - 绝对的杀手
-    '\ufeff': '',    # BOM (Byte Order Mark) - 有时会影响开头解析
-    '\u3000': ' ',   # Ideographic Space (全角空格) -> 标准空格
-    '\xa0': ' ',     # Non-breaking Space (NBSP) -> 标准空格
-    
-    # 2. 标点符号 (全角 -> 半角)
-    # 注意：这里只替换会导致代码语法错误的符号。
-    # 仅仅用于注释的中文标点通常保留，但为了防止 DSL 解析错误，建议统一。
-    '：': ':',       # Full-width Colon
-    '；': ';',       # Full-width Semicolon
-    '，': ',',       # Full-width Comma
-    '（': '(',       # Full-width Parenthesis Left
-    '）': ')',       # Full-width Parenthesis Right
-    '“': '"',        # Left Double Quote
-    '”': '"',        # Right Double Quote
-    '‘': "'",        # Left Single Quote
-    '’': "'",        # Right Single Quote
-    '【': '[',       # 这是一个激进的选择，视情况而定，但在 DSL 中 [ ] 常用于列表
-    '】': ']', 
-}
 
 # 需要扫描的文件后缀
 TARGET_EXTENSIONS = {'.py', '.json', '.jsonl', '.dsl', '.md', '.txt'}
 
-def fix_file(filepath, root_dir):
-    """读取文件，执行替换，如果发生变化则保存，并将备份存入统一目录"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            original_content = f.read()
-    except UnicodeDecodeError:
-        print(f"⚠️ 跳过二进制或非 UTF-8 文件: {filepath}")
-        return
 
-    new_content = original_content
+def _describe_changes(counts):
+    """{被替换字符: 次数} -> 日志行"""
     changes_made = []
+    for bad_char, count in counts.items():
+        good_char = REPLACEMENT_MAP[bad_char]
+
+        # 记录日志
+        char_display = bad_char
+        if bad_char == '\u200b': char_display = "[零宽空格]"
+        elif bad_char == '\u3000': char_display = "[全角空格]"
+        elif bad_char == '\xa0': char_display = "[NBSP空格]"
 
-    for bad_char, good_char in REPLACEMENT_MAP.items():
-        if bad_char in new_content:
-            count = new_content.count(bad_char)
-            new_content = new_content.replace(bad_char, good_char)
-            
-            # 记录日志
-            char_display = bad_char
-            if bad_char == '\u200b': char_display = "[零宽空格]"
-            elif bad_char == '\u3000': char_display = "[全角空格]"
-            elif bad_char == '\xa0': char_display = "[NBSP空格]"
-            
-            changes_made.append(f"  - 替换了 {count} 个 '{char_display}' -> '{good_char}'")
-
-    if changes_made:
-        # 1. 计算统一备份路径 (保持原有目录结构)
-        # 例如: D:\Project\src\app.py -> D:\Project\_backups\src\app.py.bak
-        rel_path = os.path.relpath(filepath, root_dir)
-        backup_path = os.path.join(root_dir, BACKUP_DIR_NAME, rel_path + ".bak")
-        
-        # 确保备份目录存在
-        backup_dir = os.path.dirname(backup_path)
-        if not os.path.exists(backup_dir):
-            os.makedirs(backup_dir)
-
-        shutil.copy2(filepath, backup_path)
-        
-        # 2. 写入新内容
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(new_content)
-        
-        print(f"✅ 已修复: {rel_path}")
-        for change in changes_made:
-            print(change)
-        print(f"  (已备份至 {BACKUP_DIR_NAME}{os.sep}{rel_path}.bak)")
-    else:
+        changes_made.append(f"  - 替换了 {count} 个 '{char_display}' -> '{good_char}'")
+    return changes_made
+
+
+def _backup(filepath, root_dir):
+    """计算统一备份路径 (保持原有目录结构) 并复制原文件"""
+    # 例如: D:\Project\src\app.py -> D:\Project\_backups\src\app.py.bak
+    rel_path = os.path.relpath(filepath, root_dir)
+    backup_path = os.path.join(root_dir, BACKUP_DIR_NAME, rel_path + ".bak")
+    os.makedirs(os.path.dirname(backup_path), exist_ok=True)
+    shutil.copy2(filepath, backup_path)
+
+
+def _content_hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _stream_fix(filepath):
+    """
+    逐行修复大文件:结果写入同目录临时文件,有替换时返回 (临时文件路径, 替换次数, 内容哈希),
+    无替换时删除临时文件并返回 (None, {}, 内容哈希)
+    待替换的都是单个字符,不会跨行,逐行替换与整文件替换结果一致
+    """
+    counts = {}
+    digest = hashlib.blake2b(digest_size=16)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath) or ".",
+                                    prefix=f".{os.path.basename(filepath)}.", suffix=".tmp")
+    try:
+        with open(filepath, 'r', encoding='utf-8') as src, \
+                os.fdopen(fd, 'w', encoding='utf-8') as dst:
+            for line in src:
+                fixed, line_counts = fix_text(line)
+                for ch, n in line_counts.items():
+                    counts[ch] = counts.get(ch, 0) + n
+                digest.update(fixed.encode('utf-8'))
+                dst.write(fixed)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    if not counts:
+        os.remove(tmp_path)
+        return None, {}, digest.hexdigest()
+    # 按规则表顺序报告 (与整文件模式一致)
+    counts = {ch: counts[ch] for ch in REPLACEMENT_MAP if ch in counts}
+    shutil.copymode(filepath, tmp_path)
+    return tmp_path, counts, digest.hexdigest()
+
+
+def fix_file(filepath, root_dir, entry=None, stream_bytes=STREAM_THRESHOLD_MB * 1024 * 1024):
+    """
+    读取文件，执行替换，如果发生变化则保存，并将备份存入统一目录
+    entry 为清单中该文件的上次记录;返回 (新清单记录或 None, 日志行列表)
+    """
+    rel_path = os.path.relpath(filepath, root_dir)
+    stat = os.stat(filepath)
+    if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+        return entry, []
+
+    try:
+        if stat.st_size > stream_bytes:
+            tmp_path, counts, digest = _stream_fix(filepath)
+            if counts:
+                _backup(filepath, root_dir)
+                os.replace(tmp_path, filepath)
+        else:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                original_content = f.read()
+            digest = _content_hash(original_content)
+            # 只是 mtime 变了、内容与上次修复后一致:无需替换
+            if entry and entry["hash"] == digest:
+                counts = {}
+            else:
+                # 一次 translate 完成全部替换;纯 ASCII 文件直接跳过
+                new_content, counts = fix_text(original_content)
+            if counts:
+                _backup(filepath, root_dir)
+                # 写入新内容
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write(new_content)
+                digest = _content_hash(new_content)
+    except UnicodeDecodeError:
+        return None, [f"⚠️ 跳过二进制或非 UTF-8 文件: {filepath}"]
+
+    stat = os.stat(filepath)
+    record = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "hash": digest}
+    if not counts:
         # print(f"✨ 无需修复: {os.path.basename(filepath)}")
-        pass
+        return record, []
 
-def main():
-    print("="*60)
-    print("🧹 Unicode & 全角符号修复工具 V1.1")
-    print("="*60)
-    
-    current_dir = os.getcwd()
-    print(f"正在扫描目录: {current_dir}")
-    print(f"备份目录: {os.path.join(current_dir, BACKUP_DIR_NAME)}\n")
-    
-    count = 0
-    for root, dirs, files in os.walk(current_dir):
+    log = [f"✅ 已修复: {rel_path}"]
+    log.extend(_describe_changes(counts))
+    log.append(f"  (已备份至 {BACKUP_DIR_NAME}{os.sep}{rel_path}.bak)")
+    return record, log
+
+
+# =============================================================================
+# 清单
+# =============================================================================
+
+def rules_fingerprint():
+    """替换规则表的指纹:规则变化后旧清单作废 (否则已扫描过的文件永远用不上新规则)"""
+    rules = json.dumps(sorted(REPLACEMENT_MAP.items()), ensure_ascii=True)
+    return hashlib.blake2b(rules.encode('ascii'), digest_size=8).hexdigest()
+
+
+def load_manifest(root_dir):
+    path = os.path.join(root_dir, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict):
+        return {}
+    if manifest.get("rules") != rules_fingerprint():
+        print("ℹ️ 替换规则已变化,忽略旧清单,本次全量扫描\n")
+        return {}
+    return manifest.get("files", {})
+
+
+def save_manifest(root_dir, files):
+    """写临时文件后原子替换,中断时旧清单保持完整"""
+    path = os.path.join(root_dir, MANIFEST_NAME)
+    fd, tmp_path = tempfile.mkstemp(dir=root_dir, prefix=MANIFEST_NAME + ".", suffix=".tmp")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({"version": 1, "rules": rules_fingerprint(), "files": files},
+                  f, ensure_ascii=False, sort_keys=True)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def iter_target_files(root_dir):
+    for root, dirs, files in os.walk(root_dir):
         # 排除 .git, __pycache__, .idea, 以及备份目录本身
         if '.git' in dirs: dirs.remove('.git')
         if '__pycache__' in dirs: dirs.remove('__pycache__')
         if '.streamlit' in dirs: dirs.remove('.streamlit')
         if BACKUP_DIR_NAME in dirs: dirs.remove(BACKUP_DIR_NAME)
-        
+
         for file in files:
             ext = os.path.splitext(file)[1].lower()
             if ext in TARGET_EXTENSIONS:
-                # 排除脚本自己和备份文件(.bak)
-                if file == "unicode_fixer.py" or file.endswith(".bak"):
+                # 排除脚本自己、清单和备份文件(.bak)
+                if file in ("unicode_fixer.py", MANIFEST_NAME) or file.endswith(".bak"):
                     continue
-                    
-                filepath = os.path.join(root, file)
-                fix_file(filepath, current_dir)
-                count += 1
-                
+                yield os.path.join(root, file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Unicode 隐形字符与全角符号修复器")
+    parser.add_argument("-w", "--workers", type=int, default=min(8, (os.cpu_count() or 1) + 4),
+                        help="并行处理的线程数")
+    parser.add_argument("--full", action="store_true", help="忽略增量清单,全量扫描")
+    parser.add_argument("--stream-mb", type=float, default=STREAM_THRESHOLD_MB,
+                        help=f"超过该大小 (MB) 的文件逐行流式处理 (默认 {STREAM_THRESHOLD_MB})")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("🧹 Unicode & 全角符号修复工具 V1.3")
+    print("="*60)
+
+    current_dir = os.getcwd()
+    print(f"正在扫描目录: {current_dir}")
+    print(f"备份目录: {os.path.join(current_dir, BACKUP_DIR_NAME)}\n")
+
+    previous = {} if args.full else load_manifest(current_dir)
+    stream_bytes = int(args.stream_mb * 1024 * 1024)
+    files = {}
+    stats = {"scanned": 0, "skipped": 0, "fixed": 0}
+
+    def process(filepath):
+        rel_path = os.path.relpath(filepath, current_dir)
+        entry = previous.get(rel_path)
+        record, log = fix_file(filepath, current_dir, entry, stream_bytes)
+        return rel_path, entry, record, log
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        for rel_path, entry, record, log in pool.map(process, iter_target_files(current_dir)):
+            stats["scanned"] += 1
+            if record is not None:
+                files[rel_path] = record
+                if record is entry:
+                    stats["skipped"] += 1
+            if log:
+                if log[0].startswith("✅"):
+                    stats["fixed"] += 1
+                print("\n".join(log))
+
+    save_manifest(current_dir, files)
+
     print("\n" + "="*60)
-    print("🎉 扫描完成！")
+    print(f"🎉 扫描完成！共 {stats['scanned']} 个文件,"
+          f"未变化跳过 {stats['skipped']} 个,修复 {stats['fixed']} 个")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
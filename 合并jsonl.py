@@ -1,65 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+[JSONL 合并工具]V2.1
+功能:
+1. 合并任意多个 JSONL 文件 (路径或通配符),逐行深度清洗:
+   NFKC 标准化 + 剔除不可见控制字符 (保留换行与缩进) + 去首尾空白
+2. 边合并边去重 (按清洗后整行或按 DSL 的哈希摘要)
+3. 校验每行是合法 JSON 对象,非法行丢弃并计数
+4. 可按权重交错输出各来源 (默认按输入顺序依次拼接)
+
+更新 V2.0:
+1. [Feat] 命令行参数取代写死的两个文件名;支持任意个输入与通配符
+2. [Perf] 清洗改为 unicodedata.is_normalized 快速判定 + str.translate 查表,
+   不再对每个字符跑 Python 生成器 (输出与 V1 的 clean_line 逐字节一致)
+3. [Perf] -w/--workers:按块多进程清洗/校验/计算摘要,主进程只负责去重与按序写出,
+   每个来源最多 WINDOW 个块在途,内存占用与文件大小无关
+4. [Feat] 去重 (--dedupe line/dsl/none)、JSON 校验 (--no-validate 关闭)、按权重交错 (--interleave --weights)
+
+更新 V2.1:
+1. [Perf] clean_line 移入 text_cleaner 统一清洗引擎:纯 ASCII 行跳过 NFKC,
+   用 bytes.translate 删除表去控制字符 (输出不变)
+
+使用方法:
+    python 合并jsonl.py a.jsonl b.jsonl -o combined.jsonl
+    python 合并jsonl.py "data/*.jsonl" extra.jsonl -o combined.jsonl -w 4 --dedupe dsl
+    python 合并jsonl.py base.jsonl fission.jsonl --interleave --weights 3,1 -o mixed.jsonl
+"""
 import os
-import unicodedata
+import sys
+import glob
+import json
+import hashlib
+import argparse
+import multiprocessing
+from collections import deque
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+from dsl_dedupe import dsl_digest
+from text_cleaner import clean_line
+
+# 每个并行块的行数 / 每个来源在途的块数
+CHUNK_LINES = 2048
+WINDOW = 8
+
+
+# =============================================================================
+# 并行块处理
+# =============================================================================
+
+def _process_chunk(task: Tuple[List[str], bool, str]) -> Tuple[List[Tuple[str, Optional[bytes]]], int]:
+    """
+    清洗一块行:返回 ([(清洗后的行, 去重摘要), ...], 非法行数)
+    空行直接丢弃;dedupe == "none" 时摘要为 None
+    """
+    lines, validate, dedupe = task
+    kept = []
+    invalid = 0
+    for line in lines:
+        cleaned = clean_line(line)
+        if not cleaned.strip():
+            continue
+        sample = None
+        if validate or dedupe == "dsl":
+            try:
+                sample = json.loads(cleaned)
+            except json.JSONDecodeError:
+                sample = None
+            if not isinstance(sample, dict):
+                if validate:
+                    invalid += 1
+                    continue
+                sample = {}
+        if dedupe == "line":
+            digest = hashlib.blake2b(cleaned.encode('utf-8'), digest_size=16).digest()
+        elif dedupe == "dsl":
+            digest = dsl_digest(sample.get("output", "")) if sample else \
+                hashlib.blake2b(cleaned.encode('utf-8'), digest_size=16).digest()
+        else:
+            digest = None
+        kept.append((cleaned, digest))
+    return kept, invalid
 
-def clean_line(text):
+
+def _read_chunks(path: str, chunk_lines: int) -> Iterator[List[str]]:
+    if chunk_lines < 1:
+        raise ValueError(f"chunk_lines 必须 >= 1 (收到 {chunk_lines})")
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            chunk = list(islice(f, chunk_lines))
+            if not chunk:
+                return
+            yield chunk
+
+
+def _process_source(path: str, pool, validate: bool, dedupe: str,
+                    chunk_lines: int = CHUNK_LINES, window: int = WINDOW):
+    """按顺序产出一个来源的处理结果块;有进程池时最多 window 个块在途"""
+    tasks = ((chunk, validate, dedupe) for chunk in _read_chunks(path, chunk_lines))
+    if pool is None:
+        yield from map(_process_chunk, tasks)
+        return
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(_process_chunk, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _interleave(streams: List[Iterator], weights: List[float]) -> Iterator:
     """
-    深度清洗每一行数据,确保兼容性:
-    1. NFKC 标准化:将全角字符、歧义符号、某些同形异义词转换为标准半角/规范形式。
-    2. 剔除所有不可见控制字符(保留换行符和缩进)。
-    3. 处理 VS Code 容易报错的 Unicode 歧义字符。
+    按权重逐行交错多个流 (步长调度):每次取"已取行数 / 权重"最小的来源,
+    权重 3:1 时每 3 行 A 插 1 行 B;某个来源耗尽后其余来源继续
     """
-    if not text:
-        return ""
-    
-    # 第一步:执行 NFKC 标准化 (Compatibility Decomposition, followed by Canonical Composition)
-    # 这能解决很多"看起来像 A 其实是 B"的 Unicode 歧义问题
-    text = unicodedata.normalize('NFKC', text)
-    
-    # 第二步:过滤不可见字符
-    # 只保留可打印字符、换行符(\n)和制表符(\t)
-    # isprintable() 会自动识别并排除 \u200b (零宽空格) 等不可见字符
-    text = "".join(ch for ch in text if ch.isprintable() or ch in '\n\r\t')
-    
-    # 第三步:处理特定的潜在歧义引号或符号(如果 NFKC 没处理掉的话)
-    # 在 JSON 中,标准的双引号是 " (\u0022),如果混入了奇怪的引号,这里可以手动纠正
-    # 但通常 NFKC 已经处理了大部分情况
-    
-    return text.strip() + "\n"
-
-def merge_jsonl_files(file1_path, file2_path, output_path):
+    passes = [0.0] * len(streams)
+    active = list(range(len(streams)))
+    while active:
+        i = min(active, key=lambda k: passes[k])
+        item = next(streams[i], None)
+        if item is None:
+            active.remove(i)
+            continue
+        passes[i] += 1.0 / weights[i]
+        yield item
+
+
+def expand_inputs(patterns: List[str], exclude: Optional[str] = None) -> List[str]:
     """
-    合并并深度清洗两个 JSONL 文件
+    路径或通配符 -> 文件列表 (通配符结果排序,同一文件只出现一次)
+    exclude 为输出文件:通配符可能匹配到它,边写边读会读到自己写出的行,必须剔除
     """
-    if not os.path.exists(file1_path) or not os.path.exists(file2_path):
-        print("错误:源文件路径无效,请检查文件名。")
-        return
+    excluded = os.path.abspath(exclude) if exclude else None
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if os.path.abspath(path) == excluded:
+                print(f"⚠️ 跳过输出文件本身: {path}")
+                continue
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def positive_int(text: str) -> int:
+    """argparse 用:>= 1 的整数"""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"需要整数 (收到 {text!r})")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"必须 >= 1 (收到 {value})")
+    return value
+
+
+def parse_weights(text: str) -> List[float]:
+    """argparse 用:"3,1" -> [3.0, 1.0],格式错误时给出用法错误而不是 traceback"""
+    try:
+        weights = [float(w) for w in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"需要逗号分隔的数字,如 3,1 (收到 {text!r})")
+    if min(weights) <= 0:
+        raise argparse.ArgumentTypeError(f"权重必须为正数 (收到 {text!r})")
+    return weights
+
+
+def merge_jsonl_files(input_paths: List[str], output_path: str, workers: int = 1,
+                      dedupe: str = "line", validate: bool = True,
+                      interleave: bool = False, weights: Optional[List[float]] = None,
+                      chunk_lines: int = CHUNK_LINES):
+    """
+    合并并深度清洗多个 JSONL 文件
+    """
+    missing = [p for p in input_paths if not os.path.exists(p)]
+    if not input_paths or missing:
+        print(f"错误:源文件路径无效,请检查文件名。{' '.join(missing)}")
+        return None
+    if os.path.abspath(output_path) in {os.path.abspath(p) for p in input_paths}:
+        print(f"错误:输出文件 {output_path} 同时也是输入文件")
+        return None
+    if weights is None:
+        weights = [1.0] * len(input_paths)
+    if len(weights) != len(input_paths) or min(weights) <= 0:
+        print(f"错误:--weights 需要 {len(input_paths)} 个正数")
+        return None
 
     print(f"正在启动深度清洗合并引擎 (使用 NFKC 标准化)...")
+    print(f"   输入 {len(input_paths)} 个文件, workers={workers}, 去重={dedupe}, "
+          f"{'按权重交错' if interleave else '顺序拼接'}")
+
+    stats = {"written": 0, "duplicates": 0, "invalid": 0}
+    per_source = [0] * len(input_paths)
+    seen = set()
 
+    def source_lines(source: int, blocks):
+        for kept, invalid in blocks:
+            stats["invalid"] += invalid
+            for cleaned, digest in kept:
+                yield source, cleaned, digest
+
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
     try:
-        count = 0
+        streams = [source_lines(i, _process_source(p, pool, validate, dedupe, chunk_lines))
+                   for i, p in enumerate(input_paths)]
+        if interleave:
+            lines = _interleave(streams, weights)
+        else:
+            lines = (item for stream in streams for item in stream)
+
         with open(output_path, 'w', encoding='utf-8') as outfile:
-            for source in [file1_path, file2_path]:
-                with open(source, 'r', encoding='utf-8') as infile:
-                    for line in infile:
-                        cleaned = clean_line(line)
-                        if cleaned.strip(): 
-                            outfile.write(cleaned)
-                            count += 1
-        
-        absolute_output_path = os.path.abspath(output_path)
-        print("------------------------------------------------------------------")
-        print(f"✅ 深度清理合并完成！共处理 {count} 行数据。")
-        print(f"💡 采用了 NFKC 标准化逻辑,VS Code 的 Unicode 歧义提示应已消除。")
-        print(f"文件位置: {absolute_output_path}")
-        print("------------------------------------------------------------------")
-
-    except Exception as e:
-        print(f"合并过程中发生错误: {e}")
+            for source, cleaned, digest in lines:
+                if digest is not None:
+                    if digest in seen:
+                        stats["duplicates"] += 1
+                        continue
+                    seen.add(digest)
+                outfile.write(cleaned)
+                per_source[source] += 1
+        stats["written"] = sum(per_source)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    absolute_output_path = os.path.abspath(output_path)
+    print("------------------------------------------------------------------")
+    print(f"✅ 深度清理合并完成！共写出 {stats['written']} 行数据。")
+    for path, count in zip(input_paths, per_source):
+        print(f"   {path}: {count}")
+    if dedupe != "none":
+        print(f"   去重跳过: {stats['duplicates']}")
+    if validate:
+        print(f"   非法 JSON 丢弃: {stats['invalid']}")
+    print(f"💡 采用了 NFKC 标准化逻辑,VS Code 的 Unicode 歧义提示应已消除。")
+    print(f"文件位置: {absolute_output_path}")
+    print("------------------------------------------------------------------")
+    return stats
+
 
 # ============== 配置 ==============
-file_one = "wwise_final_train.jsonl" 
-file_two = "wwise_params_10k_final.jsonl" 
+# 不传输入文件时沿用原来的默认组合
+file_one = "wwise_final_train.jsonl"
+file_two = "wwise_params_10k_final.jsonl"
 output_file = "combined_wwise_data_v1.jsonl"
 
-merge_jsonl_files(file_one, file_two, output_file)
\ No newline at end of file
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONL 合并工具 (清洗 + 去重 + 校验)")
+    parser.add_argument("inputs", nargs="*", help=f"输入文件或通配符 (默认: {file_one} {file_two})")
+    parser.add_argument("-o", "--output", type=str, default=output_file,
+                        help=f"输出文件路径 (默认 {output_file})")
+    parser.add_argument("-w", "--workers", type=positive_int, default=1, help="并行清洗的进程数 (默认 1)")
+    parser.add_argument("--dedupe", choices=["line", "dsl", "none"], default="line",
+                        help="去重方式:line=清洗后整行, dsl=规范化后的 output, none=不去重 (默认 line)")
+    parser.add_argument("--no-validate", action="store_true", help="不校验 JSON (非法行也原样写出)")
+    parser.add_argument("--interleave", action="store_true", help="按权重交错各来源,而不是依次拼接")
+    parser.add_argument("--weights", type=parse_weights, default=None,
+                        help="各来源权重,逗号分隔,如 3,1 (配合 --interleave)")
+    parser.add_argument("--chunk-lines", type=positive_int, default=CHUNK_LINES,
+                        help=f"每个并行块的行数 (默认 {CHUNK_LINES})")
+
+    args = parser.parse_args()
+
+    inputs = expand_inputs(args.inputs or [file_one, file_two], exclude=args.output)
+
+    stats = merge_jsonl_files(
+        inputs, args.output,
+        workers=args.workers,
+        dedupe=args.dedupe,
+        validate=not args.no_validate,
+        interleave=args.interleave,
+        weights=args.weights,
+        chunk_lines=args.chunk_lines,
+    )
+    if stats is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
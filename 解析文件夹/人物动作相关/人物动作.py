@@ -1,7 +1,12 @@
 import json
+import os
 import re
 import random
-import unicodedata
+import sys
+
+# 核弹级清洗 (全角标点转 ASCII + NFKC + 白名单) 由仓库根目录的统一清洗引擎提供
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from text_cleaner import clean_text
 
 # ==============================================================================
 # 🎭 资深音频设计师 - 动态话术库 (Character Action 专用)
@@ -87,34 +92,6 @@ ADJECTIVES = ["湿漉漉", "清脆", "厚重", "沉闷", "尖锐", "有弹性",
 # 🧠 核心解析逻辑
 # ==============================================================================
 
-def clean_text(text):
-    """
-    核弹级清洗:将所有全角/中文标点强制转换为 ASCII 标点,
-    并剔除所有非白名单字符。
-    """
-    if not text: return ""
-
-    # 1. 强制全角转半角
-    char_map = {
-        '"': '"', '"': '"', ''': "'", ''': "'",
-        ':': ':', '(': '(', ')': ')', ',': ',',
-        ';': ';', ' ': ' ', '。': '.', 
-        '、': ',', '？': '?', '！': '!',
-        '[': '[', ']': ']' 
-    }
-    for k, v in char_map.items():
-        text = text.replace(k, v)
-
-    # 2. NFKC 标准化
-    text = unicodedata.normalize('NFKC', text)
-
-    # 3. 正则白名单 (保留 Tab, 换行, ASCII, 中文)
-    # 这一步能有效去除不可见的控制字符和奇怪的 unicode 符号
-    pattern = re.compile(r'[^\u0009\u000A\u000D\u0020-\u007E\u4E00-\u9FFF]')
-    text = pattern.sub('', text)
-
-    return text.strip()
-
 def analyze_wwise_code(code_str):
     """
     解析 Wwise DSL 代码,提取关键信息并推断意图。
@@ -1,6 +1,12 @@
 import json
+import os
 import re
 import random
+import sys
+
+# 共享的关键词自动机位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from keyword_matcher import KeywordAutomaton
 
 # ==========================================
 # 资深音频设计师 - 动态话术库 (V3.0)
@@ -44,6 +50,12 @@ THEME_MAP = {
     "ZiTengHua": "[紫藤花]主题"
 }
 
+# 名称关键词自动机:三张映射表的键一次扫描全部命中 (键互不重复,不区分大小写)
+NAME_MATCHER = KeywordAutomaton.from_mapping(
+    {k: [k] for table in (CONTEXT_MAP, PHASE_MAP, THEME_MAP) for k in table},
+    case_sensitive=False
+)
+
 # 4. 设计意图库 (针对线性与UI)
 INTENTS = {
     "Cinematic": [
@@ -85,26 +97,26 @@ TECH_PHRASES = {
 
 def analyze_name(obj_name):
     """解析名字中的元数据"""
-    name_lower = obj_name.lower()
+    hits = NAME_MATCHER.categories(obj_name)
     
-    # 提取语境
+    # 提取语境 (按映射表顺序取第一个命中的键)
     context = "通用资源"
     for k, v_list in CONTEXT_MAP.items():
-        if k.lower() in name_lower:
+        if k in hits:
             context = random.choice(v_list)
             break
             
     # 提取阶段
     phase = ""
     for k, v_list in PHASE_MAP.items():
-        if k.lower() in name_lower:
+        if k in hits:
             phase = random.choice(v_list)
             break
             
     # 提取题材
     theme = ""
     for k, v in THEME_MAP.items():
-        if k.lower() in name_lower:
+        if k in hits:
             theme = v
             break
             
@@ -1,39 +1,17 @@
 import json
+import os
 import re
 import random
-import unicodedata
+import sys
+
+# 核弹级清洗 (全角标点转 ASCII + NFKC + 白名单) 由仓库根目录的统一清洗引擎提供
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from text_cleaner import clean_text
 
 # ==========================================
 # V9.0: 修复遗漏代码 + 全量翻译 + 核弹级清洗
 # ==========================================
 
-def clean_text(text):
-    """
-    核弹级清洗:将所有全角/中文标点强制转换为 ASCII 标点,
-    并剔除所有非白名单字符。
-    """
-    if not text: return ""
-
-    # 1. 强制全角转半角
-    char_map = {
-        '"': '"', '"': '"', ''': "'", ''': "'",
-        ':': ':', '(': '(', ')': ')', ',': ',',
-        ';': ';', ' ': ' ', '。': '.', 
-        '、': ',', '？': '?', '！': '!',
-        '[': '[', ']': ']' 
-    }
-    for k, v in char_map.items():
-        text = text.replace(k, v)
-
-    # 2. NFKC 标准化
-    text = unicodedata.normalize('NFKC', text)
-
-    # 3. 正则白名单 (保留 Tab, 换行, ASCII, 中文)
-    pattern = re.compile(r'[^\u0009\u000A\u000D\u0020-\u007E\u4E00-\u9FFF]')
-    text = pattern.sub('', text)
-    
-    return text.strip()
-
 # --- 语境库 ---
 CONTEXTS = {
     "MVP": [
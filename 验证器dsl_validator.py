@@ -1,8 +1,26 @@
 # -*- coding: utf-8 -*-
 """
-[DSL 验证器]DSL Validator (V2.0 - DSL Parser V7.0 完全适配版)
+[DSL 验证器]DSL Validator (V2.4 - 紧凑对象集合版)
 功能:验证逆向生成的 DSL 是否能被 Parser V7.0 正确解析
 
+更新日志 V2.4:
+1. [Perf] 可选紧凑对象集合 ObjectUniverse:对象名哈希为 64 位整数 ID,
+   可选 Bloom filter 前置与 ID 数量上限,百万级对象时内存有界
+2. [Feat] --project-index:从工程对象索引预置已存在对象,消除对真实工程对象的误报警告
+
+更新日志 V2.3:
+1. [Feat] 性能剖析 (--profile / ValidationProfiler):按验证层级与 DSL 指令类型
+   累计耗时与调用次数,并列出最慢的 N 条样本,结果以 JSON 输出
+
+更新日志 V2.2:
+1. [Perf] 可选持久化结果缓存 (--cache):按 output 哈希 + 验证器/Parser 版本命中,
+   命中时跳过语法/语义验证,仅重跑与样本顺序相关的依赖验证
+2. [Feat] 报告新增缓存命中率
+
+更新日志 V2.1:
+1. [Perf] 语义/依赖验证直接复用 Parser 产出的 DSLCommand,DSL 文本只处理一次
+2. [Feat] --benchmark:对比语义/依赖层文本重扫与指令节点复用的耗时 (两种模式解析器相同,结果逐条比对)
+
 更新日志 V2.0:
 1. [Core] 完全适配 DSL Parser V7.0 的所有语法
 2. [Feat] 多层次验证:语法 → 语义 → 依赖
@@ -19,6 +37,12 @@ import json
 import re
 import os
 import sys
+import time
+import hashlib
+import heapq
+import argparse
+from collections import namedtuple, defaultdict
+from contextlib import contextmanager, nullcontext
 from typing import List, Dict, Tuple, Optional, Set
 from dataclasses import dataclass, field
 from datetime import datetime
@@ -28,10 +52,27 @@ try:
     # 尝试从当前目录或 src 目录导入
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
-    from dsl_parser import DSLParser
+    from dsl_parser import DSLParser, DSLCommand
 except ImportError:
     print("⚠️ 警告: 无法导入 DSLParser,将使用内置简化版本")
     DSLParser = None
+    DSLCommand = namedtuple("DSLCommand", ["line_idx", "kind", "args", "text"])
+
+
+VALIDATOR_VERSION = "2.4"
+
+
+# =============================================================================
+# 文本兜底正则 (仅用于 Parser 未识别的行,或无 Parser 时)
+# =============================================================================
+_LINE_NO_RE = re.compile(r'^\d+\.\s*')
+_LEADING_WORD_RE = re.compile(r'\w+')
+_SEM_CREATE_RE = re.compile(r'CREATE\s+(\w+)', re.IGNORECASE)
+_SEM_PROP_RE = re.compile(r'SET_PROP\s+"[^"]+"\s+"([^"]+)"', re.IGNORECASE)
+_SEM_LINK_RE = re.compile(r'LINK\s+"[^"]+"\s+TO\s+"[^"]+"\s+AS\s+"([^"]+)"', re.IGNORECASE)
+_DEP_CREATE_RE = re.compile(r'CREATE\s+\w+\s+"([^"]+)"\s+UNDER\s+"([^"]+)"', re.IGNORECASE)
+_DEP_LINK_RE = re.compile(r'LINK\s+"([^"]+)"\s+TO\s+"([^"]+)"', re.IGNORECASE)
+_DEP_ASSIGN_RE = re.compile(r'ASSIGN\s+"([^"]+)"\s+TO\s+"([^"]+)"', re.IGNORECASE)
 
 
 @dataclass
@@ -48,18 +89,261 @@ class ValidationResult:
     commands_found: Dict[str, int] = field(default_factory=dict)
 
 
+class BloomFilter:
+    """定长位图 Bloom filter,输入为 64 位整数哈希 (双重哈希派生 k 个位置)"""
+
+    def __init__(self, num_bits: int, num_hashes: int = 4):
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = num_hashes
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, h: int):
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, h: int):
+        for pos in self._positions(h):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, h: int) -> bool:
+        for pos in self._positions(h):
+            if not self.bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class ObjectUniverse:
+    """
+    紧凑对象集合 (可替代 Set[str] 作为 created_objects / 工程对象索引)
+    - 对象名哈希为 64 位整数 ID 存入 set,不再保存字符串本身
+    - bloom_bits > 0 时前置 Bloom filter:判定"不存在"无需查 set
+    - max_ids 限定精确 ID 数量上限,超出后的新对象只写入 Bloom filter,内存保持有界;
+      此时这些对象判定为"可能存在",只会漏报依赖警告,不会误报
+    """
+
+    def __init__(self, max_ids: Optional[int] = None, bloom_bits: int = 0, bloom_hashes: int = 4):
+        if max_ids is not None and bloom_bits <= 0:
+            raise ValueError("max_ids 需要配合 bloom_bits 使用,否则超出上限的对象会被丢弃")
+        self.max_ids = max_ids
+        self.ids: Set[int] = set()
+        self.bloom = BloomFilter(bloom_bits, bloom_hashes) if bloom_bits > 0 else None
+        self.overflow = 0  # 超出上限、仅存在于 Bloom filter 中的对象数
+
+    @staticmethod
+    def name_id(name: str) -> int:
+        return int.from_bytes(hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def add(self, name: str):
+        h = self.name_id(name)
+        if h in self.ids:
+            return
+        if self.bloom is not None:
+            self.bloom.add(h)
+        if self.max_ids is None or len(self.ids) < self.max_ids:
+            self.ids.add(h)
+        else:
+            self.overflow += 1
+
+    def update(self, names):
+        for name in names:
+            self.add(name)
+
+    def __contains__(self, name: str) -> bool:
+        h = self.name_id(name)
+        if self.bloom is not None and h not in self.bloom:
+            return False
+        if h in self.ids:
+            return True
+        return self.overflow > 0
+
+    def __len__(self) -> int:
+        return len(self.ids) + self.overflow
+
+
+def load_project_index(path: str) -> List[str]:
+    """
+    读取工程对象索引,返回对象名列表
+    支持格式:
+    - .txt: 每行一个对象名
+    - .json: 名称列表 / {名称: ...} 字典 / Registry 导出的 {"name_index": {名称: [路径, ...]}}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if not path.lower().endswith('.json'):
+            return [line.strip() for line in f if line.strip()]
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("name_index", data)
+    return [str(name) for name in data]
+
+
+class ValidationProfiler:
+    """
+    验证性能剖析器
+    - levels: 按验证层级 (json_decode / cache_lookup / syntax / text_rescan /
+              semantic / dependency_extract / dependency) 累计
+    - commands: 按 DSL 指令类型累计单行解析耗时 (由 Parser 回调)
+    - slowest: 单条样本总耗时最高的 N 条
+    多次 validate_dataset 之间不会自动清零
+    """
+
+    def __init__(self, top_n: int = 10):
+        self.top_n = top_n
+        self.levels: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+        self.commands: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+        self._slowest: List[Tuple[float, int]] = []  # 小顶堆 (耗时, 行号)
+
+    @contextmanager
+    def section(self, level: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_level(level, time.perf_counter() - start)
+
+    def add_level(self, level: str, elapsed: float):
+        entry = self.levels[level]
+        entry[0] += elapsed
+        entry[1] += 1
+
+    def add_command(self, kind: str, elapsed: float):
+        entry = self.commands[kind]
+        entry[0] += elapsed
+        entry[1] += 1
+
+    def add_sample(self, line_number: int, elapsed: float):
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, (elapsed, line_number))
+        elif elapsed > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (elapsed, line_number))
+
+    @staticmethod
+    def _summarize(table: Dict[str, List[float]]) -> Dict[str, Dict]:
+        return {
+            name: {
+                "total_ms": round(total * 1000, 3),
+                "calls": calls,
+                "avg_us": round(total / max(1, calls) * 1e6, 2),
+            }
+            for name, (total, calls) in sorted(table.items(), key=lambda x: -x[1][0])
+        }
+
+    def report(self) -> Dict:
+        return {
+            "levels": self._summarize(self.levels),
+            "commands": self._summarize(self.commands),
+            "slowest_samples": [
+                {"line_number": line_number, "ms": round(elapsed * 1000, 3)}
+                for elapsed, line_number in sorted(self._slowest, reverse=True)
+            ],
+        }
+
+    def print_summary(self):
+        report = self.report()
+        print("\n⏱️ 性能剖析 (按层级):")
+        for name, item in report["levels"].items():
+            print(f"  {name:<20} {item['total_ms']:>10.1f} ms  {item['calls']:>8} 次  {item['avg_us']:>8.1f} µs/次")
+        if report["commands"]:
+            print("\n⏱️ 性能剖析 (按指令类型):")
+            for name, item in report["commands"].items():
+                print(f"  {name:<20} {item['total_ms']:>10.1f} ms  {item['calls']:>8} 次  {item['avg_us']:>8.1f} µs/次")
+        if report["slowest_samples"]:
+            print(f"\n🐢 最慢样本 (前{self.top_n}条):")
+            for item in report["slowest_samples"]:
+                print(f"  Line {item['line_number']}: {item['ms']:.2f} ms")
+
+
+class ValidationCache:
+    """
+    持久化验证缓存 (JSON 文件)
+    key: output 哈希 + 验证器/Parser 版本
+    value: 依赖验证之前的 ValidationResult 快照 + 重跑依赖验证所需的输入
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                print(f"⚠️ 缓存文件损坏,将重建: {path}")
+                self.entries = {}
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.entries.get(key)
+
+    def put(self, key: str, entry: Dict):
+        self.entries[key] = entry
+        self.dirty = True
+
+    def save(self):
+        """原子写入 (先写临时文件再替换)"""
+        if not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
 class DSLValidatorV2:
     """
-    DSL 验证器 V2.0
-    适配 DSL Parser V7.0
+    DSL 验证器 V2.4
+    适配 DSL Parser V7.0+
     """
+
+    # 语义白名单
+    VALID_TYPES = {
+        "ActorMixer", "RandomSequenceContainer", "SwitchContainer",
+        "BlendContainer", "Folder", "WorkUnit", "Sound", "Bus", "AuxBus",
+        "Event", "SwitchGroup", "Switch", "StateGroup", "State",
+        "GameParameter", "Effect", "Attenuation", "Action"
+    }
+    VALID_PROPS = {
+        "Volume", "Pitch", "Lowpass", "Highpass",
+        "InitialValue", "MinValue", "MaxValue",
+        "OverrideOutput", "OverridePositioning",
+        "Priority", "IsLoopingEnabled", "Color"
+    }
+    VALID_REFS = {
+        "Bus", "OutputBus", "Attenuation",
+        "SwitchGroupOrStateGroup", "SwitchGroup", "StateGroup",
+        "Effect0", "Effect1", "Effect2", "Effect3",
+        "UserAuxSend0", "UserAuxSend1", "GameParameter", "Conversion"
+    }
     
-    def __init__(self):
+    def __init__(self, reuse_parse: bool = True, cache_path: str = None,
+                 profiler: ValidationProfiler = None,
+                 universe_options: Dict = None, project_index: str = None):
+        """
+        Args:
+            reuse_parse: 语义/依赖验证是否复用 Parser 的指令节点
+                         (False 时回到逐行文本重扫,仅用于基准对比)
+            cache_path: 持久化结果缓存文件路径 (可选,默认不启用)
+            profiler: 性能剖析器 (可选,默认不启用)
+            universe_options: ObjectUniverse 参数 (如 {"max_ids": ..., "bloom_bits": ...}),
+                              None 时对象集合使用普通 Set[str]
+            project_index: 工程对象索引文件 (可选),其中的对象视为已存在
+        """
         # 初始化 Parser
         if DSLParser:
             self.parser = DSLParser()
         else:
             self.parser = None
+        self.reuse_parse = reuse_parse
+        self.profiler = None
+        self.set_profiler(profiler)
+        
+        # 结果缓存 (opt-in)
+        self.cache = ValidationCache(cache_path) if cache_path else None
+        self.cache_stats = {"hits": 0, "misses": 0}
+        parser_version = getattr(DSLParser, 'VERSION', 'unknown') if DSLParser else 'regex'
+        self._cache_salt = f"validator={VALIDATOR_VERSION}|parser={parser_version}|"
         
         # 预置的 Wwise 系统对象 (这些肯定存在)
         self.system_objects = {
@@ -71,7 +355,15 @@ class DSLValidatorV2:
         }
         
         # 本次 Session 创建的对象
-        self.created_objects: Set[str] = set()
+        self.universe_options = universe_options
+        self.created_objects = self._new_universe()
+        
+        # 工程中已存在的对象 (来自索引文件,reset 时保留)
+        self.project_objects = self._new_universe()
+        if project_index:
+            names = load_project_index(project_index)
+            self.project_objects.update(names)
+            print(f"📇 已加载工程对象索引: {project_index} ({len(names)} 个对象)")
         
         # 验证统计
         self.stats = {
@@ -86,10 +378,27 @@ class DSLValidatorV2:
         # 详细结果
         self.results: List[ValidationResult] = []
 
+    def set_profiler(self, profiler: Optional[ValidationProfiler]):
+        """注入性能剖析器 (同时挂到 Parser 上统计指令类型耗时),传 None 关闭"""
+        self.profiler = profiler
+        if self.parser and hasattr(self.parser, 'set_profiler'):
+            self.parser.set_profiler(profiler)
+
+    def _section(self, level: str):
+        """剖析计时区段,未启用剖析时为空上下文"""
+        return self.profiler.section(level) if self.profiler else nullcontext()
+
+    def _new_universe(self):
+        """按配置创建对象集合"""
+        if self.universe_options is None:
+            return set()
+        return ObjectUniverse(**self.universe_options)
+
     def reset(self):
         """重置验证状态"""
-        self.created_objects = set()
+        self.created_objects = self._new_universe()
         self.stats = {k: 0 for k in self.stats}
+        self.cache_stats = {k: 0 for k in self.cache_stats}
         self.results = []
 
     def validate_dataset(self, file_path: str, 
@@ -106,7 +415,7 @@ class DSLValidatorV2:
         Returns:
             验证报告
         """
-        print(f"🔍 DSL Validator V2.0 (Parser V7.0 Compatible)")
+        print(f"🔍 DSL Validator V{VALIDATOR_VERSION} (Parser V7.0+ Compatible)")
         print(f"   Input: {file_path}")
         print("-" * 50)
         
@@ -129,7 +438,8 @@ class DSLValidatorV2:
                     continue
                 
                 try:
-                    data = json.loads(line)
+                    with self._section("json_decode"):
+                        data = json.loads(line)
                     result = self._validate_single(data, idx + 1)
                     self.results.append(result)
                     
@@ -169,12 +479,91 @@ class DSLValidatorV2:
                 f_valid.close()
             if f_invalid:
                 f_invalid.close()
+            if self.cache:
+                self.cache.save()
 
         return self._generate_report()
 
     def _validate_single(self, data: Dict, line_num: int) -> ValidationResult:
         """
         验证单条数据
+        语法/语义结果只取决于 DSL 文本本身,可走缓存;
+        依赖验证依赖此前样本累积的 created_objects,每次都重跑
+        """
+        dsl_code = data.get('output', '')
+        start = time.perf_counter() if self.profiler else None
+        
+        entry = None
+        cache_key = None
+        if self.cache is not None:
+            with self._section("cache_lookup"):
+                cache_key = self._cache_key(dsl_code)
+                entry = self.cache.get(cache_key)
+        
+        if entry is not None:
+            self.cache_stats["hits"] += 1
+            cached = entry["result"]
+            result = ValidationResult(
+                line_number=line_num,
+                is_valid=cached["is_valid"],
+                syntax_ok=cached["syntax_ok"],
+                semantic_ok=cached["semantic_ok"],
+                dependency_ok=cached["dependency_ok"],
+                errors=list(cached["errors"]),
+                warnings=list(cached["warnings"]),
+                plan_length=cached["plan_length"],
+                commands_found=dict(cached["commands_found"]),
+            )
+            created = entry["created"]
+            deps = entry["deps"]
+        else:
+            if self.cache is not None:
+                self.cache_stats["misses"] += 1
+            result, created, deps = self._validate_static(dsl_code, line_num)
+            if cache_key is not None:
+                self.cache.put(cache_key, {
+                    "result": {
+                        "is_valid": result.is_valid,
+                        "syntax_ok": result.syntax_ok,
+                        "semantic_ok": result.semantic_ok,
+                        "dependency_ok": result.dependency_ok,
+                        "errors": list(result.errors),
+                        "warnings": list(result.warnings),
+                        "plan_length": result.plan_length,
+                        "commands_found": dict(result.commands_found),
+                    },
+                    "created": created,
+                    "deps": deps,
+                })
+        
+        # Plan 中创建的对象计入全局上下文
+        self.created_objects.update(created)
+        
+        # =====================================================================
+        # Level 3: 依赖验证
+        # =====================================================================
+        if deps is not None:
+            with self._section("dependency"):
+                result = self._dependency_validate(deps, result)
+        
+        # 最终判定
+        result.is_valid = result.syntax_ok and result.semantic_ok and len(result.errors) == 0
+        
+        if start is not None:
+            self.profiler.add_sample(line_num, time.perf_counter() - start)
+        
+        return result
+
+    def _cache_key(self, dsl_code: str) -> str:
+        """缓存键: output 哈希 + 验证器/Parser 版本"""
+        return hashlib.sha1((self._cache_salt + dsl_code).encode('utf-8')).hexdigest()
+
+    def _validate_static(self, dsl_code: str, line_num: int) -> Tuple[ValidationResult, List[str], Optional[List[List[str]]]]:
+        """
+        与样本顺序无关的验证部分 (Level 1 语法 + Level 2 语义)
+        
+        Returns:
+            (结果, Plan 中创建的对象名, 依赖验证输入 (None 表示跳过依赖验证))
         """
         result = ValidationResult(
             line_number=line_num,
@@ -183,65 +572,69 @@ class DSLValidatorV2:
             semantic_ok=True,
             dependency_ok=True
         )
+        created: List[str] = []
         
-        dsl_code = data.get('output', '')
         if not dsl_code.strip():
             result.is_valid = False
             result.syntax_ok = False
             result.errors.append("DSL 代码为空")
-            return result
+            return result, created, None
 
         dsl_lines = dsl_code.split('\n')
+        commands = None
         
         # =====================================================================
         # Level 1: 语法验证 (使用 Parser)
         # =====================================================================
-        if self.parser:
-            try:
-                plan = self.parser.parse(dsl_lines)
-                result.plan_length = len(plan)
+        with self._section("syntax"):
+            if self.parser:
+                try:
+                    plan = self.parser.parse(dsl_lines)
+                    result.plan_length = len(plan)
+                    if self.reuse_parse and hasattr(self.parser, 'get_commands'):
+                        commands = self.parser.get_commands()
                 
-                if not plan:
-                    result.syntax_ok = False
-                    result.is_valid = False
-                    result.errors.append("Parser 返回空计划")
-                else:
-                    # 收集解析诊断
-                    if hasattr(self.parser, 'get_parse_diagnostics'):
-                        diag = self.parser.get_parse_diagnostics()
-                        result.errors.extend(diag.get('errors', []))
-                        result.warnings.extend(diag.get('warnings', []))
+                    if not plan:
+                        result.syntax_ok = False
+                        result.is_valid = False
+                        result.errors.append("Parser 返回空计划")
+                    else:
+                        # 收集解析诊断
+                        if hasattr(self.parser, 'get_parse_diagnostics'):
+                            diag = self.parser.get_parse_diagnostics()
+                            result.errors.extend(diag.get('errors', []))
+                            result.warnings.extend(diag.get('warnings', []))
                     
-                    # 分析 Plan
-                    result = self._analyze_plan(plan, result)
+                        # 分析 Plan
+                        result = self._analyze_plan(plan, result, created)
                     
-            except Exception as e:
-                result.syntax_ok = False
-                result.is_valid = False
-                result.errors.append(f"Parser 异常: {str(e)}")
-        else:
-            # 使用简化的正则验证
-            result = self._regex_validate(dsl_lines, result)
+                except Exception as e:
+                    result.syntax_ok = False
+                    result.is_valid = False
+                    result.errors.append(f"Parser 异常: {str(e)}")
+            else:
+                # 使用简化的正则验证
+                result = self._regex_validate(dsl_lines, result)
+        
+        if commands is None and (result.syntax_ok or result.semantic_ok):
+            with self._section("text_rescan"):
+                commands = self._commands_from_lines(dsl_lines)
         
         # =====================================================================
         # Level 2: 语义验证
         # =====================================================================
         if result.syntax_ok:
-            result = self._semantic_validate(dsl_lines, result)
+            with self._section("semantic"):
+                result = self._semantic_validate(commands, result)
         
-        # =====================================================================
-        # Level 3: 依赖验证
-        # =====================================================================
+        deps = None
         if result.semantic_ok:
-            result = self._dependency_validate(dsl_lines, result)
-        
-        # 最终判定
-        result.is_valid = result.syntax_ok and result.semantic_ok and len(result.errors) == 0
-        
-        return result
+            with self._section("dependency_extract"):
+                deps = self._extract_dependencies(commands)
+        return result, created, deps
 
-    def _analyze_plan(self, plan: List[Dict], result: ValidationResult) -> ValidationResult:
-        """分析解析出的 WAAPI Plan"""
+    def _analyze_plan(self, plan: List[Dict], result: ValidationResult, created: List[str]) -> ValidationResult:
+        """分析解析出的 WAAPI Plan,创建的对象名追加到 created"""
         commands = {"CREATE": 0, "SET_PROP": 0, "LINK": 0, "ASSIGN": 0, "ADD_ACTION": 0, "OTHER": 0}
         
         for step in plan:
@@ -252,7 +645,7 @@ class DSLValidatorV2:
                 commands["CREATE"] += 1
                 obj_name = args.get('name')
                 if obj_name:
-                    self.created_objects.add(obj_name)
+                    created.append(obj_name)
                     
             elif 'setProperty' in action:
                 commands["SET_PROP"] += 1
@@ -316,104 +709,128 @@ class DSLValidatorV2:
         result.plan_length = sum(commands.values())
         return result
 
-    def _semantic_validate(self, dsl_lines: List[str], result: ValidationResult) -> ValidationResult:
-        """语义验证"""
-        for line in dsl_lines:
+    def _commands_from_lines(self, dsl_lines: List[str]) -> List[DSLCommand]:
+        """
+        无 Parser 指令节点时的兜底:只做行清洗,kind 置空,
+        后续语义/依赖验证对这些行走文本正则
+        """
+        commands = []
+        for idx, line in enumerate(dsl_lines):
             line = line.strip()
             if not line or line.startswith('#'):
                 continue
+            commands.append(DSLCommand(idx, None, None, _LINE_NO_RE.sub('', line)))
+        return commands
+
+    def _semantic_validate(self, commands: List[DSLCommand], result: ValidationResult) -> ValidationResult:
+        """语义验证"""
+        for cmd in commands:
+            kind, args = cmd.kind, cmd.args
+            obj_type = prop_name = ref_type = None
             
-            line = re.sub(r'^\d+\.\s*', '', line)
+            if kind == "CREATE":
+                obj_type = _LEADING_WORD_RE.match(args[0]).group(0)
+            elif kind == "SET_PROP":
+                prop_name = args[1]
+            elif kind == "LINK":
+                ref_type = args[2]
+            elif kind is None:
+                m = _SEM_CREATE_RE.match(cmd.text)
+                if m:
+                    obj_type = m.group(1)
+                m = _SEM_PROP_RE.match(cmd.text)
+                if m:
+                    prop_name = m.group(1)
+                m = _SEM_LINK_RE.match(cmd.text)
+                if m:
+                    ref_type = m.group(1)
             
             # 检查 1: CREATE 类型是否有效
-            create_match = re.match(r'CREATE\s+(\w+)', line, re.IGNORECASE)
-            if create_match:
-                obj_type = create_match.group(1)
-                valid_types = [
-                    "ActorMixer", "RandomSequenceContainer", "SwitchContainer",
-                    "BlendContainer", "Folder", "WorkUnit", "Sound", "Bus", "AuxBus",
-                    "Event", "SwitchGroup", "Switch", "StateGroup", "State",
-                    "GameParameter", "Effect", "Attenuation", "Action"
-                ]
+            if obj_type is not None:
                 # 也接受带空格的写法 (Parser 会自动纠正)
-                if obj_type not in valid_types and obj_type.replace("-", "") not in valid_types:
+                if obj_type not in self.VALID_TYPES and obj_type.replace("-", "") not in self.VALID_TYPES:
                     result.warnings.append(f"非标准类型 '{obj_type}',Parser 会尝试纠正")
             
             # 检查 2: SET_PROP 属性是否有效
-            prop_match = re.match(r'SET_PROP\s+"[^"]+"\s+"([^"]+)"', line, re.IGNORECASE)
-            if prop_match:
-                prop_name = prop_match.group(1)
-                valid_props = [
-                    "Volume", "Pitch", "Lowpass", "Highpass",
-                    "InitialValue", "MinValue", "MaxValue",
-                    "OverrideOutput", "OverridePositioning",
-                    "Priority", "IsLoopingEnabled", "Color"
-                ]
-                if prop_name not in valid_props:
+            if prop_name is not None:
+                if prop_name not in self.VALID_PROPS:
                     result.warnings.append(f"非常规属性 '{prop_name}',可能需要确认")
             
             # 检查 3: LINK 类型是否有效
-            link_match = re.match(r'LINK\s+"[^"]+"\s+TO\s+"[^"]+"\s+AS\s+"([^"]+)"', line, re.IGNORECASE)
-            if link_match:
-                ref_type = link_match.group(1)
-                valid_refs = [
-                    "Bus", "OutputBus", "Attenuation",
-                    "SwitchGroupOrStateGroup", "SwitchGroup", "StateGroup",
-                    "Effect0", "Effect1", "Effect2", "Effect3",
-                    "UserAuxSend0", "UserAuxSend1", "GameParameter", "Conversion"
-                ]
-                if ref_type not in valid_refs:
+            if ref_type is not None:
+                if ref_type not in self.VALID_REFS:
                     result.semantic_ok = False
                     result.errors.append(f"无效的引用类型 '{ref_type}'")
         
         return result
 
-    def _dependency_validate(self, dsl_lines: List[str], result: ValidationResult) -> ValidationResult:
+    def _extract_dependencies(self, commands: List[DSLCommand]) -> List[List[str]]:
+        """
+        提取依赖验证的输入 (与样本顺序无关,可缓存)
+        返回 [kind, 对象, 依赖目标] 列表,kind 为 CREATE / LINK / ASSIGN
+        """
+        deps = []
+        
+        for cmd in commands:
+            kind, args = cmd.kind, cmd.args
+            
+            if kind == "CREATE":
+                # 依赖检查只认单词类型 (与 V2.0 正则口径一致)
+                if _LEADING_WORD_RE.fullmatch(args[0].strip()):
+                    deps.append(["CREATE", args[1], args[2]])
+            elif kind == "LINK":
+                deps.append(["LINK", args[0], args[1]])
+            elif kind == "ASSIGN":
+                deps.append(["ASSIGN", args[0], args[1]])
+            elif kind is None:
+                m = _DEP_CREATE_RE.match(cmd.text)
+                if m:
+                    deps.append(["CREATE", m.group(1), m.group(2)])
+                m = _DEP_LINK_RE.match(cmd.text)
+                if m:
+                    deps.append(["LINK", m.group(1), m.group(2)])
+                m = _DEP_ASSIGN_RE.match(cmd.text)
+                if m:
+                    deps.append(["ASSIGN", m.group(1), m.group(2)])
+        
+        return deps
+
+    def _dependency_validate(self, deps: List[List[str]], result: ValidationResult) -> ValidationResult:
         """依赖验证"""
         local_created = set()
         
-        for line in dsl_lines:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            
-            line = re.sub(r'^\d+\.\s*', '', line)
-            
+        for kind, obj_name, dep_name in deps:
             # CREATE 指令:记录创建的对象,检查父级
-            create_match = re.match(r'CREATE\s+\w+\s+"([^"]+)"\s+UNDER\s+"([^"]+)"', line, re.IGNORECASE)
-            if create_match:
-                obj_name, parent_name = create_match.groups()
+            if kind == "CREATE":
                 local_created.add(obj_name)
                 
                 # 检查父级是否存在
-                if parent_name not in self.system_objects and \
-                   parent_name not in self.created_objects and \
-                   parent_name not in local_created:
+                if dep_name not in self.system_objects and \
+                   dep_name not in local_created and \
+                   dep_name not in self.created_objects and \
+                   dep_name not in self.project_objects:
                     result.warnings.append(
-                        f"父级 '{parent_name}' 未在上下文中找到 (对象: {obj_name})"
+                        f"父级 '{dep_name}' 未在上下文中找到 (对象: {obj_name})"
                     )
             
             # LINK 指令:检查目标是否存在
-            link_match = re.match(r'LINK\s+"([^"]+)"\s+TO\s+"([^"]+)"', line, re.IGNORECASE)
-            if link_match:
-                child_name, target_name = link_match.groups()
-                
+            elif kind == "LINK":
                 # 跳过系统对象
-                if target_name not in self.system_objects and \
-                   target_name not in self.created_objects and \
-                   target_name not in local_created:
+                if dep_name not in self.system_objects and \
+                   dep_name not in local_created and \
+                   dep_name not in self.created_objects and \
+                   dep_name not in self.project_objects:
                     result.warnings.append(
-                        f"引用目标 '{target_name}' 可能不存在 (对象: {child_name})"
+                        f"引用目标 '{dep_name}' 可能不存在 (对象: {obj_name})"
                     )
             
             # ASSIGN 指令:检查状态/开关是否存在
-            assign_match = re.match(r'ASSIGN\s+"([^"]+)"\s+TO\s+"([^"]+)"', line, re.IGNORECASE)
-            if assign_match:
-                child_name, state_name = assign_match.groups()
-                
-                if state_name not in self.created_objects and state_name not in local_created:
+            elif kind == "ASSIGN":
+                if dep_name not in local_created and \
+                   dep_name not in self.created_objects and \
+                   dep_name not in self.project_objects:
                     result.warnings.append(
-                        f"Switch/State '{state_name}' 可能不存在 (对象: {child_name})"
+                        f"Switch/State '{dep_name}' 可能不存在 (对象: {obj_name})"
                     )
         
         # 更新全局创建记录
@@ -440,6 +857,18 @@ class DSLValidatorV2:
         print(f"依赖警告:           {self.stats['dependency_warnings']}")
         print("-" * 60)
         
+        cache_report = None
+        if self.cache is not None:
+            lookups = self.cache_stats["hits"] + self.cache_stats["misses"]
+            cache_report = {
+                "hits": self.cache_stats["hits"],
+                "misses": self.cache_stats["misses"],
+                "hit_rate": self.cache_stats["hits"] / max(1, lookups),
+                "entries": len(self.cache.entries),
+            }
+            print(f"缓存命中:           {cache_report['hits']}/{lookups} ({cache_report['hit_rate']*100:.1f}%)")
+            print("-" * 60)
+        
         # 显示错误样例
         error_samples = [r for r in self.results if not r.is_valid][:5]
         if error_samples:
@@ -465,25 +894,116 @@ class DSLValidatorV2:
         
         print("=" * 60)
         
-        return {
+        if self.profiler is not None:
+            self.profiler.print_summary()
+            print("=" * 60)
+        
+        report = {
             "stats": self.stats,
             "results": self.results
         }
+        if cache_report is not None:
+            report["cache"] = cache_report
+        if self.profiler is not None:
+            report["profile"] = self.profiler.report()
+        return report
+
+
+# =============================================================================
+# 基准测试
+# =============================================================================
+def benchmark(file_path: str, rounds: int = 5) -> Dict:
+    """
+    对比 "文本重扫" 与 "指令节点复用" 两种模式的验证耗时
+    两种模式都走 V7.4 解析器 (按行首关键词分派),区别只在语义 / 依赖层是复用解析出的指令记录,
+    还是对原文重跑正则;因此只衡量指令记录复用本身的收益,不是与 V2.0 整体路径的对比
+    两种模式的逐条结果必须完全一致,否则报告不一致
+    """
+    records = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass
+
+    timings = {}
+    outcomes = {}
+    for mode, reuse in (("text_rescan", False), ("reuse_parse", True)):
+        validator = DSLValidatorV2(reuse_parse=reuse)
+        best = None
+        for _ in range(rounds):
+            validator.reset()
+            start = time.perf_counter()
+            results = [validator._validate_single(data, idx + 1) for idx, data in enumerate(records)]
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[mode] = best
+        outcomes[mode] = [(r.is_valid, r.syntax_ok, r.semantic_ok, r.errors, r.warnings) for r in results]
+
+    identical = outcomes["text_rescan"] == outcomes["reuse_parse"]
+    speedup = timings["text_rescan"] / max(timings["reuse_parse"], 1e-9)
+
+    print(f"⏱️ Validator Benchmark: {file_path}")
+    print(f"   样本数: {len(records)}, 轮次: {rounds} (取最快一轮)")
+    print(f"   (两种模式解析器相同,只对比语义/依赖层是否复用解析出的指令记录)")
+    print(f"   文本重扫:     {timings['text_rescan']*1000:.1f} ms")
+    print(f"   指令节点复用: {timings['reuse_parse']*1000:.1f} ms")
+    print(f"   加速比:       {speedup:.2f}x")
+    print(f"   结果一致:     {'✅' if identical else '❌'}")
+
+    return {"samples": len(records), "timings": timings, "speedup": speedup, "identical": identical}
 
 
 # =============================================================================
 # 命令行入口
 # =============================================================================
 if __name__ == "__main__":
-    validator = DSLValidatorV2()
+    arg_parser = argparse.ArgumentParser(description="DSL 验证器 V2.4")
+    arg_parser.add_argument("input", nargs="?", help="输入 JSONL 文件路径")
+    arg_parser.add_argument("output_valid", nargs="?", default=None, help="有效样本输出路径")
+    arg_parser.add_argument("output_invalid", nargs="?", default=None, help="无效样本输出路径")
+    arg_parser.add_argument("--benchmark", action="store_true",
+                            help="基准测试:对比文本重扫与指令节点复用的耗时")
+    arg_parser.add_argument("--rounds", type=int, default=5, help="基准测试轮次 (默认 5)")
+    arg_parser.add_argument("--cache", type=str, default=None,
+                            help="持久化结果缓存文件 (如 .dsl_validator_cache.json),不指定则不启用")
+    arg_parser.add_argument("--profile", nargs="?", const="", default=None, metavar="PATH",
+                            help="性能剖析,结果写入 JSON (默认 <input>_profile.json)")
+    arg_parser.add_argument("--profile-top", type=int, default=10, help="剖析报告列出的最慢样本数 (默认 10)")
+    arg_parser.add_argument("--project-index", type=str, default=None,
+                            help="工程对象索引 (.txt 每行一个名称 / .json),其中对象视为已存在")
+    arg_parser.add_argument("--compact-universe", action="store_true",
+                            help="对象集合改用 64 位哈希 ID (大规模数据集节省内存)")
+    arg_parser.add_argument("--max-objects", type=int, default=None,
+                            help="紧凑集合的精确 ID 上限,超出后仅记入 Bloom filter (需配合 --bloom-mb)")
+    arg_parser.add_argument("--bloom-mb", type=float, default=0,
+                            help="Bloom filter 前置位图大小 (MB),0 表示不启用")
+    args = arg_parser.parse_args()
+    if args.max_objects is not None and args.bloom_mb <= 0:
+        arg_parser.error("--max-objects 需要配合 --bloom-mb 使用 (超出上限的对象只记入 Bloom filter)")
     
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-        output_valid = sys.argv[2] if len(sys.argv) > 2 else None
-        output_invalid = sys.argv[3] if len(sys.argv) > 3 else None
-    else:
-        input_file = input("请输入要验证的 JSONL 文件路径: ").strip()
-        output_valid = None
-        output_invalid = None
+    input_file = args.input or input("请输入要验证的 JSONL 文件路径: ").strip()
     
-    validator.validate_dataset(input_file, output_valid, output_invalid)
\ No newline at end of file
+    if args.benchmark:
+        benchmark(input_file, args.rounds)
+    else:
+        profiler = ValidationProfiler(top_n=args.profile_top) if args.profile is not None else None
+        universe_options = None
+        if args.compact_universe or args.max_objects or args.bloom_mb:
+            universe_options = {
+                "max_ids": args.max_objects,
+                "bloom_bits": int(args.bloom_mb * 8 * 1024 * 1024),
+            }
+        validator = DSLValidatorV2(cache_path=args.cache, profiler=profiler,
+                                   universe_options=universe_options,
+                                   project_index=args.project_index)
+        report = validator.validate_dataset(input_file, args.output_valid, args.output_invalid)
+        
+        if profiler is not None and report:
+            profile_path = args.profile or f"{os.path.splitext(input_file)[0]}_profile.json"
+            with open(profile_path, 'w', encoding='utf-8') as f:
+                json.dump({"stats": report["stats"], "cache": report.get("cache"), "profile": report["profile"]},
+                          f, ensure_ascii=False, indent=2)
+            print(f"📄 剖析报告: {profile_path}")